@@ -0,0 +1,291 @@
+"""
+backtest.py
+
+Walk-forward backtest of LSTMModel over the full history of every ticker.
+
+Every 30-day window of the store's feature matrix (features.load_features) is
+addressed through one zero-copy strided view (sliding_window_view over the
+memory-mapped matrix); window s covers rows s..s+29 and is scored against the
+Close of row s+30. Windows never cross ticker boundaries.
+
+The windows are streamed in chunks of chunk_windows: each chunk is gathered,
+run through the model in one batch, inverse-scaled in one call and folded into
+running sums per (ticker, period), so memory stays bounded by the chunk size
+whatever the history length. With workers > 1 the tickers are split into
+shards of similar window counts and scored in separate processes (each opens
+the memory-mapped store itself and uses cores // workers torch threads).
+
+Reported per ticker and period (month / quarter / year of the target date):
+ - mae, mape (%):         next-close error in price units
+ - directional_accuracy:  share of days where the predicted move (vs the last
+                          close of the window) has the sign of the real move
+                          (days without a move are not counted)
+ - naive_mae:             MAE of the persistence baseline (tomorrow = today)
+
+Usage:
+    report = run_backtest(BacktestConfig(period="Q"))
+    python backtest.py --period Q --workers 4 --out backtest.csv
+"""
+
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+
+from forecaster import CLOSE_IDX, WINDOW, inverse_close
+
+PERIODS = ("M", "Q", "Y")
+# running sums per (ticker, period): windows, |err|, |err| / |actual|, direction hits, direction days, naive |err|
+_SUMS = ("n", "abs_err", "ape", "dir_hits", "dir_n", "naive_abs_err")
+
+
+@dataclass
+class BacktestConfig:
+    period: str = "M"                      # M, Q or Y
+    chunk_windows: int = 8192              # windows per gathered chunk / forward pass
+    workers: int = 1                       # processes; >1 shards tickers across CPU cores
+    threads: Optional[int] = None          # torch threads per worker (default: cores // workers)
+    tickers: Optional[Sequence[str]] = None
+    start: Optional[str] = None            # first / last target date (YYYY-MM-DD), inclusive
+    end: Optional[str] = None
+
+
+# -----------------------------
+# Windows
+# -----------------------------
+def window_view(features: np.ndarray) -> np.ndarray:
+    """(rows - 29, 30, F) view of every 30-row window of features; no copy."""
+    return np.lib.stride_tricks.sliding_window_view(features, WINDOW, axis=0).transpose(0, 2, 1)
+
+
+def ticker_ranges(store, encoder, tickers: Optional[Sequence[str]] = None, start: Optional[str] = None,
+                  end: Optional[str] = None) -> List[Tuple[str, int, int]]:
+    """
+    (ticker, first window start row, window count) per ticker known to the
+    encoder, limited to windows whose target date lies in [start, end].
+    """
+    known = set(encoder.classes_)
+    out = []
+    for t in (tickers or store.tickers):
+        if t not in known or t not in store:
+            continue
+        offset, length = store.index[t]
+        if length <= WINDOW:
+            continue
+        targets = store.dates[offset + WINDOW:offset + length]
+        lo = np.searchsorted(targets, np.datetime64(start, "D")) if start else 0
+        hi = np.searchsorted(targets, np.datetime64(end, "D"), side="right") if end else len(targets)
+        if hi > lo:
+            out.append((t, offset + int(lo), int(hi - lo)))
+    return out
+
+
+def iter_chunks(ranges: List[Tuple[str, int, int]], chunk_windows: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """(range index per window, window start rows) in chunks of at most chunk_windows (may span tickers)."""
+    ids, starts, size = [], [], 0
+    for i, (_, first, count) in enumerate(ranges):
+        pos = 0
+        while pos < count:
+            take = min(count - pos, chunk_windows - size)
+            ids.append(np.full(take, i, dtype=np.int32))
+            starts.append(np.arange(first + pos, first + pos + take, dtype=np.int64))
+            size += take
+            pos += take
+            if size == chunk_windows:
+                yield np.concatenate(ids), np.concatenate(starts)
+                ids, starts, size = [], [], 0
+    if size:
+        yield np.concatenate(ids), np.concatenate(starts)
+
+
+def predict_windows(model, scaler, store, features: np.ndarray, ranges: List[Tuple[str, int, int]],
+                    chunk_windows: int = 8192, device: Optional[torch.device] = None):
+    """
+    Yield (range ids, target dates, predicted close, actual close, last window close)
+    per chunk, all in price units.
+    """
+    device = device or torch.device("cpu")
+    view = window_view(features)
+    closes = store.values[:, CLOSE_IDX]
+    with torch.inference_mode():
+        for ids, starts in iter_chunks(ranges, chunk_windows):
+            X = torch.from_numpy(np.ascontiguousarray(view[starts], dtype=np.float32)).to(device)
+            pred = inverse_close(model(X).reshape(-1).cpu().numpy(), scaler)
+            target = starts + WINDOW
+            yield (ids, store.dates[target], pred, closes[target].astype(np.float64),
+                   closes[target - 1].astype(np.float64))
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+def period_codes(dates: np.ndarray, period: str) -> np.ndarray:
+    """Integer period of each datetime64 date: months / quarters / years since 1970."""
+    if period == "Y":
+        return dates.astype("datetime64[Y]").astype(np.int64)
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    return months // 3 if period == "Q" else months
+
+
+def period_label(code: int, period: str) -> str:
+    if period == "Y":
+        return str(1970 + code)
+    if period == "Q":
+        return f"{1970 + code // 4}Q{code % 4 + 1}"
+    return str(np.datetime64(int(code), "M"))
+
+
+class MetricsAccumulator:
+    """Running error sums keyed by (ticker, period code); merge() combines shards."""
+    def __init__(self, period: str = "M"):
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {PERIODS}")
+        self.period = period
+        self.sums: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def add(self, tickers: Sequence[str], ids: np.ndarray, dates: np.ndarray, pred: np.ndarray,
+            actual: np.ndarray, prev: np.ndarray) -> None:
+        err = np.abs(pred - actual)
+        move = np.sign(actual - prev)
+        values = np.stack([np.ones_like(err), err, err / np.maximum(np.abs(actual), 1e-8),
+                           (np.sign(pred - prev) == move) & (move != 0), move != 0, np.abs(prev - actual)], axis=1)
+        keys = (ids.astype(np.int64) << 32) | (period_codes(dates, self.period) & 0xFFFFFFFF)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        totals = np.zeros((len(uniq), len(_SUMS)))
+        np.add.at(totals, inverse, values)
+        for key, row in zip(uniq.tolist(), totals):
+            k = (tickers[key >> 32], np.int32(key & 0xFFFFFFFF).item())
+            if k in self.sums:
+                self.sums[k] += row
+            else:
+                self.sums[k] = row
+
+    def merge(self, other: "MetricsAccumulator") -> "MetricsAccumulator":
+        for k, row in other.sums.items():
+            self.sums[k] = self.sums[k] + row if k in self.sums else row
+        return self
+
+    def frame(self) -> pd.DataFrame:
+        """Per (ticker, period) metrics, sorted by ticker then period."""
+        keys = sorted(self.sums)
+        sums = pd.DataFrame([self.sums[k] for k in keys], columns=list(_SUMS))
+        sums.insert(0, "period", [period_label(c, self.period) for _, c in keys])
+        sums.insert(0, "ticker", [t for t, _ in keys])
+        return _metrics(sums, ["ticker", "period"])
+
+
+def _metrics(sums: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    n = sums["n"].to_numpy()
+    out = sums[keys].copy()
+    out["windows"] = n.astype(np.int64)
+    out["mae"] = sums["abs_err"] / n
+    out["mape"] = sums["ape"] / n * 100
+    out["directional_accuracy"] = sums["dir_hits"] / sums["dir_n"].where(sums["dir_n"] > 0)
+    out["direction_days"] = sums["dir_n"].astype(np.int64)
+    out["naive_mae"] = sums["naive_abs_err"] / n
+    return out.reset_index(drop=True)
+
+
+def summarize(report: pd.DataFrame) -> pd.DataFrame:
+    """Collapse a per-period report to one row per ticker plus an "ALL" row."""
+    n = report["windows"]
+    sums = pd.DataFrame({"ticker": report["ticker"], "n": n, "abs_err": report["mae"] * n,
+                         "ape": report["mape"] / 100 * n, "naive_abs_err": report["naive_mae"] * n,
+                         "dir_hits": report["directional_accuracy"].fillna(0) * report["direction_days"],
+                         "dir_n": report["direction_days"]})
+    per_ticker = sums.groupby("ticker", sort=True).sum(numeric_only=True).reset_index()
+    total = sums.sum(numeric_only=True).to_frame().T.assign(ticker="ALL")
+    return _metrics(pd.concat([per_ticker, total], ignore_index=True), ["ticker"])
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def _score(registry, ranges, config: BacktestConfig) -> MetricsAccumulator:
+    acc = MetricsAccumulator(config.period)
+    names = [t for t, _, _ in ranges]
+    for ids, dates, pred, actual, prev in predict_windows(registry.model, registry.scaler, registry.store,
+                                                         registry.features, ranges, config.chunk_windows,
+                                                         registry.device):
+        acc.add(names, ids, dates, pred, actual, prev)
+    return acc
+
+
+def _worker(base_dir: str, data_path: str, backend: str, ranges, config: BacktestConfig, threads: int):
+    from model_registry import ModelRegistry
+    torch.set_num_threads(threads)
+    registry = ModelRegistry(base_dir=base_dir, data_path=data_path, backend=backend, device=torch.device("cpu"))
+    return _score(registry, ranges, config).sums
+
+
+def shard(ranges: List[Tuple[str, int, int]], n: int) -> List[List[Tuple[str, int, int]]]:
+    """Split ticker ranges into n shards of similar window counts (largest first, greedy)."""
+    shards: List[List[Tuple[str, int, int]]] = [[] for _ in range(n)]
+    loads = [0] * n
+    for r in sorted(ranges, key=lambda r: -r[2]):
+        i = loads.index(min(loads))
+        shards[i].append(r)
+        loads[i] += r[2]
+    return [s for s in shards if s]
+
+
+def run_backtest(config: Optional[BacktestConfig] = None, registry=None) -> pd.DataFrame:
+    """Per (ticker, period) backtest report (see module docstring)."""
+    from model_registry import get_registry
+    config = config or BacktestConfig()
+    registry = registry or get_registry()
+    ranges = ticker_ranges(registry.store, registry.encoder, config.tickers, config.start, config.end)
+    acc = MetricsAccumulator(config.period)
+    if config.workers <= 1 or len(ranges) <= 1:
+        if config.threads:
+            torch.set_num_threads(config.threads)
+        return _score(registry, ranges, config).frame() if ranges else acc.frame()
+
+    shards = shard(ranges, config.workers)
+    threads = config.threads or max(1, (os.cpu_count() or 1) // len(shards))
+    registry.features  # build features.npy once here rather than racing in every worker
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                                      else "spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=ctx) as pool:
+        futures = [pool.submit(_worker, registry.base_dir, registry.data_path, registry.resolved_backend(), s,
+                               replace(config, workers=1), threads) for s in shards]
+        for f in futures:
+            part = MetricsAccumulator(config.period)
+            part.sums = f.result()
+            acc.merge(part)
+    return acc.frame()
+
+
+if __name__ == "__main__":
+    import time
+    from model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the LSTM forecaster.")
+    parser.add_argument("--data", default="all_stocks.csv", help="CSV or ingest.py Parquet root")
+    parser.add_argument("--period", choices=PERIODS, default="M")
+    parser.add_argument("--tickers", nargs="*", default=None)
+    parser.add_argument("--start", default=None, help="first target date (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="last target date (YYYY-MM-DD)")
+    parser.add_argument("--chunk", type=int, default=8192, help="windows per chunk")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--out", default=None, help="write the per-period report to this CSV")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    cfg = BacktestConfig(period=args.period, chunk_windows=args.chunk, workers=args.workers, threads=args.threads,
+                         tickers=args.tickers, start=args.start, end=args.end)
+    report = run_backtest(cfg, ModelRegistry(data_path=args.data, device=torch.device("cpu")))
+    elapsed = time.perf_counter() - t0
+    if args.out:
+        report.to_csv(args.out, index=False)
+    with pd.option_context("display.width", 120, "display.float_format", "{:.4f}".format):
+        print(summarize(report).to_string(index=False))
+    print(f"\n{int(report['windows'].sum())} windows, {len(report)} ticker-periods in {elapsed:.2f}s"
+          + (f" -> {args.out}" if args.out else ""))
@@ -0,0 +1,107 @@
+"""
+bench_backtest.py
+
+backtest.py vs the per-date loop it replaces.
+
+1. legacy: for a sample of historical dates, slice the ticker's 30 rows before
+   the date, prepare_input() and predict_next_close() one window at a time
+   (test_model.py's reference path); the time per window is extrapolated to
+   every window of the data set
+2. backtest: the whole history through predict_windows (strided view,
+   chunked batches, bulk inverse scaling), timed end to end for each chunk
+   size and worker count, with the RSS growth while it runs
+
+The sampled windows are also predicted by the backtest path and the largest
+absolute difference is reported (float32 features vs the float64 reference).
+
+Usage:
+  python bench_backtest.py
+  python bench_backtest.py --data market_data --sample 500 --workers 1 2 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+from backtest import BacktestConfig, predict_windows, run_backtest, ticker_ranges
+from forecaster import WINDOW
+from model_registry import ModelRegistry
+from test_model import predict_next_close, prepare_input
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def legacy(registry, ranges, sample: int, seed: int):
+    """(seconds per window, {start row: prediction}) for `sample` random windows."""
+    rng = np.random.default_rng(seed)
+    store = registry.store
+    history = {t: store.frame(t) for t, _, _ in ranges}
+    picks = []
+    for _ in range(sample):
+        t, first, count = ranges[rng.integers(len(ranges))]
+        picks.append((t, first + int(rng.integers(count))))
+    preds = {}
+    model = registry.model
+    t0 = time.perf_counter()
+    for t, start in picks:
+        offset = store.index[t][0]
+        df = history[t]
+        # the reference loop: rows strictly before the target date, last 30 of them
+        target_date = pd.Timestamp(store.dates[start + WINDOW])
+        window = df[df['Date'] < target_date].tail(WINDOW)
+        assert len(window) == WINDOW and window.index[0] == start - offset
+        X = prepare_input(window, t, registry.scaler, registry.encoder)
+        preds[start] = predict_next_close(model, X, registry.scaler)
+    return (time.perf_counter() - t0) / max(len(picks), 1), preds
+
+
+def main(args) -> None:
+    registry = ModelRegistry(data_path=args.data, backend="eager", device=torch.device("cpu"))
+    ranges = ticker_ranges(registry.store, registry.encoder)
+    total = sum(n for _, _, n in ranges)
+    registry.features  # build / map features.npy outside the timings
+    print(f"{len(ranges)} tickers, {total} windows, {torch.get_num_threads()} torch threads\n")
+
+    per_window, ref = legacy(registry, ranges, args.sample, args.seed)
+    print(f"legacy prepare_input loop: {per_window * 1e3:.2f} ms/window "
+          f"-> {per_window * total:,.0f}s for the full history (extrapolated from {len(ref)} windows)")
+
+    # same windows through the backtest path
+    starts = np.array(sorted(ref))
+    got = {}
+    picked = [(f"w{i}", s, 1) for i, s in enumerate(starts)]
+    for ids, _, pred, _, _ in predict_windows(registry.model, registry.scaler, registry.store, registry.features,
+                                              picked, 4096):
+        got.update({int(starts[i]): p for i, p in zip(ids, pred)})
+    diff = max(abs(got[s] - ref[s]) for s in ref)
+    print(f"max |backtest - legacy| over the sample: {diff:.6f}\n")
+
+    print(f"{'backtest':<24} {'seconds':>8} {'windows/s':>11} {'RSS +MB':>8}")
+    for workers in args.workers:
+        for chunk in args.chunks:
+            before = rss_mb()
+            t0 = time.perf_counter()
+            report = run_backtest(BacktestConfig(period="M", chunk_windows=chunk, workers=workers), registry)
+            elapsed = time.perf_counter() - t0
+            assert int(report["windows"].sum()) == total
+            print(f"  chunk {chunk:<6} x{workers} proc   {elapsed:8.2f} {total / elapsed:11.0f} "
+                  f"{rss_mb() - before:8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="all_stocks.csv", help="CSV or ingest.py Parquet root")
+    parser.add_argument("--sample", type=int, default=200, help="windows timed through the legacy loop")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1024, 8192])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+"""
+bench_browser_pool.py
+
+Pages per second for trip.fetch_text with a fresh Chromium per URL versus a
+shared BrowserPool, against a local HTTP fixture server (no network needed).
+
+Requirements:
+  pip install playwright
+  python -m playwright install chromium
+
+Usage:
+  python bench_browser_pool.py
+  python bench_browser_pool.py --pages 50 --pool-size 8
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from browser_pool import BrowserPool
+from trip import fetch_text
+
+# 1x1 transparent gif, served for every <img> so image blocking has something to skip
+_GIF = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+        b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves /page/<n> as a small article with images and /img/<n>.gif as a tiny gif."""
+    def do_GET(self):
+        if self.path.startswith("/img/"):
+            body, ctype = _GIF, "image/gif"
+        else:
+            n = self.path.rsplit("/", 1)[-1]
+            imgs = "".join(f'<img src="/img/{n}-{i}.gif">' for i in range(10))
+            paras = "".join(f"<p>Paragraph {i} of fixture article {n} about IBM earnings.</p>" for i in range(30))
+            body = f"<html><head><title>Fixture {n}</title></head><body><nav>Home | Markets</nav>" \
+                   f"<article><h1>Fixture {n}</h1>{imgs}{paras}</article></body></html>"
+            body, ctype = body.encode(), "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+async def run(args) -> None:
+    server, base = start_fixture_server()
+    urls = [f"{base}/page/{i}" for i in range(args.pages)]
+    try:
+        t0 = time.perf_counter()
+        for u in urls[:args.unpooled_pages]:
+            await fetch_text(u)
+        t_plain = time.perf_counter() - t0
+        n_plain = min(args.unpooled_pages, len(urls))
+
+        t0 = time.perf_counter()
+        async with BrowserPool(max_pages=args.pool_size) as pool:
+            t_start = time.perf_counter() - t0
+            texts = await asyncio.gather(*(fetch_text(u, pool=pool) for u in urls))
+        t_pool = time.perf_counter() - t0
+    finally:
+        server.shutdown()
+
+    empty = sum(1 for t in texts if not t)
+    print(f"browser per URL : {n_plain:4d} pages in {t_plain:7.2f}s -> {n_plain / t_plain:6.2f} pages/s")
+    print(f"BrowserPool({args.pool_size:2d}): {len(urls):4d} pages in {t_pool:7.2f}s -> {len(urls) / t_pool:6.2f} pages/s "
+          f"(launch {t_start:.2f}s, {empty} empty)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--unpooled-pages", type=int, default=10, help="pages fetched without the pool (slow)")
+    parser.add_argument("--pool-size", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
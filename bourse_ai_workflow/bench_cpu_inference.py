@@ -0,0 +1,100 @@
+"""
+bench_cpu_inference.py
+
+Throughput, memory and accuracy of the CPU inference modes in cpu_inference.py:
+fp32 (default threads), fp32 with --threads, int8 dynamic quantization, and
+int8 + torch.compile.
+
+Windows are sampled from the held-out tail of each ticker's history. Unless
+--data is given, a synthetic history is written with ingest.FakeSource into a
+temporary Parquet root. Every mode is timed even when it would fail the
+accuracy gate, so the table shows what the budget is trading away. Memory is
+the serialized state_dict size plus the process RSS growth while the mode is
+built and run.
+
+Usage:
+  python bench_cpu_inference.py
+  python bench_cpu_inference.py --threads 4 --windows 20000 --data all_stocks.csv
+"""
+
+import argparse
+import io
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import torch
+
+from cpu_inference import CpuInferenceConfig, benchmark, holdout_windows, optimize_for_cpu
+from ingest import FakeSource, ingest
+from model_registry import ModelRegistry
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def model_mb(model) -> float:
+    buf = io.BytesIO()
+    torch.save(getattr(model, "_orig_mod", model).state_dict(), buf)
+    return buf.tell() / 2**20
+
+
+def main(args) -> None:
+    tmpdir = None
+    data = args.data
+    if data is None:
+        tmpdir = tempfile.mkdtemp(prefix="cpu_bench_")
+        data = os.path.join(tmpdir, "market_data")
+        ingest(ModelRegistry(data_path=data).encoder.classes_, root=data, source=FakeSource(), max_workers=4)
+    try:
+        run(args, data)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run(args, data: str) -> None:
+    registry = ModelRegistry(data_path=data, backend="eager", device=torch.device("cpu"))
+    fp32 = registry.model
+    validation = holdout_windows(registry.store, registry.features, n=args.validation)
+    X = np.resize(validation, (args.windows,) + validation.shape[1:])
+    default_threads = torch.get_num_threads()
+    print(f"{len(validation)} held-out validation windows, {len(X)} benchmark windows, batch {args.batch}")
+
+    unbounded = dict(max_mape=float("inf"))  # measure every mode; the budget is applied below
+    modes = [("fp32", CpuInferenceConfig(quantize=False, threads=default_threads, **unbounded)),
+             (f"fp32 x{args.threads}t", CpuInferenceConfig(quantize=False, threads=args.threads, **unbounded)),
+             (f"int8 x{args.threads}t", CpuInferenceConfig(quantize=True, threads=args.threads, **unbounded)),
+             (f"int8+compile x{args.threads}t", CpuInferenceConfig(quantize=True, threads=args.threads,
+                                                                    compile=True, **unbounded))]
+    print(f"{'mode':<22} {'windows/s':>11} {'model MB':>9} {'RSS +MB':>8} {'MAPE %':>8} {'max err':>8}  status")
+    for label, cfg in modes:
+        before = rss_mb()
+        try:
+            model, report = optimize_for_cpu(fp32, cfg, validation, registry.scaler)
+            rate = benchmark(model, X, args.batch, args.repeats)
+        except Exception as e:
+            print(f"{label:<22} skipped ({e.__class__.__name__}: {e})")
+            continue
+        status = "ok" if report.mape <= args.max_mape else f"over {args.max_mape}% budget: would fall back to fp32"
+        print(f"{label:<22} {rate:11.0f} {model_mb(model):9.3f} {rss_mb() - before:8.1f} "
+              f"{report.mape:8.4f} {report.max_abs_error:8.4f}  {status}")
+    torch.set_num_threads(default_threads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=None, help="CSV or Parquet root (default: synthetic)")
+    parser.add_argument("--threads", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--windows", type=int, default=10000)
+    parser.add_argument("--validation", type=int, default=512, help="held-out windows for the accuracy check")
+    parser.add_argument("--max-mape", type=float, default=CpuInferenceConfig.max_mape)
+    parser.add_argument("--batch", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
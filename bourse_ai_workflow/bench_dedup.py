@@ -0,0 +1,224 @@
+"""
+bench_dedup.py
+
+Fetches and LLM calls saved by dedup.py on a recorded fixture.
+
+A fixture is the JSON record of one search: the subqueries, the Serper links
+returned for each, and the raw HTML of every link:
+    {"topic": ..., "subqueries": [...], "serper": {subquery: [links]}, "pages": {url: html}}
+
+The search agent (sequential and pipeline) is replayed over it with dedup off
+and on, through the real fetch_text / extraction path; the fixture's HTTP
+client and a counting fake LLM stand in for the network. Reported: page
+fetches, summarize calls, results and the subqueries credited with results.
+
+Without --fixture a synthetic fixture is generated: a dozen stories, each
+published by a wire service and syndicated on other sites, reached by
+overlapping subqueries through tracking-parameter, AMP and mobile variants.
+--record captures a real fixture (needs SERPER_API_KEY; TOGETHER_API_KEY for
+LLM-generated subqueries).
+
+Usage:
+  python bench_dedup.py
+  python bench_dedup.py --record fixture_ibm.json --topic "IBM stock"
+  python bench_dedup.py --fixture fixture_ibm.json --max-links 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+
+import trip
+from dedup import Deduplicator
+from pipeline import PipelineConfig
+
+SITES = ["reuters.com", "finance.yahoo.com", "marketscreener.com", "investing.com", "nasdaq.com", "morningstar.com"]
+VOCAB = ("IBM shares revenue guidance analysts quarter margin outlook investors dividend buyback cloud demand "
+         "earnings growth forecast segment consulting software hardware inflation rates market Krishna mainframe "
+         "hybrid Red Hat acquisition billion percent fiscal year expects said chief executive results estimates "
+         "Wall Street trading session rose fell compared previous strong weak contracts clients generative AI "
+         "bookings free cash flow debt rating Moody's Fed yields stocks Nasdaq S&P index futures week").split()
+TOPICS = ["earnings", "guidance", "dividend", "acquisition", "ai-bookings", "mainframe", "layoffs", "rating",
+          "buyback", "consulting", "cloud", "outlook"]
+
+
+# === synthetic fixture ===
+def _story(rng: random.Random) -> str:
+    return "\n".join(" ".join(rng.choice(VOCAB) for _ in range(rng.randint(15, 30))) + "."
+                     for _ in range(rng.randint(6, 14)))
+
+
+def _page(site: str, title: str, body: str) -> str:
+    paras = "".join(f"<p>{line}</p>" for line in body.split("\n"))
+    menu = "".join(f'<li><a href="https://{site}/s/{i}">Section {i}</a></li>' for i in range(40))
+    return (f"<html><head><title>{title}</title><script>var site='{site}';</script></head><body>"
+            f"<header><ul class='menu'>{menu}</ul></header><article><h1>{title}</h1>{paras}</article>"
+            f"<footer><p>Copyright {site}. All rights reserved.</p></footer></body></html>")
+
+
+def _variant(rng: random.Random, url: str) -> str:
+    kind = rng.choice(["plain", "utm", "amp", "mobile", "fragment"])
+    if kind == "utm":
+        return url + f"?utm_source=twitter&utm_medium=social&utm_campaign=c{rng.randint(1, 9)}"
+    if kind == "amp":
+        return url.rstrip("/") + "/amp/"
+    if kind == "mobile":
+        return url.replace("https://www.", "https://m.")
+    if kind == "fragment":
+        return url + "#comments"
+    return url
+
+
+def synthetic_fixture(seed: int = 0, n_subqueries: int = 4, links_per_query: int = 10):
+    rng = random.Random(seed)
+    pages, stories = {}, []
+    for topic in TOPICS:
+        body = _story(rng)
+        title = f"IBM {topic} update"
+        copies = []
+        for site in rng.sample(SITES, rng.randint(1, 3)):
+            url = f"https://www.{site}/markets/ibm-{topic}-{rng.randint(1000, 9999)}/"
+            # syndicated copies differ in byline / tagline lines around the wire text
+            text = f"{site.split('.')[0].title()} staff report.\n{body}\nReporting by newsroom; editing by desk."
+            pages[url] = _page(site, title, text)
+            copies.append(url)
+        stories.append(copies)
+    subqueries = [f"IBM stock {angle} today" for angle in ("performance", "news", "analyst views", "market reaction",
+                                                           "economic factors", "social media")][:n_subqueries]
+    serper = {}
+    for sub in subqueries:
+        links = []
+        for copies in rng.sample(stories, links_per_query):
+            url = rng.choice(copies)
+            links.append(_variant(rng, url))
+            pages[links[-1]] = pages[url]  # variants serve the same page
+        serper[sub] = links
+    return {"topic": "IBM stock", "subqueries": subqueries, "serper": serper, "pages": pages}
+
+
+# === recording ===
+async def record_fixture(topic: str, n_subqueries: int, num_results: int):
+    from dedup import normalize_url
+    from http_client import get_default_client
+    llm = trip.TogetherChat().aget if trip.TOGETHER_API_KEY else _fallback_llm
+    subqueries = await trip.generate_subqueries(llm, topic, n=n_subqueries)
+    serper = {sub: await trip.asearch_serper(sub, num_results=num_results) for sub in subqueries}
+    client = get_default_client()
+    pages, seen = {}, {}
+    for links in serper.values():
+        for url in links:
+            if url in pages:
+                continue
+            key = normalize_url(url)
+            if key in seen:  # variants resolve to the same page; keep the first copy
+                pages[url] = pages[seen[key]]
+                continue
+            try:
+                resp = await client.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
+                resp.raise_for_status()
+                pages[url], seen[key] = resp.text, url
+            except Exception as e:
+                print(f"  skip {url}: {e}")
+    return {"topic": topic, "subqueries": subqueries, "serper": serper, "pages": pages}
+
+
+async def _fallback_llm(messages):
+    return ""
+
+
+# === replay ===
+class _Response:
+    def __init__(self, text="", data=None, status=200):
+        self.text, self._data, self.status_code = text, data, status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._data
+
+
+class FixtureHttpClient:
+    """Serper results and pages from the fixture; counts page fetches."""
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.fetches = 0
+
+    async def post(self, url, json=None, **kwargs):
+        links = self.fixture["serper"].get(json["q"], [])[:json.get("num", 10)]
+        return _Response(data={"organic": [{"link": link} for link in links]})
+
+    async def get(self, url, **kwargs):
+        self.fetches += 1
+        html = self.fixture["pages"].get(url)
+        return _Response(text=html or "", status=200 if html else 404)
+
+
+class CountingLLM:
+    def __init__(self, subqueries):
+        self.subqueries = subqueries
+        self.summaries = 0
+
+    async def aget(self, messages):
+        if "search queries" in messages[0]["content"]:
+            return "\n".join(self.subqueries)
+        self.summaries += 1
+        await asyncio.sleep(0.001)
+        return "title: stub\nsentiment: neutral\nimpact score: 0.0"
+
+
+async def replay(fixture, concurrent: bool, dedup, max_links: int):
+    http = FixtureHttpClient(fixture)
+    llm = CountingLLM(fixture["subqueries"])
+    results = await trip.search_agent_stock(fixture["topic"], llm.aget, serper_api_key="fixture", max_links=max_links,
+                                            n_subqueries=len(fixture["subqueries"]), concurrent=concurrent,
+                                            pipeline_config=PipelineConfig(deadline=None), http_client=http,
+                                            dedup=dedup)
+    return {"fetches": http.fetches, "llm_calls": llm.summaries, "results": len(results),
+            "queries": len({r["query"] for r in results})}
+
+
+async def main(fixture, max_links: int):
+    links = sum(len(v[:max_links]) for v in fixture["serper"].values())
+    print(f"fixture: {len(fixture['subqueries'])} subqueries, {links} links (top {max_links}), "
+          f"{len(fixture['pages'])} pages\n")
+    print(f"  {'mode':<22} {'fetches':>8} {'LLM calls':>10} {'results':>8} {'queries':>8}")
+    for concurrent in (False, True):
+        base = await replay(fixture, concurrent, False, max_links)
+        dedup = Deduplicator()
+        new = await replay(fixture, concurrent, dedup, max_links)
+        name = "pipeline" if concurrent else "sequential"
+        for label, r in ((f"{name}, no dedup", base), (f"{name}, dedup", new)):
+            print(f"  {label:<22} {r['fetches']:>8} {r['llm_calls']:>10} {r['results']:>8} {r['queries']:>8}")
+        print(f"  -> saved {base['fetches'] - new['fetches']} fetches "
+              f"({1 - new['fetches'] / max(base['fetches'], 1):.0%}), "
+              f"{base['llm_calls'] - new['llm_calls']} LLM calls "
+              f"({1 - new['llm_calls'] / max(base['llm_calls'], 1):.0%}); {dedup.stats}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", default=None, help="recorded fixture JSON (default: synthetic)")
+    parser.add_argument("--record", default=None, help="record a live fixture to this path and exit")
+    parser.add_argument("--topic", default="IBM stock")
+    parser.add_argument("--subqueries", type=int, default=4)
+    parser.add_argument("--max-links", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger("stock_search_agent").setLevel(logging.WARNING)
+
+    if args.record:
+        fx = asyncio.run(record_fixture(args.topic, args.subqueries, args.max_links))
+        with open(args.record, "w", encoding="utf-8") as f:
+            json.dump(fx, f)
+        print(f"recorded {len(fx['pages'])} pages for {len(fx['subqueries'])} subqueries -> {args.record}")
+    else:
+        if args.fixture:
+            with open(args.fixture, encoding="utf-8") as f:
+                fx = json.load(f)
+        else:
+            fx = synthetic_fixture(args.seed, args.subqueries)
+        asyncio.run(main(fx, args.max_links))
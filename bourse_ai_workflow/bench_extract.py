@@ -0,0 +1,155 @@
+"""
+bench_extract.py
+
+HTML extraction: the original BeautifulSoup get_text() vs extract.py.
+
+For every page of the corpus:
+ 1. CPU ms/page and pages/s of the legacy parse and of each available backend
+ 2. event-loop lag while a batch of pages is parsed: legacy on the loop vs
+    Extractor.aextract (process pool), measured by a 5 ms heartbeat coroutine
+ 3. prompt tokens per summary: text[:15000] of the legacy text vs the
+    token-budgeted excerpt of the main content
+
+The corpus is a directory of saved pages (*.html, e.g. wget'd news articles);
+without --corpus a synthetic set of news pages (menus, cookie banner, sidebar,
+inline scripts, article, footer) is generated.
+
+Usage:
+  python bench_extract.py
+  python bench_extract.py --corpus saved_pages/ --workers 4
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import random
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from extract import BACKENDS, Extractor, _AVAILABLE, budget_excerpt, count_tokens, extract_text
+
+WORDS = ("shares revenue guidance analysts quarter margin outlook investors dividend buyback cloud demand "
+         "earnings growth forecast segment consulting software hardware inflation rates market").split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def synthetic_page(rng: random.Random) -> str:
+    menu = "".join(f'<li><a href="/s/{i}">Section {i}</a></li>' for i in range(rng.randint(30, 80)))
+    related = "".join(f'<li><a href="/a/{i}">{_sentence(rng, 8)}</a></li>' for i in range(rng.randint(10, 30)))
+    script = "<script>var cfg = {" + ",".join(f'"k{i}": {i}' for i in range(rng.randint(500, 3000))) + "};</script>"
+    article = "".join(f"<p>{' '.join(_sentence(rng, rng.randint(10, 25)) for _ in range(rng.randint(2, 5)))}</p>"
+                      for _ in range(rng.randint(8, 30)))
+    return (f"<html><head><title>IBM news</title>{script}<style>body{{margin:0}}</style></head><body>"
+            f'<div class="cookie-banner">We use cookies to improve your experience. Accept all cookies?</div>'
+            f"<header><ul class='menu'>{menu}</ul></header>"
+            f'<div class="layout"><div class="share-bar"><a href="#">Share</a><a href="#">Tweet</a></div>'
+            f"<article><h1>{_sentence(rng, 9)}</h1>{article}</article>"
+            f'<aside class="sidebar"><h3>Related</h3><ul>{related}</ul></aside></div>'
+            f'<div class="newsletter">Subscribe to our newsletter for daily market updates and analysis.</div>'
+            f"<footer><ul>{menu}</ul><p>Copyright 2024 Example Media. All rights reserved.</p></footer>"
+            f"{script}</body></html>")
+
+
+def load_corpus(path, pages: int, seed: int):
+    if path:
+        files = sorted(glob.glob(os.path.join(path, "*.html")) + glob.glob(os.path.join(path, "*.htm")))
+        out = []
+        for fp in files[:pages] if pages else files:
+            with open(fp, encoding="utf-8", errors="ignore") as f:
+                out.append(f.read())
+        return out
+    rng = random.Random(seed)
+    return [synthetic_page(rng) for _ in range(pages or 200)]
+
+
+def legacy_text(html: str) -> str:
+    return BeautifulSoup(html, "html.parser").get_text(separator="\n", strip=True)
+
+
+def cpu_bench(corpus):
+    rows = [("legacy bs4 get_text", legacy_text)]
+    rows += [(f"extract[{name}]", BACKENDS[name]) for name, ok in _AVAILABLE.items() if ok]
+    for label, fn in rows:
+        c0, w0 = time.process_time(), time.perf_counter()
+        for html in corpus:
+            fn(html)
+        cpu, wall = time.process_time() - c0, time.perf_counter() - w0
+        print(f"  {label:<24} {cpu / len(corpus) * 1e3:8.2f} CPU ms/page  {len(corpus) / wall:8.1f} pages/s")
+
+
+async def _with_heartbeat(work):
+    lags = []
+    stop = asyncio.Event()
+
+    async def heartbeat():
+        while not stop.is_set():
+            t = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - t - 0.005)
+
+    hb = asyncio.ensure_future(heartbeat())
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await hb
+    return elapsed, lags
+
+
+async def loop_bench(corpus, workers: int):
+    async def on_loop():
+        for html in corpus:
+            legacy_text(html)
+            await asyncio.sleep(0)
+
+    extractor = Extractor(max_workers=workers, inline_below=0)
+    await extractor.aextract(corpus[0])  # start the pool outside the measurement
+
+    async def off_loop():
+        await asyncio.gather(*(extractor.aextract(html) for html in corpus))
+
+    try:
+        for label, work in (("legacy, on the loop", on_loop), (f"extract, pool x{workers}", off_loop)):
+            elapsed, lags = await _with_heartbeat(work)
+            lags = sorted(lags) or [0.0]
+            print(f"  {label:<24} {len(corpus) / elapsed:8.1f} pages/s  loop lag p50 "
+                  f"{lags[len(lags) // 2] * 1e3:7.2f} ms  max {lags[-1] * 1e3:7.2f} ms  ({len(lags)} ticks)")
+    finally:
+        extractor.close()
+
+
+def token_bench(corpus, budget):
+    old = [count_tokens(legacy_text(html)[:15000]) for html in corpus]
+    new = [count_tokens(budget_excerpt(extract_text(html), budget=budget, max_chars=15000)) for html in corpus]
+    print(f"  legacy text[:15000]        mean {statistics.mean(old):7.0f} tokens  max {max(old):6d}")
+    print(f"  main content, budgeted     mean {statistics.mean(new):7.0f} tokens  max {max(new):6d}"
+          f"  ({1 - sum(new) / max(sum(old), 1):.0%} fewer)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=None, help="directory of saved *.html pages (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=0, help="limit / synthetic page count (default 200)")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--budget", type=int, default=None, help="token budget (default: extract.DEFAULT_TOKEN_BUDGET)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.pages, args.seed)
+    if not corpus:
+        parser.error("no pages found")
+    size = sum(len(h) for h in corpus) / len(corpus) / 1024
+    print(f"{len(corpus)} pages, mean {size:.0f} KiB, {os.cpu_count()} CPU(s)\n")
+    print("CPU per page:")
+    cpu_bench(corpus)
+    print("\nEvent loop while parsing:")
+    asyncio.run(loop_bench(corpus, args.workers))
+    print("\nPrompt tokens per summary:")
+    token_bench(corpus, args.budget)
@@ -0,0 +1,106 @@
+"""
+bench_features.py
+
+Parity check and microbenchmark for features.py.
+
+Parity: the vectorized feature matrix must reproduce the per-window pandas path
+(prepare_input in test_model.py, mirrored by Forecaster's DataFrame path) for
+every ticker's last window. The store keeps OHLCV as float32, so scaled prices
+may differ from the float64 CSV path by float32 rounding (~1e-7); the
+calendar/ticker features must match exactly.
+
+Benchmark: per-window pandas features vs one vectorized pass over the whole
+history vs gathering windows from the cached features.npy.
+
+Usage:
+  python bench_features.py                       # synthetic history, trained scaler
+  python bench_features.py --csv all_stocks.csv  # real data + trained encoder
+  python bench_features.py --tickers 2000 --rows 2500
+"""
+
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from bench_forecaster import synthetic_history
+from features import build_features, compute_features, load_features, row_ticker_codes
+from forecaster import WINDOW, Forecaster, LSTMModel, FEATURE_COLS
+from window_store import build_window_store, write_window_store
+
+TOLERANCE = 1e-6
+
+
+def main(args) -> None:
+    with open("second_model_scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+    tmpdir = tempfile.mkdtemp(prefix="features_bench_")
+    try:
+        run(args, scaler, tmpdir)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run(args, scaler, tmpdir: str) -> None:
+    if args.csv:
+        with open("second_model_encoder.pkl", "rb") as f:
+            encoder = pickle.load(f)
+        history = pd.read_csv(args.csv, parse_dates=['Date'])
+        store = build_window_store(args.csv, os.path.join(tmpdir, "store"))
+    else:
+        history = synthetic_history(args.tickers, args.rows)
+        encoder = LabelEncoder().fit(history['Ticker'])
+        store = write_window_store(history, os.path.join(tmpdir, "store"))
+    tickers = [t for t in encoder.classes_ if store.length(t) >= WINDOW]
+    print(f"{len(store)} rows, {len(tickers)} tickers, store in {store.store_dir}")
+
+    # --- parity against the per-window pandas path ---
+    reference = Forecaster(LSTMModel(len(FEATURE_COLS)), scaler, encoder, history)
+    X_ref, kept = reference.build_batch(tickers)
+    feats = load_features(store, scaler, encoder)
+    X_new = np.asarray(feats[store.window_index(kept, WINDOW)])
+    diff = np.abs(X_ref - X_new)
+    print(f"parity: max |diff| scaled OHLCV = {diff[..., :5].max():.2e}, "
+          f"ticker/calendar = {diff[..., 5:].max():.2e}")
+    assert diff[..., :5].max() <= TOLERANCE and diff[..., 5:].max() == 0.0, "feature parity failed"
+
+    # --- microbenchmark ---
+    sample = tickers[:args.sample]
+    t0 = time.perf_counter()
+    for t in sample:
+        reference.build_batch([t])
+    t_pandas = (time.perf_counter() - t0) / len(sample)
+
+    codes = row_ticker_codes(store, encoder)
+    t0 = time.perf_counter()
+    compute_features(store.values, store.dates, codes, scaler)
+    t_vec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    build_features(store, scaler, encoder)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    np.asarray(feats[store.window_index(tickers, WINDOW)])
+    t_gather = time.perf_counter() - t0
+
+    rows_per_s = len(store) / t_vec
+    print(f"pandas per window      : {t_pandas * 1e3:8.3f} ms/window ({1 / t_pandas:,.0f} windows/s)")
+    print(f"vectorized full history: {t_vec:8.3f} s ({rows_per_s:,.0f} rows/s)")
+    print(f"build features.npy     : {t_build:8.3f} s")
+    print(f"gather {len(tickers):6d} windows  : {t_gather * 1e3:8.3f} ms ({len(tickers) / t_gather:,.0f} windows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="use a real all_stocks.csv with the trained encoder")
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=2500)
+    parser.add_argument("--sample", type=int, default=50, help="windows timed on the pandas path")
+    main(parser.parse_args())
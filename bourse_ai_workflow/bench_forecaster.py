@@ -0,0 +1,89 @@
+"""
+bench_forecaster.py
+
+Throughput of the batched Forecaster (tickers per second) on CPU at several
+universe sizes, against the per-ticker loop test_model.py used to run.
+
+The trained encoder only knows a handful of symbols, so the benchmark builds a
+synthetic history (random walks) for N made-up tickers and fits a LabelEncoder
+on them; the trained LSTM weights and scaler are used as-is.
+
+Usage:
+  python bench_forecaster.py
+  python bench_forecaster.py --sizes 1 100 10000 --batch-size 2048 --rows 40
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.preprocessing import LabelEncoder
+
+from forecaster import FEATURE_COLS, NUM_COLS, WINDOW, Forecaster, LSTMModel
+
+
+def synthetic_history(n_tickers: int, rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-10-10", periods=rows)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_tickers, rows)), axis=1))
+    df = pd.DataFrame({
+        'Date': np.tile(dates, n_tickers),
+        'Open': (close * (1 + rng.normal(0, 0.003, close.shape))).ravel(),
+        'High': (close * 1.01).ravel(),
+        'Low': (close * 0.99).ravel(),
+        'Close': close.ravel(),
+        'Volume': rng.integers(1_000_000, 50_000_000, close.size),
+        'Ticker': np.repeat([f"T{i:06d}" for i in range(n_tickers)], rows),
+    })
+    return df
+
+
+def per_ticker_loop(fc: Forecaster, tickers) -> float:
+    """Old behaviour: one (1, 30, 10) forward pass and one inverse_transform per ticker."""
+    t0 = time.perf_counter()
+    for t in tickers:
+        X, _ = fc.build_batch([t])
+        fc.predict_batch(X)
+    return time.perf_counter() - t0
+
+
+def main(args) -> None:
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    model = LSTMModel(input_size=len(FEATURE_COLS))
+    model.load_state_dict(torch.load("second_model_lstm.pth", map_location="cpu"))
+    with open("second_model_scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+
+    print(f"torch threads={torch.get_num_threads()} batch_size={args.batch_size} window={WINDOW}x{len(FEATURE_COLS)}")
+    print(f"{'N':>7} {'build s':>9} {'infer s':>9} {'total s':>9} {'tickers/s':>11} {'loop tickers/s':>15}")
+    for n in args.sizes:
+        history = synthetic_history(n, args.rows)
+        history[NUM_COLS] = history[NUM_COLS].astype(float)
+        encoder = LabelEncoder().fit(history['Ticker'])
+        fc = Forecaster(model, scaler, encoder, history, batch_size=args.batch_size, device=torch.device("cpu"))
+        tickers = list(encoder.classes_)
+
+        fc.predict(tickers[:1])  # warm-up
+        t0 = time.perf_counter()
+        X, kept = fc.build_batch(tickers)
+        t1 = time.perf_counter()
+        preds = fc.predict_batch(X)
+        t2 = time.perf_counter()
+        assert len(preds) == n
+
+        sample = tickers[:min(n, args.loop_sample)]
+        loop_rate = len(sample) / per_ticker_loop(fc, sample)
+        print(f"{n:>7} {t1 - t0:>9.3f} {t2 - t1:>9.3f} {t2 - t0:>9.3f} {n / (t2 - t0):>11.1f} {loop_rate:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--rows", type=int, default=40, help="history rows per synthetic ticker")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--loop-sample", type=int, default=100, help="tickers timed with the per-ticker loop")
+    main(parser.parse_args())
@@ -0,0 +1,240 @@
+"""
+bench_llm_batch.py
+
+Batched multi-document summarization and streaming in TogetherChat, against a
+local fake LLM server.
+
+The server speaks the chat-completions protocol the Together SDK uses
+(POST /v1/chat/completions, JSON or server-sent events with stream=true) and
+answers summarize prompts with JSON summaries: one object for a single
+document, {"summaries": [...]} for a batched prompt. Its latency model is a
+fixed per-request overhead, a prefill cost per prompt token and a decode cost
+per output token, with a limited number of concurrent requests (the
+provider's rate limit).
+
+1. report: --subqueries x --docs short documents summarized with
+   summarize_with_llm (one request per document) and summarize_batch_with_llm,
+   sequentially and with --concurrency requests in flight; reported are
+   requests, prompt tokens, wall time, and whether every document got its own
+   summary back
+2. streaming: the same single-document request through TogetherChat.astream;
+   time to first token vs time to the full reply
+
+Usage:
+  python bench_llm_batch.py
+  python bench_llm_batch.py --docs 8 --overhead 0.4 --decode-ms 8 --slots 2
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from extract import count_tokens
+from tracing import Tracer, use_tracer
+
+WORDS = ("shares revenue guidance analysts quarter margin outlook investors dividend buyback cloud demand "
+         "earnings growth forecast segment consulting software hardware inflation rates market").split()
+DOC_RE = re.compile(r"^### Document (\d+)\nSource: (\S+)", re.M)
+SOURCE_RE = re.compile(r"^Source: (\S+)", re.M)
+
+
+# === fake server ===
+class FakeLLMServer:
+    """Chat-completions endpoint with a per-request / per-token latency model and limited slots."""
+    def __init__(self, overhead: float, prefill_ms: float, decode_ms: float, slots: int, port: int = 0):
+        self.overhead, self.prefill_ms, self.decode_ms = overhead, prefill_ms, decode_ms
+        self.slots = threading.Semaphore(slots)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server.slots:
+                    server.respond(self, body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def reply(prompt: str) -> str:
+        def one(url: str, doc=None):
+            rng = random.Random(url)
+            sentiment = rng.choice(["bullish", "neutral", "bearish"])
+            obj = {"title": f"Story at {url}", "date": "2025-10-20", "symbols": ["IBM"], "companies": ["IBM"],
+                   "key_facts": [" ".join(rng.choice(WORDS) for _ in range(8)) for _ in range(4)],
+                   "sentiment": sentiment, "sentiment_reason": " ".join(rng.choice(WORDS) for _ in range(10)),
+                   "impact_score": round(rng.uniform(-1, 1), 2)}
+            return {"doc": doc, **obj} if doc is not None else obj
+        docs = DOC_RE.findall(prompt)
+        if docs:
+            return json.dumps({"summaries": [one(url, int(k)) for k, url in docs]})
+        m = SOURCE_RE.search(prompt)
+        return json.dumps(one(m.group(1) if m else "unknown"))
+
+    def respond(self, handler: BaseHTTPRequestHandler, body) -> None:
+        prompt = "\n".join(m["content"] for m in body["messages"])
+        n_prompt = count_tokens(prompt)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += n_prompt
+        text = self.reply(body["messages"][-1]["content"])
+        pieces = re.findall(r"\S+\s*|\s+", text)  # ~one token each
+        time.sleep(self.overhead + n_prompt * self.prefill_ms / 1e3)
+        base = {"id": "fake", "created": int(time.time()), "model": body["model"]}
+        usage = {"prompt_tokens": n_prompt, "completion_tokens": len(pieces), "total_tokens": n_prompt + len(pieces)}
+        if not body.get("stream"):
+            time.sleep(len(pieces) * self.decode_ms / 1e3)
+            payload = json.dumps({**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}]}).encode()
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        try:
+            for i, piece in enumerate(pieces):
+                time.sleep(self.decode_ms / 1e3)
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": {"role": "assistant", "content": piece},
+                     "finish_reason": "stop" if i == len(pieces) - 1 else None}]}
+                if i == len(pieces) - 1:
+                    chunk["usage"] = usage
+                handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                handler.wfile.flush()
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client abandoned the stream
+
+    def reset(self) -> None:
+        self.requests = self.prompt_tokens = 0
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+
+
+# === workload ===
+def documents(subqueries: int, docs: int, seed: int):
+    rng = random.Random(seed)
+    report = {}
+    for q in range(subqueries):
+        items = []
+        for d in range(docs):
+            paras = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 60))) + "." for _ in range(rng.randint(4, 12))]
+            items.append((f"https://news.example/q{q}/d{d}", "\n".join(paras)))
+        report[f"IBM stock angle {q}"] = items
+    return report
+
+
+async def run_report(llm, report, batched: bool, concurrency: int):
+    import trip
+    gate = asyncio.Semaphore(concurrency)
+    out = {}
+
+    async def per_doc(sub, url, text):
+        async with gate:
+            out[url] = await trip.summarize_with_llm(llm, sub, url, text)
+
+    async def per_sub(sub, docs):
+        for (url, _), s in zip(docs, await trip.summarize_batch_with_llm(llm, sub, docs, gate=gate)):
+            out[url] = s
+
+    if batched:
+        await asyncio.gather(*(per_sub(sub, docs) for sub, docs in report.items()))
+    else:
+        await asyncio.gather(*(per_doc(sub, url, text) for sub, docs in report.items() for url, text in docs))
+    return out
+
+
+def check(report, out) -> int:
+    """Documents whose summary is present and about the right URL."""
+    from summaries import try_parse_summary
+    ok = 0
+    for docs in report.values():
+        for url, _ in docs:
+            s = try_parse_summary(out.get(url) or "", strict=True)
+            ok += bool(s and s.title == f"Story at {url}")
+    return ok
+
+
+async def main(args) -> None:
+    from together import Together
+    import trip
+    server = FakeLLMServer(args.overhead, args.prefill_ms, args.decode_ms, args.slots)
+    try:
+        report = documents(args.subqueries, args.docs, args.seed)
+        n_docs = sum(len(d) for d in report.values())
+        chat = trip.TogetherChat(client=Together(api_key="bench", base_url=server.url))
+        print(f"report: {args.subqueries} subqueries x {args.docs} documents; server: {args.overhead * 1e3:.0f} ms/request, "
+              f"{args.prefill_ms} ms/prompt token, {args.decode_ms} ms/output token, {args.slots} slots\n")
+        print(f"  {'mode':<26} {'requests':>8} {'prompt tok':>11} {'seconds':>8} {'docs ok':>8}")
+        for concurrency in (1, args.concurrency):
+            for batched in (False, True):
+                server.reset()
+                t0 = time.perf_counter()
+                out = await run_report(chat.aget, report, batched, concurrency)
+                elapsed = time.perf_counter() - t0
+                label = f"{'batched' if batched else 'per document'}, {concurrency} in flight"
+                print(f"  {label:<26} {server.requests:>8} {server.prompt_tokens:>11,} {elapsed:>8.2f} "
+                      f"{check(report, out):>5}/{n_docs}")
+
+        sub, docs = next(iter(report.items()))
+        url, text = docs[0]
+        streaming = trip.TogetherChat(client=Together(api_key="bench", base_url=server.url))
+        tracer = Tracer()
+        ttfts, totals = [], []
+        with use_tracer(tracer):
+            for i in range(args.stream_runs):
+                messages = [{"role": "user", "content": f"Query: {sub}\nSource: {url}#{i}\n\n{text}"}]
+                t0 = time.perf_counter()
+                first = None
+                parts = []
+                async for delta in streaming.astream(messages):
+                    if first is None:
+                        first = time.perf_counter() - t0
+                    parts.append(delta)
+                totals.append(time.perf_counter() - t0)
+                ttfts.append(first)
+                assert json.loads("".join(parts))["title"] == f"Story at {url}#{i}"
+        counters = {name: v for (name, _), v in tracer.counters.items()}
+        print(f"\nstreaming ({args.stream_runs} requests): time to first token {sum(ttfts) / len(ttfts) * 1e3:.0f} ms, "
+              f"full reply {sum(totals) / len(totals) * 1e3:.0f} ms (mean); TogetherChat recorded "
+              f"{counters.get('llm_streams', 0):.0f} streams, mean TTFT "
+              f"{counters.get('llm_ttft_seconds', 0) / max(counters.get('llm_streams', 1), 1) * 1e3:.0f} ms")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subqueries", type=int, default=4)
+    parser.add_argument("--docs", type=int, default=5, help="documents per subquery")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight (pipeline summarize workers)")
+    parser.add_argument("--overhead", type=float, default=0.3, help="seconds per request (queueing, network)")
+    parser.add_argument("--prefill-ms", type=float, default=0.05)
+    parser.add_argument("--decode-ms", type=float, default=4.0)
+    parser.add_argument("--slots", type=int, default=4, help="concurrent requests the server accepts")
+    parser.add_argument("--stream-runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+bench_pipeline.py
+
+Wall-clock comparison of the sequential trip.search_agent_stock and the
+concurrent pipeline (pipeline.py), using stubbed Serper / HTTP / LLM stand-ins
+with fixed latencies so no API keys or network are needed.
+
+Usage:
+  python bench_pipeline.py
+  python bench_pipeline.py --subqueries 4 --links 3 --search-ms 300 --fetch-ms 800 --llm-ms 1200
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import trip
+from pipeline import PipelineConfig, stream_search_agent_stock
+
+
+def make_stubs(search_s: float, fetch_s: float, llm_s: float, n_links: int = 10):
+    async def stub_search(query: str, api_key=None, num_results: int = 10, **kwargs) -> List[str]:
+        await asyncio.sleep(search_s)
+        slug = query.replace(" ", "-").lower()
+        return [f"https://example.com/{slug}/{i}" for i in range(min(n_links, num_results))]
+
+    async def stub_fetch(url: str, *args, **kwargs) -> str:
+        await asyncio.sleep(fetch_s)
+        return f"Page text for {url}\n" * 20
+
+    async def stub_llm(messages: List[Dict[str, str]]) -> str:
+        await asyncio.sleep(llm_s)
+        if "search queries" in messages[0]["content"]:
+            return "\n".join(f"stub query {i}" for i in range(8))
+        return "title: stub\nsentiment: neutral\nimpact score: 0.0"
+
+    return stub_search, stub_fetch, stub_llm
+
+
+async def run(args) -> None:
+    stub_search, stub_fetch, stub_llm = make_stubs(args.search_ms / 1000, args.fetch_ms / 1000, args.llm_ms / 1000)
+    # both orchestrators resolve these helpers from the trip module at call time
+    trip.asearch_serper = stub_search
+    trip.fetch_text = stub_fetch
+    topic = "IBM stock performance and recent news"
+
+    t0 = time.perf_counter()
+    seq = await trip.search_agent_stock(topic, stub_llm, serper_api_key="stub",
+                                        max_links=args.links, n_subqueries=args.subqueries)
+    t_seq = time.perf_counter() - t0
+
+    config = PipelineConfig(search_concurrency=args.subqueries, fetch_concurrency=args.concurrency,
+                            summarize_concurrency=args.concurrency, deadline=None)
+    first = None
+    conc = []
+    t0 = time.perf_counter()
+    async for r in stream_search_agent_stock(topic, stub_llm, serper_api_key="stub", max_links=args.links,
+                                             n_subqueries=args.subqueries, config=config):
+        if first is None:
+            first = time.perf_counter() - t0
+        conc.append(r)
+    t_conc = time.perf_counter() - t0
+
+    print(f"units: {args.subqueries} subqueries x {args.links} links")
+    print(f"sequential : {len(seq):3d} results in {t_seq:7.3f}s")
+    print(f"pipeline   : {len(conc):3d} results in {t_conc:7.3f}s (first result after {first or 0:.3f}s)")
+    print(f"speedup    : {t_seq / t_conc:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subqueries", type=int, default=4)
+    parser.add_argument("--links", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--search-ms", type=float, default=150)
+    parser.add_argument("--fetch-ms", type=float, default=400)
+    parser.add_argument("--llm-ms", type=float, default=600)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,151 @@
+"""
+bench_sentiment.py
+
+summaries.parse_summary and SentimentStore on synthetic summaries.
+
+1. parsing: microseconds per summary for JSON output, JSON wrapped in a code
+   fence, and the older "field: value" text
+2. ingest: summaries for --symbols tickers over --days days arrive in batches
+   (as a watchlist run would write them) and update the store incrementally;
+   reported as summaries/s
+3. query: one ticker's daily sentiment over the last year, p50 / p99 latency,
+   from the incremental aggregates (daily()) vs re-aggregating the history:
+   SQL GROUP BY over the stored mentions, and pandas groupby over the raw
+   records (what a consumer of the JSONL output does today)
+The incremental aggregates are checked against a full rebuild at the end.
+
+Usage:
+  python bench_sentiment.py
+  python bench_sentiment.py --symbols 500 --days 730 --per-day 4
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from sentiment_store import SentimentStore
+from summaries import SENTIMENTS, parse_summary
+
+
+def synthetic(n_symbols: int, days: int, per_day: float, seed: int):
+    rng = random.Random(seed)
+    symbols = [f"T{i:03d}" for i in range(n_symbols)]
+    start = dt.date.today() - dt.timedelta(days=days)
+    out = []
+    for k in range(int(n_symbols * days * per_day)):
+        sym = rng.sample(symbols, rng.choice([1, 1, 1, 2]))
+        sentiment = rng.choice(SENTIMENTS)
+        impact = round({"bullish": 0.4, "neutral": 0.0, "bearish": -0.4}[sentiment] + rng.uniform(-0.3, 0.3), 2)
+        day = (start + dt.timedelta(days=rng.randrange(days))).isoformat()
+        out.append({"link": f"https://news.example/{k}", "summary": json.dumps({
+            "title": f"story {k}", "date": day, "symbols": sym, "companies": [], "sentiment": sentiment,
+            "sentiment_reason": "synthetic", "impact_score": impact,
+            "key_facts": ["revenue grew", "guidance raised", "margins stable"]})})
+    return symbols, out
+
+
+def legacy_text(raw: str) -> str:
+    d = json.loads(raw)
+    facts = "\n".join(f"- {f}" for f in d["key_facts"])
+    return (f"Title: {d['title']}\nDate: {d['date']}\nStock symbols: {', '.join(d['symbols'])}\nCompanies: \n"
+            f"Key facts:\n{facts}\nSentiment: {d['sentiment']} ({d['sentiment_reason']})\n"
+            f"Impact score: {d['impact_score']}")
+
+
+def per_call_us(fn, items) -> float:
+    t0 = time.perf_counter()
+    for x in items:
+        fn(x)
+    return (time.perf_counter() - t0) / len(items) * 1e6
+
+
+def latency_ms(fn, args_list):
+    out = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        out.append((time.perf_counter() - t0) * 1e3)
+    return np.percentile(out, 50), np.percentile(out, 99)
+
+
+def main(args) -> None:
+    symbols, records = synthetic(args.symbols, args.days, args.per_day, args.seed)
+    print(f"{len(records)} summaries, {len(symbols)} symbols, {args.days} days\n")
+
+    sample = [r["summary"] for r in records[:5000]]
+    print("parse_summary, us per summary:")
+    print(f"  JSON             {per_call_us(parse_summary, sample):7.1f}")
+    fenced = [f"```json\n{s}\n```" for s in sample]
+    print(f"  fenced JSON      {per_call_us(parse_summary, fenced):7.1f}")
+    legacy = [legacy_text(s) for s in sample]
+    print(f"  field: value     {per_call_us(parse_summary, legacy):7.1f}")
+
+    tmp = tempfile.mkdtemp(prefix="sentiment_bench_")
+    try:
+        store = SentimentStore(os.path.join(tmp, "sentiment.sqlite"))
+        t0 = time.perf_counter()
+        for i in range(0, len(records), args.batch):
+            store.add_results(records[i:i + args.batch])
+        elapsed = time.perf_counter() - t0
+        print(f"\ningest in batches of {args.batch}: {elapsed:.2f}s, {len(records) / elapsed:,.0f} summaries/s; "
+              f"{store.stats()}")
+
+        start = (dt.date.today() - dt.timedelta(days=365)).isoformat()
+        rng = random.Random(args.seed)
+        queries = [(rng.choice(symbols), start) for _ in range(args.queries)]
+        print(f"\none ticker, daily sentiment since {start} ({args.queries} queries), ms p50 / p99:")
+        p50, p99 = latency_ms(store.daily, queries)
+        print(f"  daily() aggregates        {p50:8.3f} / {p99:8.3f}")
+
+        def group_by(symbol, since):
+            return store._conn.execute(
+                "SELECT day, COUNT(*), AVG(impact), SUM(sentiment = 'bullish'), SUM(sentiment = 'neutral'), "
+                "SUM(sentiment = 'bearish') FROM mentions WHERE symbol = ? AND day >= ? GROUP BY day ORDER BY day",
+                (symbol, since)).fetchall()
+        p50, p99 = latency_ms(group_by, queries)
+        print(f"  SQL GROUP BY mentions     {p50:8.3f} / {p99:8.3f}")
+
+        raw = pd.DataFrame([{"symbol": s, **d} for d in (json.loads(r["summary"]) for r in records)
+                            for s in d["symbols"]])
+
+        def pandas_groupby(symbol, since):
+            df = raw[(raw["symbol"] == symbol) & (raw["date"] >= since)]
+            return df.groupby("date").agg(count=("impact_score", "size"), mean_impact=("impact_score", "mean"))
+        p50, p99 = latency_ms(pandas_groupby, queries[:max(args.queries // 10, 1)])
+        print(f"  pandas groupby of records {p50:8.3f} / {p99:8.3f}")
+
+        def reparse(symbol, since):
+            rows = [d for d in (parse_summary(r["summary"]) for r in records) if symbol in d.symbols]
+            return len(rows)
+        p50, _ = latency_ms(reparse, queries[:3])
+        print(f"  re-parse every record     {p50:8.1f}")
+
+        incremental = store.frame()
+        store.rebuild()
+        rebuilt = store.frame()
+        diff = (incremental["impact_sum"] - rebuilt["impact_sum"]).abs().max()
+        same = incremental.drop(columns=["impact_sum", "mean_impact"]).equals(
+            rebuilt.drop(columns=["impact_sum", "mean_impact"]))
+        print(f"\nincremental aggregates == full rebuild: counts {same}, max |impact_sum diff| {diff:.2e}")
+        store.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--per-day", type=float, default=1.0, help="summaries per symbol per day")
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,141 @@
+"""
+bench_server.py
+
+Cold-start time per model backend and p50/p99 latency of prediction_server.py
+under concurrent load, with and without micro-batching.
+
+Unless --data is given, a synthetic history for the encoder's tickers is written
+with ingest.FakeSource into a temporary Parquet root, so no download is needed.
+
+Usage:
+  python bench_server.py
+  python bench_server.py --clients 64 --requests 50 --data all_stocks.csv
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from ingest import FakeSource, ingest
+from model_registry import BASE_DIR, ONNX_FILE, TORCHSCRIPT_FILE, ModelRegistry
+from prediction_server import build_server
+
+COLD_START_SNIPPET = """
+import time, warnings
+warnings.simplefilter("ignore")
+t0 = time.perf_counter()
+from model_registry import ModelRegistry
+r = ModelRegistry(data_path={data!r}, backend={backend!r})
+r.forecaster().predict(["IBM"])
+print(time.perf_counter() - t0)
+"""
+
+
+def cold_start(data: str, backend: str, runs: int) -> float:
+    """Median seconds from interpreter start (imports included) to the first prediction."""
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", COLD_START_SNIPPET.format(data=data, backend=backend)],
+                             cwd=BASE_DIR, capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return float(np.median(times))
+
+
+async def _client(port: int, tickers: List[str], n: int, latencies: List[float]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for _ in range(n):
+            body = json.dumps({"tickers": [random.choice(tickers)]}).encode()
+            req = (f"POST /predict HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                   f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+            t0 = time.perf_counter()
+            writer.write(req)
+            await writer.drain()
+            length = 0
+            await reader.readline()  # status line
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+
+async def load_test(registry: ModelRegistry, tickers: List[str], clients: int, requests: int,
+                    max_batch: int, max_wait_ms: float) -> dict:
+    server = build_server(registry, port=0, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    await server.start()
+    latencies: List[float] = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(server.port, tickers, requests, latencies) for _ in range(clients)))
+    wall = time.perf_counter() - t0
+    batches = server.batcher.batches
+    await server.stop()
+    lat = np.array(latencies) * 1000
+    return {"p50": np.percentile(lat, 50), "p99": np.percentile(lat, 99), "rps": len(lat) / wall,
+            "batches": batches, "n": len(lat)}
+
+
+def main(args) -> None:
+    tmpdir = None
+    data = args.data
+    if data is None:
+        tmpdir = tempfile.mkdtemp(prefix="server_bench_")
+        data = os.path.join(tmpdir, "market_data")
+        registry = ModelRegistry(data_path=data)
+        ingest(registry.encoder.classes_, root=data, source=FakeSource(), max_workers=4)
+    try:
+        registry = ModelRegistry(data_path=data, backend="eager")
+        registry.forecaster()  # build the window store / features once
+        tickers = list(registry.encoder.classes_)
+
+        print("cold start (interpreter start -> first prediction, median of %d):" % args.cold_runs)
+        exports = {"torchscript": (registry.export_torchscript, TORCHSCRIPT_FILE),
+                   "onnx": (registry.export_onnx, ONNX_FILE)}
+        for backend in ("eager", "torchscript", "onnx"):
+            created = None
+            try:
+                if backend in exports:
+                    export, name = exports[backend]
+                    if not os.path.exists(registry.path(name)):
+                        created = export()
+                print(f"  {backend:<12} {cold_start(data, backend, args.cold_runs):6.2f}s")
+            except Exception as e:
+                print(f"  {backend:<12} skipped ({e.__class__.__name__}: {e})")
+            finally:
+                if created and os.path.exists(created):
+                    os.remove(created)
+
+        print(f"load: {args.clients} clients x {args.requests} requests (1 ticker each)")
+        for label, max_batch, wait in (("no batching", 1, 0.0), ("micro-batch", args.max_batch, args.max_wait_ms)):
+            r = asyncio.run(load_test(registry, tickers, args.clients, args.requests, max_batch, wait))
+            print(f"  {label:<12} p50 {r['p50']:7.2f} ms  p99 {r['p99']:7.2f} ms  "
+                  f"{r['rps']:8.1f} req/s  {r['batches']} batches for {r['n']} requests")
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=None, help="CSV or Parquet root (default: synthetic)")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=30, help="requests per client")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--cold-runs", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+bench_tracing.py
+
+Overhead and output of tracing.py.
+
+1. Micro-benchmark: cost of one span + one counter at an instrumented call
+   site with tracing disabled (NOOP tracer) and enabled.
+2. End-to-end: the concurrent pipeline over an in-memory Serper / HTTP fake
+   and a TogetherChat backed by a fake client (with token usage), run with and
+   without a Tracer; the traced run's JSON trace and Prometheus file are
+   written to --out (default: a temp dir) and the per-stage summary is printed.
+
+Usage:
+  python bench_tracing.py
+  python bench_tracing.py --runs 50 --out traces/
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import trip
+from pipeline import PipelineConfig, search_agent_stock_concurrent
+from tracing import Tracer, get_tracer, use_tracer
+
+PAGE = ("<html><head><title>{t}</title></head><body><nav>Home | Markets | About</nav>"
+        "<article><h1>{t}</h1>" + "<p>Shares of {t} rose after earnings beat estimates.</p>" * 40 +
+        "</article><footer>Copyright</footer></body></html>")
+
+
+class FakeResponse:
+    def __init__(self, text: str = "", data=None):
+        self.text = text
+        self._data = data
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self):
+        return self._data
+
+
+class FakeHttpClient:
+    """Stands in for http_client.AsyncHttpClient: Serper results and static article pages."""
+    async def post(self, url, json=None, **kwargs):
+        q = json["q"].replace(" ", "-")
+        return FakeResponse(data={"organic": [{"link": f"https://news.example/{q}/{i}"} for i in range(json["num"])]})
+
+    async def get(self, url, **kwargs):
+        return FakeResponse(text=PAGE.format(t=url.rsplit("/", 2)[-2]))
+
+
+class FakeTogether:
+    """Minimal Together client: chat.completions.create with usage like the real response."""
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False):
+        prompt = sum(len(m["content"]) for m in messages)
+        if "search queries" in messages[0]["content"]:
+            content = "\n".join(f"IBM angle {i}" for i in range(4))
+        else:
+            content = "title: stub\nsentiment: neutral\nimpact score: 0.0"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                               usage=SimpleNamespace(prompt_tokens=prompt // 4, completion_tokens=len(content) // 4))
+
+
+def micro(n: int) -> None:
+    def bare():
+        pass
+
+    def site():
+        tracer = get_tracer()
+        with tracer.span("fetch", url="https://x"):
+            tracer.count("bytes_fetched", 100)
+
+    for label, fn, tracer in (("bare call", bare, None), ("disabled", site, None), ("enabled", site, Tracer())):
+        with use_tracer(tracer):
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn()
+            dt = time.perf_counter() - t0
+        print(f"  {label:<9} {dt / n * 1e9:8.0f} ns per instrumented call site")
+
+
+async def pipeline_run(llm, tracer=None):
+    config = PipelineConfig(deadline=None)
+    async def fetch(url):
+        return await trip.fetch_text(url, use_playwright=False, http_client=FakeHttpClient())
+    return await search_agent_stock_concurrent("IBM stock", llm.aget, serper_api_key="fake", max_links=3,
+                                               n_subqueries=4, config=config, http_client=FakeHttpClient(),
+                                               fetch_fn=fetch, tracer=tracer)
+
+
+async def main(args) -> None:
+    print(f"micro-benchmark ({args.iterations:,} iterations):")
+    micro(args.iterations)
+
+    llm = trip.TogetherChat(client=FakeTogether())
+    timings = {}
+    for label in ("disabled", "enabled"):
+        t0 = time.perf_counter()
+        for _ in range(args.runs):
+            tracer = Tracer() if label == "enabled" else None
+            await pipeline_run(llm, tracer)
+        timings[label] = (time.perf_counter() - t0) / args.runs
+    print(f"pipeline (fake network, {args.runs} runs): disabled {timings['disabled'] * 1000:.2f} ms/run, "
+          f"enabled {timings['enabled'] * 1000:.2f} ms/run")
+
+    tracer = Tracer()
+    results = await pipeline_run(llm, tracer)
+    out = args.out or tempfile.mkdtemp(prefix="trace_")
+    os.makedirs(out, exist_ok=True)
+    json_path = tracer.write_json(os.path.join(out, "trace.json"))
+    prom_path = tracer.write_prometheus(os.path.join(out, "search_agent.prom"))
+    print(f"traced run: {len(results)} results, {len(tracer.spans)} spans -> {json_path}, {prom_path}")
+    for stage, s in sorted(tracer.stage_summary().items(), key=lambda kv: -kv[1]["total_s"]):
+        print(f"  {stage:<20} n={s['count']:<4} total {s['total_s'] * 1000:8.2f} ms  max {s['max_s'] * 1000:7.2f} ms")
+    print(tracer.prometheus_text().split("# TYPE stock_search_agent_stage_seconds")[0].rstrip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--out", default=None, help="directory for trace.json / search_agent.prom")
+    asyncio.run(main(parser.parse_args()))
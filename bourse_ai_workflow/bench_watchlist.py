@@ -0,0 +1,172 @@
+"""
+bench_watchlist.py
+
+WatchlistRunner over a synthetic watchlist with in-memory Serper / page / LLM
+fakes (latency included), checking the behaviour it promises:
+
+ - global caps: peak concurrent fetches and peak LLM requests in any one-second
+   window vs the configured limits
+ - priorities: mean completion position of high- vs low-priority topics
+ - resume: the run is cancelled part-way (a crash), then restarted on the same
+   output; reported are the units written before the crash, fetches / searches
+   / LLM calls repeated by the resumed run, and whether the final set of units
+   equals an uninterrupted run's
+
+Usage:
+  python bench_watchlist.py
+  python bench_watchlist.py --topics 300 --max-fetches 16 --llm-rpm 12000 --crash-after 2.0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from watchlist import RunLimits, WatchlistRunner
+
+WORDS = ("shares revenue guidance analysts quarter margin outlook investors dividend buyback cloud demand "
+         "earnings growth forecast segment consulting software hardware inflation rates market").split()
+
+
+class _Response:
+    def __init__(self, text="", data=None):
+        self.text, self._data = text, data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class FakeWeb:
+    """Serper + pages with latency; records concurrency and which URLs / queries were requested."""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.in_flight = self.peak = 0
+        self.fetched = Counter()
+        self.searched = Counter()
+
+    async def post(self, url, json=None, **kwargs):
+        q = json["q"]
+        self.searched[q] += 1
+        await asyncio.sleep(self.latency / 4)
+        topic = q.rsplit(" angle ", 1)[0].replace(" ", "-")
+        rng = random.Random(q)
+        return _Response(data={"organic": [{"link": f"https://news.example/{topic}/{rng.randint(0, 5)}"}
+                                           for _ in range(json["num"])]})
+
+    async def get(self, url, **kwargs):
+        self.fetched[url] += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        rng = random.Random(url)
+        body = "".join(f"<p>{' '.join(rng.choice(WORDS) for _ in range(30))}.</p>" for _ in range(12))
+        return _Response(text=f"<html><body><article><h1>{url}</h1>{body}</article></body></html>")
+
+
+class FakeLLM:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = []
+
+    async def aget(self, messages):
+        self.calls.append(time.monotonic())
+        await asyncio.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        if prompt.startswith("The user wants the latest information about: "):
+            topic = prompt.split(": ", 1)[1].split("\n", 1)[0]
+            return "\n".join(f"{topic} angle {i}" for i in range(4))
+        return "title: stub\nsentiment: neutral\nimpact score: 0.0"
+
+
+def peak_per_second(times) -> int:
+    times = sorted(times)
+    best, lo = 0, 0
+    for hi, t in enumerate(times):
+        while t - times[lo] >= 1.0:
+            lo += 1
+        best = max(best, hi - lo + 1)
+    return best
+
+
+def units(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def run(out, watchlist, limits, latency, crash_after=None):
+    web, llm = FakeWeb(latency), FakeLLM(latency)
+    runner = WatchlistRunner(llm.aget, out, limits, serper_api_key="bench", http_client=web,
+                             use_playwright=False)
+    task = asyncio.ensure_future(runner.run(watchlist))
+    if crash_after is not None:
+        await asyncio.sleep(crash_after)
+        task.cancel()
+    try:
+        stats = await task
+    except asyncio.CancelledError:
+        stats = dict(runner.stats, crashed=True)
+    return stats, web, llm
+
+
+async def main(args) -> None:
+    rng = random.Random(args.seed)
+    watchlist = [(f"TICK{i:03d} stock", rng.choice([1, 5, 10])) for i in range(args.topics)]
+    limits = RunLimits(max_fetches=args.max_fetches, llm_rpm=args.llm_rpm, max_topics=args.max_topics)
+    tmp = tempfile.mkdtemp(prefix="watchlist_bench_")
+    try:
+        full = os.path.join(tmp, "full.jsonl")
+        stats, web, llm = await run(full, watchlist, limits, args.latency)
+        print(f"uninterrupted: {stats['units']} units, {stats['topics']} topics in {stats['seconds']:.2f}s "
+              f"({stats['searches']} searches, {stats['llm_calls']} LLM calls, {stats['tokens']} tokens)")
+        print(f"  peak concurrent fetches {web.peak} (cap {limits.max_fetches}); "
+              f"peak LLM calls in 1 s {peak_per_second(llm.calls)} (cap {limits.llm_rpm / 60:.0f}/s)")
+        order = [r["topic"] for r in units(full)]
+        first = {t: order.index(t) for t in dict.fromkeys(order)}
+        prio = dict(watchlist)
+        for p in sorted(set(prio.values()), reverse=True):
+            pos = [i for t, i in first.items() if prio[t] == p]
+            print(f"  priority {p:>2}: mean first-result position {sum(pos) / max(len(pos), 1):7.1f}")
+
+        crashed = os.path.join(tmp, "crashed.jsonl")
+        stats1, web1, llm1 = await run(crashed, watchlist, limits, args.latency, crash_after=args.crash_after)
+        before = {(r["topic"], r["query"], r["link"]) for r in units(crashed)}
+        stats2, web2, llm2 = await run(crashed, watchlist, limits, args.latency)
+        after = units(crashed)
+        keys = [(r["topic"], r["query"], r["link"]) for r in after]
+        done_links = {link for _, _, link in before}
+        refetched = sum(n for url, n in web2.fetched.items() if url in done_links and url in web1.fetched)
+        print(f"\ncrash after {args.crash_after:.1f}s: {len(before)} units written; resume wrote "
+              f"{stats2['units']} more, skipped {stats2['resumed']} finished units")
+        print(f"  resumed run: {sum(web2.searched.values())} searches "
+              f"(re-searched {sum(1 for q in web2.searched if q in web1.searched)}), "
+              f"{len(llm2.calls)} LLM calls, re-fetched {refetched} pages of finished units")
+        print(f"  duplicate units in output: {len(keys) - len(set(keys))}; "
+              f"same units as uninterrupted run: {set(keys) == {(r['topic'], r['query'], r['link']) for r in units(full)}}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=120)
+    parser.add_argument("--max-fetches", type=int, default=8)
+    parser.add_argument("--max-topics", type=int, default=6)
+    parser.add_argument("--llm-rpm", type=float, default=6000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per fake fetch / LLM call")
+    parser.add_argument("--crash-after", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger("stock_search_agent").setLevel(logging.WARNING)
+    asyncio.run(main(args))
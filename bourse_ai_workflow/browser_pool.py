@@ -0,0 +1,152 @@
+"""
+browser_pool.py
+
+Long-lived Playwright browser pool for trip.fetch_text.
+
+Starting Chromium costs far more than rendering most pages, so BrowserPool
+launches one browser and reuses it across many fetches. Pages are handed out
+up to a size limit, a crashed or disconnected browser is relaunched on the next
+checkout, and image/font/media requests can be blocked to save bandwidth.
+
+Usage:
+    async with BrowserPool(max_pages=4) as pool:
+        texts = await asyncio.gather(*(fetch_text(u, pool=pool) for u in urls))
+
+    # or hand out pages directly
+    async with pool.page() as page:
+        await page.goto(url)
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, Optional
+
+try:
+    from playwright.async_api import async_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except Exception:
+    PLAYWRIGHT_AVAILABLE = False
+
+logger = logging.getLogger("stock_search_agent.browser_pool")
+
+DEFAULT_BLOCKED_RESOURCES = ("image", "font", "media")
+DEFAULT_USER_AGENT = "Mozilla/5.0"
+
+
+class BrowserPool:
+    """
+    One shared Chromium process handing out up to max_pages pages at a time.
+
+    - max_pages: concurrent pages checked out (extra callers wait)
+    - block_resources: Playwright resource types to abort (e.g. image, font, media); empty to load everything
+    - max_restarts: how many times a crashed browser may be relaunched before giving up
+    """
+    def __init__(self, max_pages: int = 4, headless: bool = True,
+                 block_resources: Optional[Iterable[str]] = DEFAULT_BLOCKED_RESOURCES,
+                 user_agent: str = DEFAULT_USER_AGENT, max_restarts: int = 3,
+                 launch_kwargs: Optional[dict] = None):
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("Playwright not available. Install it with `pip install playwright`.")
+        self.max_pages = max_pages
+        self.headless = headless
+        self.block_resources = frozenset(block_resources or ())
+        self.user_agent = user_agent
+        self.max_restarts = max_restarts
+        self.launch_kwargs = launch_kwargs or {}
+
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._sem = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._restarts = 0
+        self._closed = False
+        self.pages_served = 0
+
+    # --- lifecycle ---
+    async def start(self) -> "BrowserPool":
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            await self._launch()
+        return self
+
+    async def close(self) -> None:
+        self._closed = True
+        async with self._lock:
+            await self._close_browser()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def __aenter__(self) -> "BrowserPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _launch(self) -> None:
+        self._browser = await self._playwright.chromium.launch(headless=self.headless, **self.launch_kwargs)
+        self._context = await self._browser.new_context(user_agent=self.user_agent)
+        if self.block_resources:
+            await self._context.route("**/*", self._route_handler)
+        logger.info("Launched pooled Chromium (max_pages=%d)", self.max_pages)
+
+    async def _close_browser(self) -> None:
+        try:
+            if self._context is not None:
+                await self._context.close()
+            if self._browser is not None:
+                await self._browser.close()
+        except Exception as e:
+            logger.debug("Error closing pooled browser: %s", e)
+        self._context = None
+        self._browser = None
+
+    async def _ensure_browser(self) -> None:
+        """Relaunch the browser if it crashed or was disconnected."""
+        if self._browser is not None and self._browser.is_connected():
+            return
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._closed:
+                raise RuntimeError("BrowserPool is closed")
+            if self._browser is not None:
+                if self._restarts >= self.max_restarts:
+                    raise RuntimeError(f"Pooled browser crashed more than {self.max_restarts} times")
+                self._restarts += 1
+                logger.warning("Pooled browser disconnected; restarting (%d/%d)", self._restarts, self.max_restarts)
+                await self._close_browser()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            await self._launch()
+
+    async def _route_handler(self, route) -> None:
+        if route.request.resource_type in self.block_resources:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    # --- checkout ---
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Any]:
+        """Check out a fresh page from the shared browser context; closed again on exit."""
+        async with self._sem:
+            await self._ensure_browser()
+            page = await self._context.new_page()
+            try:
+                yield page
+            finally:
+                self.pages_served += 1
+                try:
+                    await page.close()
+                except Exception as e:
+                    logger.debug("Error closing pooled page: %s", e)
+
+    async def fetch_html(self, url: str, timeout: int = 60) -> str:
+        """Navigate to url on a pooled page and return the rendered HTML."""
+        async with self.page() as page:
+            await page.goto(url, timeout=timeout * 1000)
+            return await page.content()
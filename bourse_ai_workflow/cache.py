@@ -0,0 +1,188 @@
+"""
+cache.py
+
+Persistent, content-addressed cache for the stock search agent (SQLite).
+
+Two namespaces share one size-bounded table:
+ - "page": visible text from fetch_text, keyed by URL, expires after page_ttl seconds
+ - "llm":  assistant text from TogetherChat, keyed by sha256(model, messages), no expiry
+
+Entries are zlib-compressed; when the total stored size exceeds max_bytes the
+least recently used entries are evicted. Hit/miss counters are kept per
+namespace. With bypass=True (or SEARCH_CACHE_BYPASS=1) reads always miss but
+fresh results are still written, which refreshes the cache.
+
+Usage:
+    cache = ResponseCache("search_cache.sqlite")
+    llm = TogetherChat(cache=cache)
+    results = await search_agent_stock(topic, llm.aget, cache=cache)
+    print(cache.stats())
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("stock_search_agent.cache")
+
+DEFAULT_CACHE_PATH = os.environ.get("SEARCH_CACHE_PATH", "search_cache.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_PAGE_TTL = 6 * 3600
+
+PAGE_NS = "page"
+LLM_NS = "llm"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ns       TEXT NOT NULL,
+    key      TEXT NOT NULL,
+    value    BLOB NOT NULL,
+    size     INTEGER NOT NULL,
+    created  REAL NOT NULL,
+    expires  REAL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+def llm_key(model: str, messages: List[Dict[str, str]]) -> str:
+    """Stable hash of (model, messages) used as the LLM cache key."""
+    blob = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe SQLite cache with TTL, LRU/size eviction, hit/miss counters and a bypass flag.
+    Safe to share between the event loop and the executor threads TogetherChat.aget uses.
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 page_ttl: Optional[float] = DEFAULT_PAGE_TTL, bypass: Optional[bool] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.page_ttl = page_ttl
+        self.bypass = bypass if bypass is not None else os.environ.get("SEARCH_CACHE_BYPASS") == "1"
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    # --- generic get/put ---
+    def get(self, ns: str, key: str) -> Optional[str]:
+        if self.bypass:
+            self.misses[ns] += 1
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM entries WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+            if row is None:
+                self.misses[ns] += 1
+                return None
+            value, expires = row
+            if expires is not None and expires <= now:
+                self._delete(ns, key)
+                self.misses[ns] += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE ns = ? AND key = ?", (now, ns, key))
+            self.hits[ns] += 1
+        return zlib.decompress(value).decode("utf-8")
+
+    def put(self, ns: str, key: str, value: str, ttl: Optional[float] = None) -> None:
+        blob = zlib.compress(value.encode("utf-8"))
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self._delete(ns, key)
+            self._conn.execute(
+                "INSERT INTO entries (ns, key, value, size, created, expires, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ns, key, blob, len(blob), now, expires, now))
+            self._total += len(blob)
+            self._evict()
+
+    def _delete(self, ns: str, key: str) -> None:
+        row = self._conn.execute("SELECT size FROM entries WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM entries WHERE ns = ? AND key = ?", (ns, key))
+            self._total -= row[0]
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        if self._total <= self.max_bytes:
+            return
+        freed = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries WHERE expires IS NOT NULL AND expires <= ?",
+            (time.time(),)).fetchone()
+        if freed[1]:
+            self._conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+            self._total -= freed[0]
+            self.evictions += freed[1]
+        while self._total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT ns, key, size FROM entries ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                break
+            victims = []
+            for ns, key, size in rows:
+                victims.append((ns, key))
+                self._total -= size
+                if self._total <= self.max_bytes:
+                    break
+            self._conn.executemany("DELETE FROM entries WHERE ns = ? AND key = ?", victims)
+            self.evictions += len(victims)
+        logger.debug("Cache evicted down to %d bytes", self._total)
+
+    # --- typed helpers ---
+    def get_page(self, url: str) -> Optional[str]:
+        return self.get(PAGE_NS, url)
+
+    def put_page(self, url: str, text: str) -> None:
+        self.put(PAGE_NS, url, text, ttl=self.page_ttl)
+
+    def get_llm(self, model: str, messages: List[Dict[str, str]]) -> Optional[str]:
+        return self.get(LLM_NS, llm_key(model, messages))
+
+    def put_llm(self, model: str, messages: List[Dict[str, str]], text: str) -> None:
+        self.put(LLM_NS, llm_key(model, messages), text)
+
+    # --- housekeeping ---
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT ns, COUNT(*) FROM entries GROUP BY ns").fetchall())
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "entries": counts,
+            "bytes": self._total,
+            "evictions": self.evictions,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._total = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,160 @@
+"""
+cpu_inference.py
+
+Opt-in optimized CPU inference mode for LSTMModel.
+
+Applies, as configured:
+ - dynamic int8 quantization of the nn.LSTM / nn.Linear layers
+ - an explicit intra-op thread count (torch.set_num_threads)
+ - optional torch.compile
+
+Before the optimized model is used it is compared against the fp32 model on
+held-out windows. If the error exceeds the budget the mode refuses to enable
+itself: the fp32 model is returned (or AccuracyBudgetExceeded is raised with
+strict=True).
+
+Usage:
+    cfg = CpuInferenceConfig(quantize=True, threads=4, max_mape=0.5)
+    model, report = optimize_for_cpu(fp32_model, cfg, holdout_windows(store, features), scaler)
+    registry = ModelRegistry(cpu_mode=cfg)   # same, applied on lazy load
+"""
+
+import copy
+import logging
+import time
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from forecaster import WINDOW, inverse_close
+
+logger = logging.getLogger("forecaster.cpu_inference")
+
+
+class AccuracyBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class CpuInferenceConfig:
+    quantize: bool = True
+    threads: Optional[int] = None      # intra-op threads; None keeps torch's default
+    compile: bool = False              # torch.compile the (quantized) model
+    max_mape: float = 0.5              # % mean abs deviation from fp32 predictions (price units)
+    max_abs_error: Optional[float] = None  # optional cap on the worst single deviation (price units)
+    strict: bool = False               # raise instead of falling back to fp32
+    validation_batch: int = 1024
+
+
+@dataclass
+class CpuInferenceReport:
+    enabled: bool
+    mode: str
+    threads: int
+    mape: float = 0.0
+    max_abs_error: float = 0.0
+    n_windows: int = 0
+    notes: Dict[str, Any] = field(default_factory=dict)
+
+
+def quantize_dynamic(model: nn.Module) -> nn.Module:
+    """int8 dynamic quantization of the LSTM and Linear layers (weights int8, activations fp32)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(model).cpu().eval(), {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def _run(model, X: np.ndarray, batch: int) -> np.ndarray:
+    out = []
+    with torch.inference_mode():
+        for start in range(0, len(X), batch):
+            chunk = torch.from_numpy(np.ascontiguousarray(X[start:start + batch], dtype=np.float32))
+            out.append(model(chunk).reshape(-1).numpy())
+    return np.concatenate(out) if out else np.empty(0, dtype=np.float32)
+
+
+def holdout_windows(store, features: np.ndarray, n: int = 512, holdout_frac: float = 0.2,
+                    seed: int = 0) -> np.ndarray:
+    """Sample n (30, 10) windows ending in the most recent holdout_frac of each ticker's history."""
+    rng = np.random.default_rng(seed)
+    ends = []
+    for offset, length in store.index.values():
+        if length < WINDOW + 1:
+            continue
+        first_end = offset + max(WINDOW, int(length * (1 - holdout_frac)))
+        ends.append(np.arange(first_end, offset + length + 1))
+    if not ends:
+        return np.empty((0, WINDOW, features.shape[1]), dtype=np.float32)
+    ends = np.concatenate(ends)
+    ends = rng.choice(ends, size=min(n, len(ends)), replace=False)
+    idx = ends[:, None] - WINDOW + np.arange(WINDOW)[None, :]
+    window = np.asarray(features[idx])
+    return window[~np.isnan(window).any(axis=(1, 2))]
+
+
+def optimize_for_cpu(model: nn.Module, config: CpuInferenceConfig, validation: np.ndarray,
+                     scaler=None) -> Tuple[nn.Module, CpuInferenceReport]:
+    """
+    Return (model to use, report). validation: held-out (N, 30, 10) windows;
+    errors are measured in price units when scaler is given, else in scaled units.
+    """
+    if config.threads:
+        torch.set_num_threads(config.threads)
+    threads = torch.get_num_threads()
+    model = model.cpu().eval()
+    parts = (["int8"] if config.quantize else ["fp32"]) + (["compiled"] if config.compile else [])
+    mode = "+".join(parts)
+
+    candidate = quantize_dynamic(model) if config.quantize else model
+    notes: Dict[str, Any] = {}
+    if config.compile:
+        try:
+            candidate = torch.compile(candidate)
+            _run(candidate, validation[:1], 1)  # trigger compilation now, not on the first request
+        except Exception as e:
+            notes["compile_error"] = repr(e)
+            logger.warning("torch.compile failed, continuing uncompiled: %s", e)
+            candidate = quantize_dynamic(model) if config.quantize else model
+            mode = "int8" if config.quantize else "fp32"
+
+    if len(validation) == 0:
+        report = CpuInferenceReport(False, "fp32", threads, notes={"reason": "no validation windows"})
+        if config.strict:
+            raise AccuracyBudgetExceeded("no held-out windows to validate the optimized model")
+        return model, report
+
+    ref = _run(model, validation, config.validation_batch)
+    got = _run(candidate, validation, config.validation_batch)
+    if scaler is not None:
+        ref, got = inverse_close(ref, scaler), inverse_close(got, scaler)
+    err = np.abs(got - ref)
+    mape = float(np.mean(err / np.maximum(np.abs(ref), 1e-8)) * 100)
+    max_err = float(err.max())
+    within = mape <= config.max_mape and (config.max_abs_error is None or max_err <= config.max_abs_error)
+
+    report = CpuInferenceReport(within, mode if within else "fp32", threads, mape, max_err, len(validation), notes)
+    if not within:
+        msg = (f"{mode} CPU mode exceeds the error budget (MAPE {mape:.3f}% > {config.max_mape}% "
+               f"or max error {max_err:.4f}); keeping fp32")
+        if config.strict:
+            raise AccuracyBudgetExceeded(msg)
+        logger.warning(msg)
+        return model, report
+    logger.info("Enabled %s CPU mode (MAPE %.3f%%, max error %.4f, %d threads)", mode, mape, max_err, threads)
+    return candidate, report
+
+
+def benchmark(model, X: np.ndarray, batch: int = 1024, repeats: int = 3) -> float:
+    """Windows per second for model over X (best of repeats)."""
+    _run(model, X[:batch], batch)  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        _run(model, X, batch)
+        best = min(best, time.perf_counter() - t0)
+    return len(X) / best
@@ -0,0 +1,217 @@
+"""
+dedup.py
+
+Link and near-duplicate document deduplication for the search agent.
+
+Overlapping subqueries return the same article many times: the same URL with
+different tracking parameters, its AMP / mobile variant, or a syndicated copy
+of one wire story on another site. Deduplicator collapses them in two steps:
+
+ 1. before fetching: links are keyed by normalize_url() (lower-cased host
+    without www./m./amp., tracking parameters (click ids, utm_*, ...) and
+    fragments dropped, AMP path markers removed, remaining parameters sorted)
+ 2. after extraction: documents are keyed by a 64-bit SimHash of their word
+    3-shingles; two documents whose fingerprints differ in at most
+    max_distance bits are the same story. Fingerprints are indexed by
+    max_distance + 1 bit bands, so a lookup only compares candidates that
+    share a band exactly (pigeonhole), not every document seen so far.
+
+Each group (one story) is fetched and summarized once; every other
+(subquery, link) that maps to it receives the group's summary, so each
+subquery is still credited with the story (one result per subquery per story).
+
+Usage:
+    dedup = Deduplicator()
+    results = await search_agent_stock(topic, llm.aget, dedup=dedup)
+    print(dedup.stats)
+"""
+
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+from tracing import get_tracer
+
+logger = logging.getLogger("stock_search_agent.dedup")
+
+# only keys that never select content (click ids, campaign / share tracking): generic names such as
+# src, source, ref, feed or partner pick the page on some sites, and merging those URLs would skip a fetch
+TRACKING_PARAMS = frozenset((
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "ttclid", "li_fat_id", "igshid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "ref_src", "cmpid", "ncid", "soc_src", "soc_trk", "ocid",
+    "guccounter", "guce_referrer", "guce_referrer_sig", "taid", "smid", "xtor", "at_medium", "at_campaign",
+))
+TRACKING_PREFIXES = ("utm_", "mc_", "pk_", "hsa_", "vero_", "__twitter")
+HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+AMP_PATH_RE = re.compile(r"(/amp)+/?$|\.amp(?=\.html?$|$)|/amp(?=/)", re.I)
+WORD_RE = re.compile(r"\w+")
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of url for identity checks (not for fetching)."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    host = (parts.hostname or "").lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = AMP_PATH_RE.sub("", parts.path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES))
+    scheme = "https" if parts.scheme in ("http", "https", "") else parts.scheme.lower()
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def simhash(text: str, shingle: int = 3) -> Optional[int]:
+    """64-bit SimHash of text's word shingles (None when text has no words)."""
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    n = max(1, len(words) - shingle + 1)
+    digests = b"".join(hashlib.blake2b(" ".join(words[i:i + shingle]).encode("utf-8"), digest_size=8).digest()
+                       for i in range(n))
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(n, 8), axis=1)
+    fingerprint = np.packbits(bits.sum(axis=0) * 2 > n)
+    return int.from_bytes(fingerprint.tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class _Group:
+    """One story: its primary (fetched, summarized) link and every other (subquery, link) credited with it."""
+    __slots__ = ("sub", "link", "subs", "pending", "summary", "state")
+
+    def __init__(self, sub: str, link: str):
+        self.sub = sub
+        self.link = link
+        self.subs = {sub}
+        self.pending: List[Tuple[str, str]] = []
+        self.summary: Any = None
+        self.state = "fetching"  # -> "summarizing" -> "done" | "failed"
+
+
+class Deduplicator:
+    """
+    Per-run dedup state; single event loop, no locking.
+    max_distance: SimHash bits two documents may differ in and still be duplicates.
+    min_words: shorter documents are never merged (their fingerprints are unreliable).
+    """
+    def __init__(self, max_distance: int = 6, min_words: int = 50, shingle: int = 3):
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self.shingle = shingle
+        self._bands = self._band_masks(max_distance + 1)
+        self._by_url: Dict[str, _Group] = {}
+        self._by_band: Dict[Tuple[int, int], List[Tuple[int, _Group]]] = {}
+        # every duplicate link saves one summary; URL duplicates also save their fetch
+        self.stats = {"links": 0, "url_duplicates": 0, "near_duplicates": 0, "fetches_saved": 0,
+                      "summaries_saved": 0}
+
+    @staticmethod
+    def _band_masks(n: int) -> List[int]:
+        edges = [round(64 * i / n) for i in range(n + 1)]
+        return [((1 << (hi - lo)) - 1) << lo for lo, hi in zip(edges, edges[1:])]
+
+    # --- before fetching ---
+    def claim_link(self, sub: str, link: str) -> Tuple[bool, List[Dict[str, Any]]]:
+        """
+        (fetch?, results to emit now). fetch is True for the first link of a
+        canonical URL, and for the next one after its fetch or summary failed
+        (the group restarts with that link); later ones are credited to its
+        group (and emitted at once if its summary is already done).
+        """
+        self.stats["links"] += 1
+        key = normalize_url(link)
+        group = self._by_url.get(key)
+        if group is None or group.state == "failed":
+            self._by_url[key] = _Group(sub, link)
+            return True, []
+        self.stats["url_duplicates"] += 1
+        self.stats["fetches_saved"] += 1
+        self.stats["summaries_saved"] += 1
+        get_tracer().count("dedup_saved", kind="url")
+        return False, self._attach(group, sub, link)
+
+    def failed(self, link: str) -> None:
+        """link's fetch or summary failed: its story yields no results."""
+        group = self._by_url.get(normalize_url(link))
+        if group is not None and group.state in ("fetching", "summarizing"):
+            group.state = "failed"
+            group.pending = []
+
+    # --- after extraction ---
+    def claim_document(self, sub: str, link: str, text: str) -> Tuple[bool, List[Dict[str, Any]]]:
+        """(summarize?, results to emit now) for the fetched text of link."""
+        group = self._by_url.get(normalize_url(link))
+        if group is None:  # link was not claimed first (direct use)
+            group = self._by_url[normalize_url(link)] = _Group(sub, link)
+        fp = simhash(text, self.shingle) if len(WORD_RE.findall(text)) >= self.min_words else None
+        match = self._lookup(fp) if fp is not None else None
+        if match is None or match is group:
+            group.state = "summarizing"
+            if fp is not None:
+                self._index(fp, group)
+            return True, []
+        # a syndicated copy: fold this URL (and whoever waits on it) into the matching story
+        self.stats["near_duplicates"] += 1
+        self.stats["summaries_saved"] += 1
+        get_tracer().count("dedup_saved", kind="near_duplicate")
+        self._by_url[normalize_url(link)] = match
+        emit = []
+        for s, l in [(group.sub, group.link)] + group.pending:
+            emit += self._attach(match, s, l)
+        group.state = "failed"
+        return False, emit
+
+    def _lookup(self, fp: int) -> Optional[_Group]:
+        best, best_d = None, self.max_distance + 1
+        for i, mask in enumerate(self._bands):
+            for other_fp, group in self._by_band.get((i, fp & mask), ()):
+                if group.state == "failed":  # its summary failed: let this copy take over
+                    continue
+                d = hamming(fp, other_fp)
+                if d < best_d:
+                    best, best_d = group, d
+        return best
+
+    def _index(self, fp: int, group: _Group) -> None:
+        for i, mask in enumerate(self._bands):
+            self._by_band.setdefault((i, fp & mask), []).append((fp, group))
+
+    # --- after summarizing ---
+    def summarized(self, link: str, summary: Any) -> List[Dict[str, Any]]:
+        """Results for the subqueries credited with link's story while it was being processed."""
+        group = self._by_url.get(normalize_url(link))
+        if group is None:
+            return []
+        group.summary, group.state = summary, "done"
+        emit = [self._result(group, s, l) for s, l in group.pending]
+        group.pending = []
+        return emit
+
+    def _attach(self, group: _Group, sub: str, link: str) -> List[Dict[str, Any]]:
+        if sub in group.subs:  # this subquery is already credited with the story
+            return []
+        group.subs.add(sub)
+        if group.state == "done":
+            return [self._result(group, sub, link)]
+        if group.state != "failed":
+            group.pending.append((sub, link))
+        return []
+
+    @staticmethod
+    def _result(group: _Group, sub: str, link: str) -> Dict[str, Any]:
+        return {"query": sub, "link": link, "summary": group.summary, "duplicate_of": group.link}
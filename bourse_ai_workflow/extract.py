@@ -0,0 +1,350 @@
+"""
+extract.py
+
+Fast main-content extraction from HTML, off the event loop, plus token-budgeted
+excerpts for the summarizer.
+
+Backends (pluggable via register_backend; "auto" picks the first available):
+ - "selectolax": lexbor parser (pip install selectolax), fastest
+ - "lxml":       libxml2 parser
+ - "bs4":        BeautifulSoup + html.parser, the original behaviour's parser
+Every backend drops scripts/styles and boilerplate containers (nav, header,
+footer, aside, forms, elements whose class/id look like menus, cookie banners,
+share bars, ...), prefers <article>/<main> when present, and keeps text blocks
+(paragraphs, headings, list items, ...) whose link density is low.
+
+Extractor.aextract() runs the work in a process pool so BeautifulSoup/lxml CPU
+time does not stall other coroutines; small pages are parsed inline because
+the IPC would cost more than the parse.
+
+budget_excerpt() sizes the text sent to the LLM to a per-model token budget,
+cutting at block boundaries, instead of a blind character slice. pack_batches()
+groups excerpts under a per-model prompt budget (batch_budget()) for batched
+multi-document requests.
+
+Usage:
+    text = await get_default_extractor().aextract(html)
+    excerpt = budget_excerpt(text, model="meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo")
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("stock_search_agent.extract")
+
+try:
+    from selectolax.parser import HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except Exception:
+    SELECTOLAX_AVAILABLE = False
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except Exception:
+    LXML_AVAILABLE = False
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except Exception:
+    TIKTOKEN_AVAILABLE = False
+
+DROP_TAGS = ("script", "style", "noscript", "template", "svg", "canvas", "iframe", "form", "button",
+             "nav", "header", "footer", "aside", "select")
+BLOCK_TAGS = ("p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre", "td", "dd", "dt", "figcaption")
+HEADINGS = frozenset(("h1", "h2", "h3", "h4", "h5", "h6"))
+BOILERPLATE_RE = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|footer|header|masthead|sidebar|cookie|consent|banner|promo|share|social|"
+    r"comment|comments|related|advert|ads?|sponsor|newsletter|subscribe|breadcrumbs?|popup|modal|"
+    r"skip|toolbar|pagination|tags)($|[\s_-])", re.I)
+MIN_BLOCK_CHARS = 25
+MAX_LINK_DENSITY = 0.5
+
+# per-model token budget for the page excerpt in summarize_with_llm
+MODEL_TOKEN_BUDGETS: Dict[str, int] = {
+    "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": 3000,
+    "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo": 3000,
+    "meta-llama/Llama-3.3-70B-Instruct-Turbo": 3000,
+}
+DEFAULT_TOKEN_BUDGET = 3000
+
+# per-model prompt budget for one batched request (summarize_batch_with_llm packs excerpts up to it);
+# well under the 128k context so the per-document outputs and the request latency stay bounded
+MODEL_BATCH_BUDGETS: Dict[str, int] = {
+    "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": 12000,
+    "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo": 12000,
+    "meta-llama/Llama-3.3-70B-Instruct-Turbo": 12000,
+}
+DEFAULT_BATCH_BUDGET = 12000
+
+
+# === block selection shared by every backend ===
+def _keep(tag: str, text: str, link_chars: int) -> bool:
+    if not text:
+        return False
+    if tag not in HEADINGS and len(text) < MIN_BLOCK_CHARS:
+        return False
+    return link_chars / max(len(text), 1) <= MAX_LINK_DENSITY
+
+
+def _join(blocks: List[str]) -> str:
+    out, prev = [], None
+    for b in blocks:
+        if b != prev:
+            out.append(b)
+        prev = b
+    return "\n".join(out)
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+# lxml.html refuses str input that carries an encoding declaration
+XML_DECL_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+# === backends: html -> main-content text ===
+def extract_lxml(html: str, main_content: bool = True) -> str:
+    if not html or not html.strip():
+        return ""
+    try:
+        root = lxml.html.document_fromstring(XML_DECL_RE.sub("", html, count=1))
+    except Exception as e:
+        logger.debug("lxml could not parse the page (%s); using bs4", e)
+        return extract_bs4(html, main_content)
+    for el in list(root.iter(*DROP_TAGS)):
+        el.drop_tree()
+    if not main_content:
+        return _join([_squash(line) for line in root.text_content().splitlines() if line.strip()])
+    candidates = root.xpath("//article|//main|//*[@role='main']")
+    scope = max(candidates, key=lambda e: len(e.text_content())) if candidates else root
+    keep = {scope, *scope.iterancestors()}  # wrappers of the main content stay whatever their class
+    for el in list(root.iter()):
+        if not isinstance(el.tag, str) or el.tag in ("html", "body", "article", "main") or el in keep:
+            continue
+        if BOILERPLATE_RE.search(f"{el.get('class', '')} {el.get('id', '')}"):
+            el.drop_tree()
+    blocks = []
+    for el in scope.iter(*BLOCK_TAGS):
+        if el.tag in ("li", "td") and any(True for _ in el.iter("p")):
+            continue  # the nested paragraphs are blocks of their own
+        text = _squash(el.text_content())
+        link_chars = sum(len(_squash(a.text_content())) for a in el.iter("a"))
+        if _keep(el.tag, text, link_chars):
+            blocks.append(text)
+    if not blocks:  # pages without block markup: fall back to all visible text
+        text = _join([_squash(line) for line in scope.text_content().splitlines() if line.strip()])
+        return text or extract_lxml(html, main_content=False)
+    return _join(blocks)
+
+
+def extract_bs4(html: str, main_content: bool = True) -> str:
+    from bs4 import BeautifulSoup
+    if not html or not html.strip():
+        return ""
+    soup = BeautifulSoup(html, "html.parser")
+    for el in soup.find_all(DROP_TAGS):
+        el.decompose()
+    if not main_content:
+        return soup.get_text(separator="\n", strip=True)
+    candidates = soup.find_all(["article", "main"]) + soup.find_all(attrs={"role": "main"})
+    scope = max(candidates, key=lambda e: len(e.get_text())) if candidates else soup
+    keep = {id(scope), *(id(p) for p in scope.parents)}
+    for el in soup.find_all(True):
+        if el.decomposed or el.name in ("html", "body", "article", "main") or el.attrs is None or id(el) in keep:
+            continue
+        marker = " ".join(el.get("class", []) or []) + " " + (el.get("id") or "")
+        if BOILERPLATE_RE.search(marker):
+            el.decompose()
+    blocks = []
+    for el in scope.find_all(BLOCK_TAGS):
+        if el.name in ("li", "td") and el.find("p"):
+            continue
+        text = _squash(el.get_text(" "))
+        link_chars = sum(len(_squash(a.get_text(" "))) for a in el.find_all("a"))
+        if _keep(el.name, text, link_chars):
+            blocks.append(text)
+    if not blocks:
+        return scope.get_text(separator="\n", strip=True) or extract_bs4(html, main_content=False)
+    return _join(blocks)
+
+
+def extract_selectolax(html: str, main_content: bool = True) -> str:
+    if not html or not html.strip():
+        return ""
+    tree = HTMLParser(html)
+    tree.strip_tags(list(DROP_TAGS))
+    root = tree.body or tree.root
+    if root is None:
+        return ""
+    if not main_content:
+        return _join([_squash(line) for line in root.text(separator="\n").splitlines() if line.strip()])
+    candidates = root.css("article, main, [role=main]")
+    scope = max(candidates, key=lambda e: len(e.text())) if candidates else root
+    keep, node = set(), scope
+    while node is not None:
+        keep.add(node.mem_id)
+        node = node.parent
+    for el in root.css("[class], [id]"):
+        if el.tag in ("body", "article", "main") or el.mem_id in keep:
+            continue
+        if BOILERPLATE_RE.search(f"{el.attributes.get('class') or ''} {el.attributes.get('id') or ''}"):
+            el.decompose()
+    blocks = []
+    for el in scope.css(", ".join(BLOCK_TAGS)):
+        if el.tag in ("li", "td") and el.css_first("p") is not None:
+            continue
+        text = _squash(el.text(separator=" "))
+        link_chars = sum(len(_squash(a.text(separator=" "))) for a in el.css("a"))
+        if _keep(el.tag, text, link_chars):
+            blocks.append(text)
+    if not blocks:
+        text = _join([_squash(line) for line in scope.text(separator="\n").splitlines() if line.strip()])
+        return text or extract_selectolax(html, main_content=False)
+    return _join(blocks)
+
+
+BACKENDS: Dict[str, Callable[..., str]] = {}
+_AVAILABLE: Dict[str, bool] = {}
+
+
+def register_backend(name: str, fn: Callable[..., str], available: bool = True) -> None:
+    """fn(html, main_content=True) -> text; must be a picklable module-level function for the process pool."""
+    BACKENDS[name] = fn
+    _AVAILABLE[name] = available
+
+
+register_backend("selectolax", extract_selectolax, SELECTOLAX_AVAILABLE)
+register_backend("lxml", extract_lxml, LXML_AVAILABLE)
+register_backend("bs4", extract_bs4)
+
+
+def resolve_backend(name: str = "auto") -> str:
+    if name != "auto":
+        if not _AVAILABLE.get(name):
+            raise ValueError(f"extraction backend {name!r} is not available")
+        return name
+    return next(n for n, ok in _AVAILABLE.items() if ok)
+
+
+def extract_text(html: str, backend: str = "auto", main_content: bool = True) -> str:
+    """Main-content text of html (runs in the caller's process)."""
+    return BACKENDS[resolve_backend(backend)](html, main_content)
+
+
+# === off-loop extraction ===
+class Extractor:
+    """
+    Extraction engine. aextract() parses in a process pool (max_workers
+    processes, created lazily); pages smaller than inline_below characters
+    are parsed inline.
+    """
+    def __init__(self, backend: str = "auto", main_content: bool = True, max_workers: Optional[int] = None,
+                 inline_below: int = 16_000):
+        self.backend = resolve_backend(backend)
+        self.main_content = main_content
+        self.max_workers = max_workers or max(1, min(4, os.cpu_count() or 1))
+        self.inline_below = inline_below
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def extract(self, html: str) -> str:
+        return BACKENDS[self.backend](html, self.main_content)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+        return self._pool
+
+    async def aextract(self, html: str) -> str:
+        if len(html) < self.inline_below:
+            return self.extract(html)
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), BACKENDS[self.backend], html, self.main_content)
+        except Exception as e:  # broken pool (e.g. worker killed): do not lose the page
+            logger.warning("Process-pool extraction failed (%s); extracting in a thread", e)
+            self.close()
+            return await loop.run_in_executor(None, self.extract, html)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_default_extractor: Optional[Extractor] = None
+
+
+def get_default_extractor() -> Extractor:
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = Extractor(backend=os.getenv("EXTRACT_BACKEND", "auto"))
+    return _default_extractor
+
+
+# === token-budgeted excerpts ===
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_encodings: Dict[str, object] = {}
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Tokens in text: tiktoken when installed, else a word/punctuation estimate (~within 10% for English)."""
+    if TIKTOKEN_AVAILABLE:
+        enc = _encodings.get("cl100k_base")
+        if enc is None:
+            enc = _encodings["cl100k_base"] = tiktoken.get_encoding("cl100k_base")
+        return len(enc.encode(text, disallowed_special=()))
+    return sum(1 + len(w) // 8 for w in _TOKEN_RE.findall(text))
+
+
+def token_budget(model: Optional[str] = None) -> int:
+    return MODEL_TOKEN_BUDGETS.get(model or "", DEFAULT_TOKEN_BUDGET)
+
+
+def batch_budget(model: Optional[str] = None) -> int:
+    return MODEL_BATCH_BUDGETS.get(model or "", DEFAULT_BATCH_BUDGET)
+
+
+def pack_batches(sizes: List[int], budget: int, max_items: int) -> List[List[int]]:
+    """Greedy, order-preserving packing of item indices into batches of at most budget tokens / max_items."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, n in enumerate(sizes):
+        if current and (used + n > budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def budget_excerpt(text: str, model: Optional[str] = None, budget: Optional[int] = None,
+                   max_chars: Optional[int] = None) -> str:
+    """Leading blocks of text that fit the model's token budget (and max_chars, if given)."""
+    budget = budget or token_budget(model)
+    if max_chars is not None:
+        text = text[:max_chars]
+    if count_tokens(text, model) <= budget:
+        return text
+    out, used = [], 0
+    for block in text.split("\n"):
+        n = count_tokens(block, model) + 1
+        if used + n > budget:
+            if not out:  # a single huge block: cut it proportionally
+                out.append(block[:int(len(block) * budget / n)])
+            break
+        out.append(block)
+        used += n
+    return "\n".join(out)
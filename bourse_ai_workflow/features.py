@@ -0,0 +1,114 @@
+"""
+features.py
+
+Vectorized LSTM feature engineering shared by training-style batch jobs and inference.
+
+Computes the 10-feature matrix used by LSTMModel (see notebook.ipynb / FEATURE_COLS):
+
+    Open, High, Low, Close, Volume (scaled) | Ticker_encoded | month_sin, month_cos, dow_sin, dow_cos
+
+once for the full history of every ticker in a window_store.WindowStore, in the
+store's row layout (grouped by ticker, sorted by date). Calendar features come
+from precomputed lookup tables indexed by month / weekday, the output is float32
+and no intermediate DataFrames are built. The matrix is cached next to the store:
+
+    <store>/features.npy    float32 (rows, 10)
+    <store>/features.json   fingerprint of the store source, scaler and encoder
+
+Usage:
+    store = load_window_store("all_stocks.csv")
+    feats = load_features(store, scaler, encoder)   # memory-mapped, rebuilt when stale
+    X = feats[offset + length - 30: offset + length] # one (30, 10) window, no copy
+"""
+
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from forecaster import FEATURE_COLS, NUM_COLS, calendar_parts, scale_numeric
+
+FEATURES_FILE = "features.npy"
+FEATURES_META_FILE = "features.json"
+
+# cyclical lookup tables; same expressions as the notebook, indexed by month (1-12) / weekday (Monday=0)
+_MONTHS = np.arange(13)
+_DOWS = np.arange(7)
+MONTH_SIN = np.sin(2 * np.pi * _MONTHS / 12)
+MONTH_COS = np.cos(2 * np.pi * _MONTHS / 12)
+DOW_SIN = np.sin(2 * np.pi * _DOWS / 7)
+DOW_COS = np.cos(2 * np.pi * _DOWS / 7)
+
+
+def compute_features(values: np.ndarray, dates: np.ndarray, ticker_codes: np.ndarray, scaler,
+                     out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Feature matrix for raw rows.
+    values: (rows, 5) OHLCV, dates: datetime64 (rows,), ticker_codes: (rows,) encoder labels.
+    Writes into `out` (rows, 10) float32 when given (e.g. a memmap), else allocates it.
+    """
+    rows = len(values)
+    if out is None:
+        out = np.empty((rows, len(FEATURE_COLS)), dtype=np.float32)
+    month, dow = calendar_parts(dates)
+    out[:, :len(NUM_COLS)] = scale_numeric(values, scaler)
+    out[:, 5] = ticker_codes
+    out[:, 6] = MONTH_SIN[month]
+    out[:, 7] = MONTH_COS[month]
+    out[:, 8] = DOW_SIN[dow]
+    out[:, 9] = DOW_COS[dow]
+    return out
+
+
+def row_ticker_codes(store, encoder) -> np.ndarray:
+    """Per-row encoder label in store layout; tickers the encoder does not know get NaN."""
+    codes = np.full(len(store), np.nan, dtype=np.float32)
+    known = set(encoder.classes_)
+    names = [t for t in store.index if t in known]
+    if names:
+        for t, code in zip(names, encoder.transform(names)):
+            offset, length = store.index[t]
+            codes[offset:offset + length] = code
+    return codes
+
+
+def _fingerprint(store, scaler, encoder) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps(store.source, sort_keys=True).encode())
+    h.update(str(len(store)).encode())
+    for attr in ("scale_", "min_", "mean_", "var_"):
+        if hasattr(scaler, attr):
+            h.update(np.asarray(getattr(scaler, attr), dtype=np.float64).tobytes())
+    h.update("\0".join(map(str, encoder.classes_)).encode())
+    return h.hexdigest()
+
+
+def build_features(store, scaler, encoder, chunk_rows: int = 1_000_000) -> np.ndarray:
+    """Compute the full feature matrix in chunks straight into <store>/features.npy and map it back."""
+    path = os.path.join(store.store_dir, FEATURES_FILE)
+    tmp = path + ".tmp"
+    codes = row_ticker_codes(store, encoder)
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(store), len(FEATURE_COLS)))
+    for start in range(0, len(store), chunk_rows):
+        end = min(start + chunk_rows, len(store))
+        compute_features(store.values[start:end], store.dates[start:end], codes[start:end], scaler, out=out[start:end])
+    out.flush()
+    del out
+    os.replace(tmp, path)
+    with open(os.path.join(store.store_dir, FEATURES_META_FILE), "w") as f:
+        json.dump({"columns": FEATURE_COLS, "fingerprint": _fingerprint(store, scaler, encoder)}, f)
+    return np.load(path, mmap_mode="r")
+
+
+def load_features(store, scaler, encoder) -> np.ndarray:
+    """Memory-mapped feature matrix for the store, rebuilt if missing or built for other data/scaler/encoder."""
+    path = os.path.join(store.store_dir, FEATURES_FILE)
+    meta_path = os.path.join(store.store_dir, FEATURES_META_FILE)
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") == _fingerprint(store, scaler, encoder):
+            return np.load(path, mmap_mode="r")
+    return build_features(store, scaler, encoder)
@@ -0,0 +1,189 @@
+import pickle
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+
+# -----------------------------
+# Constants shared with training (see notebook.ipynb)
+# -----------------------------
+WINDOW = 30
+NUM_COLS = ['Open', 'High', 'Low', 'Close', 'Volume']
+FEATURE_COLS = NUM_COLS + ['Ticker_encoded', 'month_sin', 'month_cos', 'dow_sin', 'dow_cos']
+CLOSE_IDX = 3  # Close position inside NUM_COLS / the scaler
+
+
+# -----------------------------
+# LSTM Model Definition
+# -----------------------------
+class LSTMModel(nn.Module):
+    def __init__(self, input_size, hidden_size1=64, hidden_size2=32):
+        super(LSTMModel, self).__init__()
+        self.lstm1 = nn.LSTM(input_size, hidden_size1, batch_first=True)
+        self.lstm2 = nn.LSTM(hidden_size1, hidden_size2, batch_first=True)
+        self.fc = nn.Linear(hidden_size2, 1)
+
+    def forward(self, x):
+        out, _ = self.lstm1(x)
+        out, _ = self.lstm2(out)
+        out = out[:, -1, :]  # take last timestep
+        out = self.fc(out)
+        return out
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def calendar_dates(dates: pd.Series) -> pd.Series:
+    """
+    Local calendar dates (tz-naive) for the cyclical features.
+    yfinance writes dates with per-row UTC offsets, which pandas may leave as
+    object dtype; the local date is the first 10 characters either way.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        if getattr(dates.dt, "tz", None) is not None:
+            return dates.dt.tz_localize(None)
+        return dates
+    return pd.to_datetime(dates.astype(str).str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+
+
+def scale_numeric(values: np.ndarray, scaler) -> np.ndarray:
+    """Apply the fitted scaler to raw (rows, 5) OHLCV values; MinMaxScaler is applied directly, as sklearn does."""
+    if hasattr(scaler, "scale_") and hasattr(scaler, "min_"):
+        return np.asarray(values, dtype=np.float64) * scaler.scale_ + scaler.min_
+    return scaler.transform(pd.DataFrame(values, columns=NUM_COLS))
+
+
+def calendar_parts(dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(month 1-12, day of week Monday=0) from datetime64[D] values."""
+    days = dates.astype("datetime64[D]")
+    month = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    dow = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    return month, dow
+
+
+def inverse_close(pred_scaled: np.ndarray, scaler) -> np.ndarray:
+    """Vectorized inverse transform of scaled Close predictions (one scaler call for all rows)."""
+    pred_scaled = np.asarray(pred_scaled, dtype=np.float64).reshape(-1)
+    dummy = np.zeros((len(pred_scaled), len(NUM_COLS)))
+    dummy[:, CLOSE_IDX] = pred_scaled
+    return scaler.inverse_transform(dummy)[:, CLOSE_IDX]
+
+
+# -----------------------------
+# Batched forecaster
+# -----------------------------
+class Forecaster:
+    """
+    Batched next-close forecaster for many tickers at once.
+
+    Builds one stacked (N, 30, 10) feature batch, runs LSTMModel over it in
+    chunks of batch_size under torch.inference_mode and inverts the scaling
+    for all predictions in one call. history is either the all_stocks
+    DataFrame or a window_store.WindowStore (O(1) window slicing); with a
+    store, `features` (see features.load_features) turns batch building
+    into a single gather.
+
+    Usage:
+        fc = Forecaster.from_files(data_path="all_stocks.csv", use_store=True)
+        df_pred = fc.predict(['IBM', 'GOOG', 'MSFT', 'AAPL'])
+    """
+    def __init__(self, model: nn.Module, scaler, encoder, history,
+                 batch_size: int = 1024, device: Optional[torch.device] = None,
+                 features: Optional[np.ndarray] = None):
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = model.to(self.device).eval()
+        self.scaler = scaler
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.history = history
+        self.features = features
+        self._known = set(encoder.classes_)
+
+    @classmethod
+    def from_files(cls, model_path: str = "second_model_lstm.pth", scaler_path: str = "second_model_scaler.pkl",
+                   encoder_path: str = "second_model_encoder.pkl", data_path: str = "all_stocks.csv",
+                   use_store: bool = False, store_dir: Optional[str] = None, **kwargs) -> "Forecaster":
+        device = kwargs.get("device") or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model = LSTMModel(input_size=len(FEATURE_COLS))
+        model.load_state_dict(torch.load(model_path, map_location=device))
+        with open(scaler_path, "rb") as f:
+            scaler = pickle.load(f)
+        with open(encoder_path, "rb") as f:
+            encoder = pickle.load(f)
+        if use_store:
+            from features import load_features
+            from window_store import load_window_store
+            history = load_window_store(data_path, store_dir)
+            kwargs.setdefault("features", load_features(history, scaler, encoder))
+        else:
+            history = pd.read_csv(data_path, parse_dates=['Date'])
+        return cls(model, scaler, encoder, history, **kwargs)
+
+    def last_windows(self, tickers: Iterable[str]) -> pd.DataFrame:
+        """Last WINDOW rows of every requested ticker, ordered by (ticker order, Date), in one pass."""
+        tickers = list(dict.fromkeys(tickers))
+        df = self.history[self.history['Ticker'].isin(tickers)]
+        df = df.assign(_date=calendar_dates(df['Date']))
+        df = df.sort_values(['Ticker', '_date'], kind='stable').groupby('Ticker', sort=False).tail(WINDOW)
+        return df
+
+    def build_batch(self, tickers: Iterable[str]) -> Tuple[np.ndarray, List[str]]:
+        """
+        Return the stacked float32 (N, 30, 10) feature batch and the tickers it covers.
+        Tickers unknown to the encoder or with fewer than 30 rows are skipped.
+        """
+        tickers = [t for t in dict.fromkeys(tickers) if t in self._known]
+        if hasattr(self.history, "windows"):
+            return self._build_batch_from_store(tickers)
+        df = self.last_windows(tickers)
+        counts = df['Ticker'].value_counts()
+        kept = [t for t in tickers if counts.get(t, 0) == WINDOW]
+        if not kept:
+            return np.empty((0, WINDOW, len(FEATURE_COLS)), dtype=np.float32), []
+        if len(kept) < len(counts):
+            df = df[df['Ticker'].isin(kept)]
+        # lay rows out in the order of `kept` so the batch axis matches the ticker list
+        order = pd.Categorical(df['Ticker'], categories=kept, ordered=True)
+        df = df.iloc[np.lexsort((df['_date'].values, order.codes))]
+
+        month = df['_date'].dt.month.to_numpy()
+        dow = df['_date'].dt.dayofweek.to_numpy()
+        X = np.empty((len(df), len(FEATURE_COLS)), dtype=np.float32)
+        X[:, :5] = self.scaler.transform(df[NUM_COLS])
+        X[:, 5] = self.encoder.transform(df['Ticker'])
+        X[:, 6] = np.sin(2 * np.pi * month / 12)
+        X[:, 7] = np.cos(2 * np.pi * month / 12)
+        X[:, 8] = np.sin(2 * np.pi * dow / 7)
+        X[:, 9] = np.cos(2 * np.pi * dow / 7)
+        return X.reshape(len(kept), WINDOW, len(FEATURE_COLS)), kept
+
+    def _build_batch_from_store(self, tickers: List[str]) -> Tuple[np.ndarray, List[str]]:
+        kept = [t for t in tickers if self.history.length(t) >= WINDOW]
+        if not kept:
+            return np.empty((0, WINDOW, len(FEATURE_COLS)), dtype=np.float32), []
+        idx = self.history.window_index(kept, WINDOW)
+        if self.features is not None:
+            return np.asarray(self.features[idx]), kept
+        from features import compute_features
+        flat = idx.reshape(-1)
+        codes = np.repeat(self.encoder.transform(kept), WINDOW)
+        X = compute_features(self.history.values[flat], self.history.dates[flat], codes, self.scaler)
+        return X.reshape(len(kept), WINDOW, len(FEATURE_COLS)), kept
+
+    def predict_batch(self, X: np.ndarray) -> np.ndarray:
+        """Run the model over an (N, 30, 10) batch in chunks; returns original-scale Close predictions."""
+        out = np.empty(len(X), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(X), self.batch_size):
+                chunk = torch.from_numpy(np.ascontiguousarray(X[start:start + self.batch_size])).to(self.device)
+                out[start:start + len(chunk)] = self.model(chunk).reshape(-1).cpu().numpy()
+        return inverse_close(out, self.scaler)
+
+    def predict(self, tickers: Iterable[str]) -> pd.DataFrame:
+        """Predicted next Close per ticker as a DataFrame with columns Ticker, Predicted_Close."""
+        X, kept = self.build_batch(tickers)
+        preds = self.predict_batch(X) if kept else np.empty(0)
+        return pd.DataFrame({'Ticker': kept, 'Predicted_Close': preds})
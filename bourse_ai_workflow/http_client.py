@@ -0,0 +1,196 @@
+"""
+http_client.py
+
+Pooled async HTTP layer for the stock search agent (Serper + requests fallback).
+
+Requirements:
+  pip install "httpx[http2]"
+
+Provides:
+ - AsyncHttpClient: keep-alive connection pool (httpx), per-host connection limits,
+   HTTP/2 when the h2 package is installed, retries with jittered exponential
+   backoff on 429/5xx and transport errors, optional per-host rate limiters
+ - TokenBucket: async token-bucket rate limiter (e.g. for Serper quota)
+ - get_default_client: one shared client per event loop
+ - owned_client: the caller's client, or a fresh one closed on exit (for orchestrators
+   that run under asyncio.run, where a per-loop client would be left open)
+
+Environment variables (optional):
+  SERPER_RATE_LIMIT - max Serper requests per second for the default client
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except Exception:
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except Exception:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger("stock_search_agent.http")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+SERPER_HOST = "google.serper.dev"
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class AsyncHttpClient:
+    """
+    httpx.AsyncClient with per-host limits, retries and rate limiting.
+
+    - max_connections / max_keepalive: pool size across all hosts
+    - max_per_host: concurrent requests to any single host
+    - retries: extra attempts on 429/5xx or transport errors (Retry-After is honoured)
+    - rate_limits: {host: TokenBucket} applied before every attempt to that host
+    """
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, max_per_host: int = 8,
+                 timeout: float = 15.0, retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 10.0,
+                 http2: bool = True, rate_limits: Optional[Dict[str, TokenBucket]] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("httpx not available. Install it with `pip install \"httpx[http2]\"`.")
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limits = dict(rate_limits or {})
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+        self._client = httpx.AsyncClient(
+            http2=http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            timeout=timeout,
+            headers=headers,
+            follow_redirects=True,
+        )
+
+    def _host_sem(self, host: str) -> asyncio.Semaphore:
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = self._host_sems[host] = asyncio.Semaphore(self.max_per_host)
+        return sem
+
+    def _backoff(self, attempt: int, resp: Optional[Any] = None) -> float:
+        """Full-jitter exponential backoff; a numeric Retry-After header wins when present."""
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(self.backoff_max, float(retry_after))
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        """Send a request with retries. Returns the last response; raises the last transport error."""
+        host = urlsplit(url).hostname or ""
+        bucket = self.rate_limits.get(host)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                async with self._host_sem(host):
+                    resp = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.debug("%s %s failed (%s); retry %d in %.2fs", method, url, e, attempt + 1, delay)
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return resp
+                delay = self._backoff(attempt, resp)
+                logger.debug("%s %s -> %d; retry %d in %.2fs", method, url, resp.status_code, attempt + 1, delay)
+                await resp.aclose()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+
+# === shared default client (one per event loop; httpx pools are loop-bound) ===
+_default_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHttpClient]" = weakref.WeakKeyDictionary()
+
+
+def _new_default_client() -> AsyncHttpClient:
+    rate_limits = {}
+    serper_rate = os.environ.get("SERPER_RATE_LIMIT")
+    if serper_rate:
+        rate_limits[SERPER_HOST] = TokenBucket(float(serper_rate))
+    return AsyncHttpClient(rate_limits=rate_limits)
+
+
+def get_default_client() -> AsyncHttpClient:
+    """Return the shared client for the running loop, creating it on first use."""
+    loop = asyncio.get_event_loop()
+    client = _default_clients.get(loop)
+    if client is None:
+        client = _default_clients[loop] = _new_default_client()
+    return client
+
+
+@contextlib.asynccontextmanager
+async def owned_client(client: Optional[AsyncHttpClient] = None) -> AsyncIterator[Optional[AsyncHttpClient]]:
+    """
+    Yield client when given (the caller closes it); otherwise a new client configured like
+    the default one, closed on exit. Yields None when httpx is not installed.
+    """
+    if client is not None or not HTTPX_AVAILABLE:
+        yield client
+        return
+    client = _new_default_client()
+    try:
+        yield client
+    finally:
+        await client.aclose()
@@ -0,0 +1,290 @@
+"""
+ingest.py
+
+Incremental, concurrent market-data ingestion into partitioned Parquet.
+
+Replaces the download-everything-and-rewrite-one-CSV flow of test.py:
+ - tickers are fetched concurrently with a worker limit
+ - each ticker only requests rows newer than its stored watermark (last date)
+ - only completed sessions are stored: today's bar is still moving while the
+   market is open, so it is left for the next run (--through today after the
+   close)
+ - new rows are appended as Parquet part files partitioned by ticker and year:
+       <root>/ticker=AAPL/year=2024/part-<timestamp>.parquet
+ - per-ticker watermarks live in <root>/_watermarks.json, saved in batches;
+   read_dataset drops repeated (Ticker, Date) rows, so a crash costs re-fetches only
+ - the data source is pluggable (YFinanceSource, FakeSource for offline runs)
+
+Usage:
+  python ingest.py AAPL MSFT GOOG IBM --root market_data --workers 8
+  python ingest.py --tickers-file tickers.txt --source fake --compact
+  python ingest.py AAPL --through today     # after the close: store today's bar too
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("market_ingest")
+
+COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits', 'Ticker']
+WATERMARKS_FILE = "_watermarks.json"
+DEFAULT_ROOT = "market_data"
+
+
+# -----------------------------
+# Data sources
+# -----------------------------
+class DataSource:
+    """Interface: return daily bars for ticker with Date >= start (all history when start is None)."""
+    def fetch(self, ticker: str, start: Optional[date] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class YFinanceSource(DataSource):
+    def fetch(self, ticker: str, start: Optional[date] = None) -> pd.DataFrame:
+        import yfinance as yf
+        t = yf.Ticker(ticker)
+        data = t.history(start=start.isoformat()) if start else t.history(period="max")
+        return data.reset_index()
+
+
+class FakeSource(DataSource):
+    """Deterministic random-walk bars up to `end` (default today), for offline runs and tests."""
+    def __init__(self, end: Optional[date] = None, first: date = date(2015, 1, 1), latency: float = 0.0):
+        self.end = end or date.today()
+        self.first = first
+        self.latency = latency
+
+    def fetch(self, ticker: str, start: Optional[date] = None) -> pd.DataFrame:
+        if self.latency:
+            time.sleep(self.latency)
+        # generate the full series from a per-ticker seed so incremental fetches line up
+        dates = pd.bdate_range(self.first, self.end)
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        df = pd.DataFrame({
+            'Date': dates, 'Open': close * (1 + rng.normal(0, 0.003, len(dates))),
+            'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+            'Volume': rng.integers(1_000_000, 50_000_000, len(dates)),
+            'Dividends': 0.0, 'Stock Splits': 0.0,
+        })
+        if start is not None:
+            df = df[df['Date'].dt.date >= start]
+        return df.reset_index(drop=True)
+
+
+SOURCES = {"yfinance": YFinanceSource, "fake": FakeSource}
+
+
+# -----------------------------
+# Watermarks
+# -----------------------------
+def load_watermarks(root: str) -> Dict[str, str]:
+    path = os.path.join(root, WATERMARKS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_watermarks(root: str, marks: Dict[str, str]) -> None:
+    path = os.path.join(root, WATERMARKS_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(marks, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Parquet dataset
+# -----------------------------
+def _normalize(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """Local calendar Date (tz-naive, midnight) and the standard column set."""
+    df = df.copy()
+    dates = pd.to_datetime(df['Date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    df['Date'] = dates.dt.normalize()
+    df['Ticker'] = ticker
+    for col in COLUMNS:
+        if col not in df:
+            df[col] = 0.0
+    df = df[COLUMNS]
+    df['Volume'] = df['Volume'].astype(np.float64)
+    return df.sort_values('Date').drop_duplicates('Date', keep='last')
+
+
+def _write_parts(root: str, df: pd.DataFrame, ticker: str) -> int:
+    """Append df as one new part file per year partition; returns files written."""
+    written = 0
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    for year, part in df.groupby(df['Date'].dt.year):
+        part_dir = os.path.join(root, f"ticker={ticker}", f"year={year}")
+        os.makedirs(part_dir, exist_ok=True)
+        name = f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp = os.path.join(part_dir, "." + name + ".tmp")
+        part.drop(columns=['Ticker']).to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(part_dir, name))
+        written += 1
+    return written
+
+
+def read_dataset(root: str = DEFAULT_ROOT, tickers: Optional[Iterable[str]] = None,
+                 columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read the partitioned dataset back as one DataFrame (Ticker restored from the partition path),
+    one row per (Ticker, Date).
+    """
+    frames = []
+    wanted = set(tickers) if tickers is not None else None
+    for entry in sorted(os.listdir(root)):
+        if not entry.startswith("ticker="):
+            continue
+        ticker = entry.split("=", 1)[1]
+        if wanted is not None and ticker not in wanted:
+            continue
+        tdir = os.path.join(root, entry)
+        for year_dir in sorted(os.listdir(tdir)):
+            ydir = os.path.join(tdir, year_dir)
+            for name in sorted(os.listdir(ydir)):
+                if name.endswith(".parquet") and not name.startswith("."):
+                    part = pd.read_parquet(os.path.join(ydir, name), columns=columns)
+                    part['Ticker'] = ticker
+                    frames.append(part)
+    if not frames:
+        return pd.DataFrame(columns=columns or COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    if 'Date' not in df:
+        return df
+    # the same day can be stored twice: a compact() interrupted between writing part-compacted and
+    # removing the parts it merged, or rows re-fetched after a crash before the watermarks were saved
+    return df.drop_duplicates(['Ticker', 'Date'], keep='last', ignore_index=True)
+
+
+def compact(root: str = DEFAULT_ROOT) -> int:
+    """Merge the part files of every (ticker, year) partition into one; returns partitions rewritten."""
+    rewritten = 0
+    for entry in os.listdir(root):
+        if not entry.startswith("ticker="):
+            continue
+        tdir = os.path.join(root, entry)
+        for year_dir in os.listdir(tdir):
+            ydir = os.path.join(tdir, year_dir)
+            parts = sorted(n for n in os.listdir(ydir) if n.endswith(".parquet") and not n.startswith("."))
+            if len(parts) < 2:
+                continue
+            df = pd.concat([pd.read_parquet(os.path.join(ydir, n)) for n in parts], ignore_index=True)
+            df = df.sort_values('Date').drop_duplicates('Date', keep='last')
+            tmp = os.path.join(ydir, ".compact.tmp")
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, os.path.join(ydir, "part-compacted.parquet"))
+            for n in parts:
+                if n != "part-compacted.parquet":
+                    os.remove(os.path.join(ydir, n))
+            rewritten += 1
+    return rewritten
+
+
+# -----------------------------
+# Ingestion
+# -----------------------------
+def ingest(tickers: Iterable[str], root: str = DEFAULT_ROOT, source: Optional[DataSource] = None,
+           max_workers: int = 8, through: Optional[date] = None, save_every: int = 200) -> Dict[str, int]:
+    """
+    Fetch every ticker concurrently, appending only rows newer than its watermark
+    and no later than `through`, the last completed session (default yesterday:
+    a bar dated today may be a partial intraday one, and once the watermark
+    passed it the final values would never be fetched).
+    Watermarks are saved every save_every finished tickers and at the end; rows
+    written after the last save are fetched again by the next run and dropped as
+    duplicates by read_dataset.
+    Returns {ticker: new rows}; failed tickers are logged and keep their old watermark.
+    """
+    source = source or YFinanceSource()
+    through = through or date.today() - timedelta(days=1)
+    os.makedirs(root, exist_ok=True)
+    marks = load_watermarks(root)
+    lock = threading.Lock()
+    results: Dict[str, int] = {}
+
+    def work(ticker: str) -> int:
+        last = marks.get(ticker)
+        start = date.fromisoformat(last) + timedelta(days=1) if last else None
+        df = source.fetch(ticker, start)
+        if df is None or df.empty:
+            return 0
+        df = _normalize(df, ticker)
+        if last:
+            df = df[df['Date'] > pd.Timestamp(last)]
+        df = df[df['Date'] <= pd.Timestamp(through)]
+        if df.empty:
+            return 0
+        _write_parts(root, df, ticker)
+        with lock:
+            marks[ticker] = df['Date'].max().date().isoformat()
+        return len(df)
+
+    saved = dict(marks)
+
+    def save() -> None:
+        # unchanged watermarks are not rewritten: their mtime marks the dataset as changed (window_store)
+        with lock:
+            if marks != saved:
+                _save_watermarks(root, marks)
+                saved.clear()
+                saved.update(marks)
+
+    tickers = list(dict.fromkeys(tickers))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(work, t): t for t in tickers}
+        try:
+            for done, fut in enumerate(as_completed(futures), 1):
+                ticker = futures[fut]
+                try:
+                    results[ticker] = fut.result()
+                    logger.info("%s: %d new rows", ticker, results[ticker])
+                except Exception as e:
+                    logger.warning("Ingestion failed for %s: %s", ticker, e)
+                if done % save_every == 0:
+                    save()
+        finally:
+            save()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", nargs="*", default=["AAPL", "MSFT", "GOOG", "IBM"])
+    parser.add_argument("--tickers-file", help="file with one ticker per line")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--source", choices=sorted(SOURCES), default="yfinance")
+    parser.add_argument("--compact", action="store_true", help="merge part files after ingesting")
+    parser.add_argument("--through", default=None,
+                        help="last completed session to store, YYYY-MM-DD or 'today' (default: yesterday)")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += [line.strip() for line in f if line.strip()]
+    t0 = time.perf_counter()
+    through = date.today() if args.through == "today" else date.fromisoformat(args.through) if args.through else None
+    counts = ingest(tickers, root=args.root, source=SOURCES[args.source](), max_workers=args.workers,
+                    through=through)
+    if args.compact:
+        compact(args.root)
+    print(f"Ingested {sum(counts.values())} new rows for {len(counts)} tickers in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,197 @@
+"""
+model_registry.py
+
+Lazily initialised, process-wide registry for the LSTM forecaster artifacts.
+
+Nothing is loaded at import time. The first access to `model`, `scaler`,
+`encoder`, `store` or `forecaster()` loads that artifact once (thread-safe) from
+paths resolved relative to this file, so callers work from any working directory.
+
+The model can be served from three backends:
+ - "eager":       LSTMModel + second_model_lstm.pth (default)
+ - "torchscript": second_model_lstm.ts, written by export_torchscript()
+ - "onnx":        second_model_lstm.onnx via onnxruntime, written by export_onnx()
+"auto" picks an exported file when it is newer than the .pth, else eager.
+With cpu_mode (cpu_inference.CpuInferenceConfig) the eager model is quantized /
+thread-tuned on load, after passing the held-out accuracy check.
+
+Usage:
+    from model_registry import get_registry
+    df_pred = get_registry().forecaster().predict(["IBM", "AAPL"])
+
+    python model_registry.py --export torchscript onnx
+"""
+
+import argparse
+import os
+import pickle
+import threading
+import warnings
+from typing import Any, Optional
+
+import numpy as np
+import torch
+
+from forecaster import FEATURE_COLS, WINDOW, Forecaster, LSTMModel
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_FILE = "second_model_lstm.pth"
+SCALER_FILE = "second_model_scaler.pkl"
+ENCODER_FILE = "second_model_encoder.pkl"
+TORCHSCRIPT_FILE = "second_model_lstm.ts"
+ONNX_FILE = "second_model_lstm.onnx"
+DATA_PATH = "all_stocks.csv"
+
+BACKENDS = ("auto", "eager", "torchscript", "onnx")
+
+
+class OnnxModel:
+    """Minimal torch-module lookalike over an onnxruntime session, so Forecaster can drive it."""
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        out = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})[0]
+        return torch.from_numpy(out)
+
+    def to(self, device) -> "OnnxModel":
+        return self
+
+    def eval(self) -> "OnnxModel":
+        return self
+
+
+class ModelRegistry:
+    def __init__(self, base_dir: str = BASE_DIR, data_path: str = DATA_PATH, backend: str = "auto",
+                 device: Optional[torch.device] = None, batch_size: int = 1024, cpu_mode: Optional[Any] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}")
+        self.base_dir = base_dir
+        self.data_path = data_path if os.path.isabs(data_path) else os.path.join(base_dir, data_path)
+        self.backend = backend
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.batch_size = batch_size
+        self.cpu_mode = cpu_mode
+        self.cpu_report = None
+        self._lock = threading.RLock()
+        self._cache = {}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.base_dir, name)
+
+    def _get(self, key: str, loader) -> Any:
+        if key not in self._cache:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = loader()
+        return self._cache[key]
+
+    # --- artifacts ---
+    @property
+    def model(self):
+        return self._get("model", self._load_model)
+
+    @property
+    def scaler(self):
+        return self._get("scaler", lambda: self._load_pickle(SCALER_FILE))
+
+    @property
+    def encoder(self):
+        return self._get("encoder", lambda: self._load_pickle(ENCODER_FILE))
+
+    @property
+    def store(self):
+        from window_store import load_window_store
+        return self._get("store", lambda: load_window_store(self.data_path))
+
+    @property
+    def features(self) -> np.ndarray:
+        from features import load_features
+        return self._get("features", lambda: load_features(self.store, self.scaler, self.encoder))
+
+    def forecaster(self) -> Forecaster:
+        return self._get("forecaster", lambda: Forecaster(
+            self.model, self.scaler, self.encoder, self.store,
+            batch_size=self.batch_size, device=self.device, features=self.features))
+
+    def _load_pickle(self, name: str):
+        with open(self.path(name), "rb") as f:
+            return pickle.load(f)
+
+    def resolved_backend(self) -> str:
+        if self.backend != "auto":
+            return self.backend
+        pth_mtime = os.path.getmtime(self.path(MODEL_FILE))
+        for backend, name in (("torchscript", TORCHSCRIPT_FILE), ("onnx", ONNX_FILE)):
+            p = self.path(name)
+            if os.path.exists(p) and os.path.getmtime(p) >= pth_mtime:
+                if backend == "onnx" and self.device.type != "cpu":
+                    continue
+                return backend
+        return "eager"
+
+    def _load_model(self):
+        backend = self.resolved_backend()
+        # keep stderr clean: the API routes treat any stderr output as a failure
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            if backend == "torchscript":
+                model = torch.jit.load(self.path(TORCHSCRIPT_FILE), map_location=self.device)
+            elif backend == "onnx":
+                model = OnnxModel(self.path(ONNX_FILE))
+            else:
+                model = LSTMModel(input_size=len(FEATURE_COLS))
+                model.load_state_dict(torch.load(self.path(MODEL_FILE), map_location=self.device))
+        if self.cpu_mode is not None and backend == "eager" and self.device.type == "cpu":
+            from cpu_inference import holdout_windows, optimize_for_cpu
+            validation = holdout_windows(self.store, self.features)
+            model, self.cpu_report = optimize_for_cpu(model, self.cpu_mode, validation, self.scaler)
+        return model.to(self.device).eval()
+
+    # --- export ---
+    def _eager_model(self) -> LSTMModel:
+        model = LSTMModel(input_size=len(FEATURE_COLS))
+        model.load_state_dict(torch.load(self.path(MODEL_FILE), map_location="cpu"))
+        return model.eval()
+
+    def export_torchscript(self, path: Optional[str] = None) -> str:
+        path = path or self.path(TORCHSCRIPT_FILE)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            torch.jit.script(self._eager_model()).save(path)
+        return path
+
+    def export_onnx(self, path: Optional[str] = None) -> str:
+        path = path or self.path(ONNX_FILE)
+        example = torch.zeros(1, WINDOW, len(FEATURE_COLS))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            torch.onnx.export(self._eager_model(), (example,), path, input_names=["x"], output_names=["y"],
+                              dynamic_axes={"x": {0: "batch"}, "y": {0: "batch"}}, dynamo=False)
+        return path
+
+
+_default: Optional[ModelRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_registry(**kwargs) -> ModelRegistry:
+    """Process-wide registry (created on first call; kwargs only apply then)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ModelRegistry(**kwargs)
+    return _default
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the LSTM forecaster for faster cold start.")
+    parser.add_argument("--export", nargs="+", choices=["torchscript", "onnx"], default=["torchscript"])
+    args = parser.parse_args()
+    registry = ModelRegistry()
+    for fmt in args.export:
+        out = registry.export_torchscript() if fmt == "torchscript" else registry.export_onnx()
+        print(f"Exported {fmt}: {out}")
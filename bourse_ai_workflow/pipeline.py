@@ -0,0 +1,344 @@
+"""
+pipeline.py
+
+Concurrent, staged variant of trip.search_agent_stock.
+
+The sequential orchestrator in trip.py searches, scrapes and summarizes one
+link at a time. This module runs the same work as three stages connected by
+bounded queues:
+
+    subqueries -> [search] -> (subquery, link) -> [fetch] -> (subquery, link, text) -> [summarize] -> results
+
+Each stage runs a fixed number of workers (its concurrency limit), the bounded
+queues provide back-pressure, a per-request deadline caps the whole run, and
+results are yielded as soon as each summary finishes.
+
+Duplicate links (same normalized URL) are dropped before the fetch stage and
+near-duplicate documents (syndicated copies) before the summarize stage; see
+dedup.py.
+
+With PipelineConfig(summarize_batch=N), the summarize stage groups documents
+by subquery and sends each group as one request (trip.summarize_batch_with_llm)
+once it holds N documents or its first one has waited batch_wait seconds;
+summarize_concurrency then caps the LLM requests in flight, packed requests
+and per-document retries alike.
+
+Usage:
+    async for r in stream_search_agent_stock(topic, llm.aget):
+        print(r["query"], r["link"])
+
+    results = await search_agent_stock_concurrent(topic, llm.aget, config=PipelineConfig(deadline=60))
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import trip
+from dedup import Deduplicator
+from http_client import owned_client
+from tracing import get_tracer, set_tracer
+
+logger = logging.getLogger("stock_search_agent.pipeline")
+
+# sentinel marking the end of a stage's output
+_DONE = object()
+
+
+@dataclass
+class PipelineConfig:
+    """Concurrency and timing knobs for the staged pipeline."""
+    search_concurrency: int = 4
+    fetch_concurrency: int = 6
+    summarize_concurrency: int = 4
+    queue_size: int = 16
+    deadline: Optional[float] = 120.0  # seconds for the whole request; None = no limit
+    num_results: int = 10
+    summarize_batch: int = 1  # documents per summarize request; 1 = one request per document
+    batch_wait: float = 0.25  # seconds the first document of a batch waits for more of its subquery
+
+
+# === small helper to support sync/async stage callables ===
+async def _maybe_await(fn: Callable, *args, **kwargs) -> Any:
+    """Await fn if it is a coroutine function, otherwise run it in the default executor."""
+    if asyncio.iscoroutinefunction(fn):
+        return await fn(*args, **kwargs)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+
+
+# === stage workers ===
+async def _search_worker(search_fn, in_q: asyncio.Queue, out_q: asyncio.Queue,
+                         api_key: Optional[str], num_results: int, max_links: int,
+                         dedup=None, results_q: Optional[asyncio.Queue] = None) -> None:
+    while True:
+        sub = await in_q.get()
+        if sub is _DONE:
+            return
+        try:
+            links = await _maybe_await(search_fn, sub, api_key=api_key, num_results=num_results)
+        except Exception as e:
+            logger.warning("Search stage failed for '%s': %s", sub, e)
+            links = []
+        if not links:
+            logger.info("No links for subquery: %s", sub)
+        for link in (links or [])[:max_links]:
+            if dedup is not None:
+                fetch, ready = dedup.claim_link(sub, link)
+                for r in ready:
+                    await results_q.put(r)
+                if not fetch:
+                    continue
+            await out_q.put((sub, link))
+
+
+async def _fetch_worker(fetch_fn, in_q: asyncio.Queue, out_q: asyncio.Queue,
+                        dedup=None, results_q: Optional[asyncio.Queue] = None) -> None:
+    while True:
+        item = await in_q.get()
+        if item is _DONE:
+            return
+        sub, link = item
+        logger.info("Fetching %s for subquery: %s", link, sub)
+        try:
+            content = await _maybe_await(fetch_fn, link)
+        except Exception as e:
+            logger.warning("Fetch stage failed for %s: %s", link, e)
+            content = ""
+        if not content:
+            logger.info("No content from %s", link)
+            if dedup is not None:
+                dedup.failed(link)
+            continue
+        if dedup is not None:
+            summarize, ready = dedup.claim_document(sub, link, content)
+            for r in ready:
+                await results_q.put(r)
+            if not summarize:
+                logger.info("Near-duplicate content from %s", link)
+                continue
+        await out_q.put((sub, link, content))
+
+
+async def _summarize_worker(summarize_fn, llm_callable, in_q: asyncio.Queue, out_q: asyncio.Queue,
+                            dedup=None) -> None:
+    while True:
+        item = await in_q.get()
+        if item is _DONE:
+            return
+        sub, link, content = item
+        try:
+            summary = await summarize_fn(llm_callable, sub, link, content)
+        except Exception as e:
+            logger.warning("Summarize stage failed for %s: %s", link, e)
+            if dedup is not None:
+                dedup.failed(link)
+            continue
+        await out_q.put({"query": sub, "link": link, "summary": summary})
+        if dedup is not None:
+            for r in dedup.summarized(link, summary):
+                await out_q.put(r)
+
+
+async def _summarize_batcher(batch_fn, llm_callable, in_q: asyncio.Queue, out_q: asyncio.Queue,
+                             max_docs: int, wait: float, concurrency: int, dedup=None) -> None:
+    """
+    Groups documents by subquery; a group is sent as one request (batch_fn) once it holds
+    max_docs documents or its first document has waited `wait` seconds, with at most
+    `concurrency` LLM requests in flight (batch_fn takes the gate: a group can need several
+    packed requests and per-document retries).
+    """
+    loop = asyncio.get_event_loop()
+    gate = asyncio.Semaphore(concurrency)
+    groups: Dict[str, List[tuple]] = {}
+    first_at: Dict[str, float] = {}
+    in_flight: set = set()
+
+    async def send(sub: str, docs: List[tuple]) -> None:
+        try:
+            summaries = await batch_fn(llm_callable, sub, docs, max_docs=max_docs, gate=gate)
+        except Exception as e:
+            logger.warning("Summarize stage failed for %d documents of '%s': %s", len(docs), sub, e)
+            summaries = [None] * len(docs)
+        for (link, _), summary in zip(docs, summaries):
+            if summary is None:
+                if dedup is not None:
+                    dedup.failed(link)
+                continue
+            await out_q.put({"query": sub, "link": link, "summary": summary})
+            if dedup is not None:
+                for r in dedup.summarized(link, summary):
+                    await out_q.put(r)
+
+    def flush(sub: str) -> None:
+        first_at.pop(sub)
+        task = asyncio.ensure_future(send(sub, groups.pop(sub)))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    try:
+        while True:
+            timeout = max(0.0, min(first_at.values()) + wait - loop.time()) if first_at else None
+            try:
+                item = await asyncio.wait_for(in_q.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+            if item is _DONE:
+                break
+            if item is not None:
+                sub, link, content = item
+                groups.setdefault(sub, []).append((link, content))
+                first_at.setdefault(sub, loop.time())
+            for sub in [s for s in groups if len(groups[s]) >= max_docs or loop.time() - first_at[s] >= wait]:
+                flush(sub)
+        for sub in list(groups):
+            flush(sub)
+        while in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+async def _run_stage(workers: List[Callable], next_q: asyncio.Queue, next_workers: int) -> None:
+    """Run a stage's workers to completion, then signal every worker of the next stage."""
+    await asyncio.gather(*workers)
+    for _ in range(next_workers):
+        await next_q.put(_DONE)
+
+
+# === orchestration ===
+async def stream_search_agent_stock(user_topic: str, llm_callable, serper_api_key: Optional[str] = None,
+                                    max_links: int = 3, n_subqueries: int = 4,
+                                    config: Optional[PipelineConfig] = None,
+                                    search_fn: Optional[Callable] = None,
+                                    fetch_fn: Optional[Callable] = None,
+                                    summarize_fn: Optional[Callable] = None,
+                                    summarize_batch_fn: Optional[Callable] = None,
+                                    browser_pool: Optional[Any] = None,
+                                    cache: Optional[Any] = None,
+                                    http_client: Optional[Any] = None,
+                                    tracer: Optional[Any] = None,
+                                    dedup: Any = True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Concurrent search -> fetch -> summarize pipeline. Yields result dicts
+    ({'query', 'link', 'summary'}, same shape as trip.search_agent_stock) as they finish.
+
+    Stage callables default to the helpers in trip.py and are resolved at call time
+    (summarize_batch_fn, used when config.summarize_batch > 1: trip.summarize_batch_with_llm,
+    called with gate=, the semaphore that caps the LLM requests in flight);
+    browser_pool (browser_pool.BrowserPool), cache (cache.ResponseCache) and
+    http_client (http_client.AsyncHttpClient) are handed to the default stage helpers; without
+    one they use the shared per-loop client (search_agent_stock_concurrent opens and closes its own).
+    tracer (tracing.Tracer) is installed for every stage task of this run.
+    dedup: True (default) for a fresh dedup.Deduplicator, a Deduplicator to share / inspect
+    its stats, or False. Duplicate links and near-duplicate documents are fetched and
+    summarized once; the other subqueries get the same summary with 'duplicate_of' set.
+    When the deadline expires, outstanding work is cancelled and the stream ends.
+    """
+    config = config or PipelineConfig()
+    serper_api_key = serper_api_key or trip.SERPER_API_KEY
+    if search_fn is None:
+        search_fn = functools.partial(trip.asearch_serper, http_client=http_client)
+    if fetch_fn is None:
+        fetch_fn = functools.partial(trip.fetch_text, pool=browser_pool, cache=cache, http_client=http_client)
+    summarize_fn = summarize_fn or trip.summarize_with_llm
+    summarize_batch_fn = summarize_batch_fn or trip.summarize_batch_with_llm
+    if dedup is True:
+        dedup = Deduplicator()
+    dedup = dedup or None
+
+    # stage tasks run in a context carrying the tracer; the generator's own context
+    # (the consumer's) is left untouched
+    ctx = contextvars.copy_context()
+    if tracer is not None:
+        ctx.run(set_tracer, tracer)
+    tracer = ctx.run(get_tracer)
+    run_span = tracer.span("search_agent_stock", topic=user_topic, mode="pipeline")
+    ctx.run(run_span.__enter__)
+
+    def spawn(coro) -> asyncio.Future:
+        return ctx.run(asyncio.ensure_future, coro)
+
+    loop = asyncio.get_event_loop()
+    deadline_at = loop.time() + config.deadline if config.deadline is not None else None
+
+    def remaining() -> Optional[float]:
+        return None if deadline_at is None else max(0.0, deadline_at - loop.time())
+
+    try:
+        subqueries = await asyncio.wait_for(
+            spawn(trip.generate_subqueries(llm_callable, user_topic, n=n_subqueries)), timeout=remaining())
+    except asyncio.TimeoutError:
+        logger.warning("Deadline expired while generating subqueries for: %s", user_topic)
+        run_span.set(deadline_expired=True)
+        ctx.run(run_span.__exit__, None, None, None)
+        return
+
+    sub_q: asyncio.Queue = asyncio.Queue()
+    link_q: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+    text_q: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+    out_q: asyncio.Queue = asyncio.Queue()
+
+    for sub in subqueries:
+        sub_q.put_nowait(sub)
+    for _ in range(config.search_concurrency):
+        sub_q.put_nowait(_DONE)
+
+    search_workers = [
+        _search_worker(search_fn, sub_q, link_q, serper_api_key, config.num_results, max_links, dedup, out_q)
+        for _ in range(config.search_concurrency)
+    ]
+    fetch_workers = [_fetch_worker(fetch_fn, link_q, text_q, dedup, out_q) for _ in range(config.fetch_concurrency)]
+    if config.summarize_batch > 1:
+        summarize_workers = [
+            _summarize_batcher(summarize_batch_fn, llm_callable, text_q, out_q, config.summarize_batch,
+                               config.batch_wait, config.summarize_concurrency, dedup)
+        ]
+    else:
+        summarize_workers = [
+            _summarize_worker(summarize_fn, llm_callable, text_q, out_q, dedup)
+            for _ in range(config.summarize_concurrency)
+        ]
+    tasks = [
+        spawn(_run_stage(search_workers, link_q, config.fetch_concurrency)),
+        spawn(_run_stage(fetch_workers, text_q, len(summarize_workers))),
+        spawn(_run_stage(summarize_workers, out_q, 1)),
+    ]
+
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(out_q.get(), timeout=remaining())
+            except asyncio.TimeoutError:
+                logger.warning("Deadline of %.1fs expired for: %s", config.deadline, user_topic)
+                run_span.set(deadline_expired=True)
+                return
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        ctx.run(run_span.__exit__, None, None, None)
+
+
+async def search_agent_stock_concurrent(user_topic: str, llm_callable, serper_api_key: Optional[str] = None,
+                                        max_links: int = 3, n_subqueries: int = 4,
+                                        config: Optional[PipelineConfig] = None,
+                                        **stage_fns) -> List[Dict[str, Any]]:
+    """
+    Collect stream_search_agent_stock into a list (completion order). Without an http_client
+    one is opened for this run and closed when it returns.
+    """
+    results: List[Dict[str, Any]] = []
+    async with owned_client(stage_fns.pop("http_client", None)) as client:
+        async for r in stream_search_agent_stock(user_topic, llm_callable, serper_api_key=serper_api_key,
+                                                 max_links=max_links, n_subqueries=n_subqueries,
+                                                 config=config, http_client=client, **stage_fns):
+            results.append(r)
+    return results
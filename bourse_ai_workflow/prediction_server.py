@@ -0,0 +1,202 @@
+"""
+prediction_server.py
+
+Small local HTTP prediction server for the LSTM forecaster with micro-batching.
+
+Concurrent requests are queued and merged into one Forecaster batch: the
+batcher waits at most `max_wait_ms` after the first queued request (or until
+`max_batch` tickers are pending) and then runs a single batched forward pass
+in a worker thread, so the event loop keeps accepting connections.
+
+Endpoints (JSON, HTTP/1.1 keep-alive):
+  GET  /health                                  -> {"status": "ok"}
+  POST /predict   {"tickers": ["IBM", "AAPL"]}  -> {"predictions": {"IBM": 185.2, ...}}
+
+Usage:
+  python prediction_server.py --port 8765 --max-batch 256 --max-wait-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from model_registry import BACKENDS, ModelRegistry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("prediction_server")
+
+MAX_BODY = 1 << 20
+
+
+class MicroBatcher:
+    """Merge concurrent predict() calls into batched Forecaster.predict calls."""
+    def __init__(self, forecaster, max_batch: int = 256, max_wait_ms: float = 5.0):
+        self.forecaster = forecaster
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.requests = 0
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def predict(self, tickers: List[str]) -> Dict[str, float]:
+        fut = asyncio.get_event_loop().create_future()
+        await self._queue.put((tickers, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = [await self._queue.get()]
+            n = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while n < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                n += len(item[0])
+
+            tickers = list(dict.fromkeys(t for req, _ in pending for t in req))
+            try:
+                df = await loop.run_in_executor(None, self.forecaster.predict, tickers)
+                preds = dict(zip(df['Ticker'], df['Predicted_Close'].astype(float)))
+            except Exception as e:
+                logger.exception("Batch prediction failed")
+                for _, fut in pending:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(pending)
+            for req, fut in pending:
+                if not fut.done():
+                    fut.set_result({t: preds[t] for t in req if t in preds})
+
+
+# -----------------------------
+# Minimal HTTP/1.1 handling (stdlib only)
+# -----------------------------
+def _response(status: int, payload: dict, keep_alive: bool = True) -> bytes:
+    body = json.dumps(payload).encode()
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}.get(status, "")
+    head = (f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+class PredictionServer:
+    def __init__(self, batcher: MicroBatcher, host: str = "127.0.0.1", port: int = 8765):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self) -> None:
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Prediction server listening on http://%s:%d", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    writer.write(_response(400, {"error": "body too large"}, keep_alive=False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await self._route(method, path, body)
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "batches": self.batcher.batches, "requests": self.batcher.requests}
+        if method == "POST" and path == "/predict":
+            try:
+                tickers = json.loads(body or b"{}")["tickers"]
+                if isinstance(tickers, str):
+                    tickers = [tickers]
+            except (ValueError, KeyError, TypeError):
+                return 400, {"error": 'expected JSON body {"tickers": [...]}'}
+            try:
+                return 200, {"predictions": await self.batcher.predict([str(t) for t in tickers])}
+            except Exception as e:
+                return 500, {"error": str(e)}
+        return 404, {"error": "not found"}
+
+
+def build_server(registry: Optional[ModelRegistry] = None, host: str = "127.0.0.1", port: int = 8765,
+                 max_batch: int = 256, max_wait_ms: float = 5.0) -> PredictionServer:
+    """Load (or reuse) the registry's forecaster and wrap it in a micro-batching server."""
+    registry = registry or ModelRegistry()
+    return PredictionServer(MicroBatcher(registry.forecaster(), max_batch, max_wait_ms), host, port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--backend", choices=BACKENDS, default="auto")
+    parser.add_argument("--data", default="all_stocks.csv", help="CSV or ingest.py Parquet root")
+    parser.add_argument("--cpu-optimized", action="store_true", help="int8 dynamic quantization (accuracy-gated)")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    cpu_mode = None
+    if args.cpu_optimized or args.threads:
+        from cpu_inference import CpuInferenceConfig
+        cpu_mode = CpuInferenceConfig(quantize=args.cpu_optimized, threads=args.threads)
+    t0 = time.perf_counter()
+    registry = ModelRegistry(data_path=args.data, backend=args.backend, cpu_mode=cpu_mode)
+    server = build_server(registry, args.host, args.port, args.max_batch, args.max_wait_ms)
+    logger.info("Model ready in %.2fs", time.perf_counter() - t0)
+    asyncio.run(server.serve_forever())
@@ -0,0 +1,255 @@
+"""
+sentiment_store.py
+
+Time-indexed sentiment store for parsed summaries (SQLite), partitioned by
+symbol and day.
+
+Two tables:
+ - mentions: one row per (symbol, link), with the day, sentiment, impact score
+   and the summary JSON; re-adding a link replaces its earlier rows
+ - daily:    running aggregates per (symbol, day): count, impact sum, count
+   per sentiment (bullish / neutral / bearish)
+Both are clustered on their primary key (WITHOUT ROWID), so the rows of one
+symbol over a date range are one contiguous index range. Every add updates
+the daily row in the same transaction as the mention (replacing a mention
+first subtracts its old contribution), so reads never re-aggregate history:
+daily() for one ticker over a year is a single range scan.
+
+A summary counts for every symbol it names, on its publication date (falling
+back to the day it was added). Summaries without a symbol are counted in
+stats()["unattributed"] and not stored (re-adding a link without symbols
+removes its earlier mentions).
+
+Usage:
+    store = SentimentStore("sentiment.sqlite")
+    store.add_result({"query": sub, "link": url, "summary": raw_llm_text})
+    store.daily("IBM", start="2025-10-01")       # [{"day", "count", "mean_impact", "bullish", ...}]
+    store.frame(["IBM", "AAPL"], start="2025-01-01")  # pandas, one row per (symbol, day)
+
+    python sentiment_store.py --db sentiment.sqlite --ingest results.jsonl
+    python sentiment_store.py --db sentiment.sqlite --symbol IBM --start 2025-10-01
+"""
+
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from summaries import SENTIMENTS, Summary, SummaryParseError, parse_summary
+
+logger = logging.getLogger("stock_search_agent.sentiment")
+
+DEFAULT_STORE_PATH = os.environ.get("SENTIMENT_STORE_PATH", "sentiment.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mentions (
+    symbol    TEXT NOT NULL,
+    link      TEXT NOT NULL,
+    day       TEXT NOT NULL,
+    sentiment TEXT NOT NULL,
+    impact    REAL NOT NULL,
+    summary   TEXT NOT NULL,
+    added     REAL NOT NULL,
+    PRIMARY KEY (symbol, link)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mentions_day ON mentions (symbol, day);
+CREATE INDEX IF NOT EXISTS mentions_link ON mentions (link);
+CREATE TABLE IF NOT EXISTS daily (
+    symbol     TEXT NOT NULL,
+    day        TEXT NOT NULL,
+    n          INTEGER NOT NULL,
+    impact_sum REAL NOT NULL,
+    bullish    INTEGER NOT NULL,
+    neutral    INTEGER NOT NULL,
+    bearish    INTEGER NOT NULL,
+    PRIMARY KEY (symbol, day)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_DAILY = """
+INSERT INTO daily (symbol, day, n, impact_sum, bullish, neutral, bearish) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (symbol, day) DO UPDATE SET
+    n = n + excluded.n, impact_sum = impact_sum + excluded.impact_sum,
+    bullish = bullish + excluded.bullish, neutral = neutral + excluded.neutral, bearish = bearish + excluded.bearish
+"""
+
+DAILY_COLUMNS = ["symbol", "day", "count", "mean_impact", "impact_sum"] + list(SENTIMENTS)
+
+
+def _delta(symbol: str, day: str, sentiment: str, impact: float, sign: int) -> tuple:
+    return (symbol, day, sign, sign * impact) + tuple(sign * (sentiment == s) for s in SENTIMENTS)
+
+
+def _row(symbol: str, day: str, n: int, impact_sum: float, *counts: int) -> Dict[str, Any]:
+    return {"symbol": symbol, "day": day, "count": n, "mean_impact": impact_sum / n if n else 0.0,
+            "impact_sum": impact_sum, **dict(zip(SENTIMENTS, counts))}
+
+
+class SentimentStore:
+    """
+    Thread-safe; one connection shared by the event loop and executor threads.
+    add()/add_many() update the per-day aggregates incrementally.
+    """
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self.unattributed = 0
+        self.parse_errors = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # --- writes ---
+    def _add(self, summary: Summary, link: str, day: str, now: float) -> int:
+        # a re-summarized link replaces all of its earlier mentions (its symbols may have changed,
+        # or be gone: then the link only drops out of the aggregates)
+        old = self._conn.execute("SELECT symbol, day, sentiment, impact FROM mentions WHERE link = ?",
+                                 (link,)).fetchall()
+        if old:
+            self._conn.executemany(_UPSERT_DAILY, [_delta(*row, -1) for row in old])
+            self._conn.execute("DELETE FROM mentions WHERE link = ?", (link,))
+        if not summary.symbols:
+            self.unattributed += 1
+            return len(old)
+        blob = json.dumps(summary.to_dict(), ensure_ascii=False)
+        self._conn.executemany(
+            "INSERT INTO mentions (symbol, link, day, sentiment, impact, summary, added) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(symbol, link, day, summary.sentiment, summary.impact_score, blob, now) for symbol in summary.symbols])
+        self._conn.executemany(_UPSERT_DAILY,
+                               [_delta(symbol, day, summary.sentiment, summary.impact_score, 1)
+                                for symbol in summary.symbols])
+        return len(summary.symbols)
+
+    def add(self, summary: Summary, link: str, day: Optional[str] = None) -> int:
+        """Store one summary under each of its symbols; returns the number of (symbol, day) rows touched."""
+        return self.add_many([(summary, link, day)])
+
+    def add_many(self, items: Iterable[tuple]) -> int:
+        """(summary, link[, day]) items in one transaction."""
+        now = time.time()
+        today = dt.date.today().isoformat()
+        touched = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for summary, link, *day in items:
+                    touched += self._add(summary, link, (day[0] if day else None) or summary.date or today, now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return touched
+
+    def add_result(self, result: Dict[str, Any]) -> int:
+        """A search_agent_stock / watchlist record ({"link", "summary": raw LLM text, ...}); unparseable ones are counted and skipped."""
+        return self.add_results([result])
+
+    def add_results(self, results: Iterable[Dict[str, Any]]) -> int:
+        items = []
+        for r in results:
+            try:
+                items.append((parse_summary(r["summary"]), r["link"]))
+            except (SummaryParseError, KeyError, TypeError) as e:
+                self.parse_errors += 1
+                logger.debug("Skipping unparseable summary for %s: %s", r.get("link"), e)
+        return self.add_many(items) if items else 0
+
+    # --- reads ---
+    def daily(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-day aggregates for one symbol, oldest first; start / end are inclusive YYYY-MM-DD."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT symbol, day, n, impact_sum, bullish, neutral, bearish FROM daily "
+                "WHERE symbol = ? AND day >= ? AND day <= ? AND n > 0 ORDER BY day",
+                (symbol.upper(), start or "", end or "9999")).fetchall()
+        return [_row(*r) for r in rows]
+
+    def summary(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+        """Aggregates for one symbol over a date range, combined from the daily rows."""
+        days = self.daily(symbol, start, end)
+        n = sum(d["count"] for d in days)
+        impact_sum = sum(d["impact_sum"] for d in days)
+        out = _row(symbol.upper(), days[-1]["day"] if days else "", n, impact_sum,
+                   *(sum(d[s] for d in days) for s in SENTIMENTS))
+        out["days"] = len(days)
+        return out
+
+    def frame(self, symbols: Optional[Iterable[str]] = None, start: Optional[str] = None,
+              end: Optional[str] = None):
+        """pandas DataFrame of DAILY_COLUMNS, one row per (symbol, day); all symbols by default."""
+        import pandas as pd
+        if symbols is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT symbol, day, n, impact_sum, bullish, neutral, bearish FROM daily "
+                    "WHERE day >= ? AND day <= ? AND n > 0 ORDER BY symbol, day",
+                    (start or "", end or "9999")).fetchall()
+            rows = [_row(*r) for r in rows]
+        else:
+            rows = [row for s in symbols for row in self.daily(s, start, end)]
+        df = pd.DataFrame(rows, columns=DAILY_COLUMNS)
+        df["day"] = pd.to_datetime(df["day"])
+        return df
+
+    def mentions(self, symbol: str, day: str) -> List[Dict[str, Any]]:
+        """The stored summaries behind one (symbol, day) aggregate."""
+        with self._lock:
+            rows = self._conn.execute("SELECT link, summary FROM mentions WHERE symbol = ? AND day = ? ORDER BY added",
+                                      (symbol.upper(), day)).fetchall()
+        return [{"link": link, **json.loads(blob)} for link, blob in rows]
+
+    # --- housekeeping ---
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            mentions, symbols = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT symbol) FROM mentions").fetchone()
+            days = self._conn.execute("SELECT COUNT(*) FROM daily WHERE n > 0").fetchone()[0]
+        return {"mentions": mentions, "symbols": symbols, "symbol_days": days,
+                "unattributed": self.unattributed, "parse_errors": self.parse_errors}
+
+    def rebuild(self) -> None:
+        """Recompute the daily table from mentions (after manual edits to mentions)."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM daily")
+            self._conn.execute(
+                "INSERT INTO daily SELECT symbol, day, COUNT(*), SUM(impact), "
+                + ", ".join(f"SUM(sentiment = '{s}')" for s in SENTIMENTS)
+                + " FROM mentions GROUP BY symbol, day")
+            self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SentimentStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--ingest", nargs="*", default=[], help="JSONL files of results (search agent / watchlist)")
+    parser.add_argument("--symbol", default=None)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    args = parser.parse_args()
+
+    with SentimentStore(args.db) as store:
+        for path in args.ingest:
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            print(f"{path}: {store.add_results(records)} (symbol, day) updates from {len(records)} records")
+        if args.symbol:
+            for row in store.daily(args.symbol, args.start, args.end):
+                print(f"{row['day']}  n={row['count']:<4} mean impact {row['mean_impact']:+.2f}  "
+                      + "  ".join(f"{s} {row[s]}" for s in SENTIMENTS))
+        print(json.dumps(store.stats()))
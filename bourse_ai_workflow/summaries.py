@@ -0,0 +1,298 @@
+"""
+summaries.py
+
+Typed records for the LLM page summaries produced by trip.summarize_with_llm.
+
+The summarize prompt asks for one JSON object (SUMMARY_FIELDS; TogetherChat
+also sends response_format=json_object). parse_summary turns the assistant
+text into a Summary:
+ - fast path: json.loads of the whole text
+ - then the outermost {...} (code fences / a sentence around the object)
+ - with strict=False, the older "field: value" text format as a last resort
+Values are validated and normalized: sentiment to bullish/neutral/bearish,
+impact score clamped to [-1, 1], date to YYYY-MM-DD or None, symbols
+upper-cased and deduplicated. Anything unusable raises SummaryParseError.
+
+Usage:
+    raw = await summarize_with_llm(llm.aget, sub, url, text)
+    s = parse_summary(raw)
+    s.symbols, s.sentiment, s.impact_score
+
+    s = await summarize_structured(llm.aget, sub, url, text)   # trip.py, same thing
+
+    parse_summaries(raw_batch, n_docs)   # batched response -> [Summary or None] per document
+    split_summaries(raw_batch, n_docs)   # same, each document's JSON text
+"""
+
+import datetime
+import json
+import math
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+SENTIMENTS = ("bullish", "neutral", "bearish")
+SENTIMENT_ALIASES = {
+    "positive": "bullish", "bull": "bullish", "buy": "bullish", "up": "bullish",
+    "negative": "bearish", "bear": "bearish", "sell": "bearish", "down": "bearish",
+    "mixed": "neutral", "hold": "neutral", "neutre": "neutral",
+}
+
+# field -> description; rendered into the prompt so the two never drift apart
+SUMMARY_FIELDS = {
+    "title": "article title",
+    "date": "publication date YYYY-MM-DD, or null if unknown",
+    "symbols": "list of stock ticker symbols, e.g. [\"IBM\"]",
+    "companies": "list of company names",
+    "key_facts": "list of 3-6 short facts",
+    "sentiment": "one of \"bullish\", \"neutral\", \"bearish\"",
+    "sentiment_reason": "one short sentence explaining the sentiment",
+    "impact_score": "number between -1.0 and 1.0",
+}
+
+# JSON schema for providers that accept one with response_format
+SUMMARY_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "date": {"type": ["string", "null"]},
+        "symbols": {"type": "array", "items": {"type": "string"}},
+        "companies": {"type": "array", "items": {"type": "string"}},
+        "key_facts": {"type": "array", "items": {"type": "string"}},
+        "sentiment": {"type": "string", "enum": list(SENTIMENTS)},
+        "sentiment_reason": {"type": "string"},
+        "impact_score": {"type": "number", "minimum": -1.0, "maximum": 1.0},
+    },
+    "required": ["title", "symbols", "sentiment", "impact_score"],
+}
+
+# batched requests (trip.summarize_batch_with_llm): {"summaries": [{"doc": 1, ...SUMMARY_FIELDS}, ...]}
+BATCH_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summaries": {
+            "type": "array",
+            "items": dict(SUMMARY_JSON_SCHEMA,
+                          properties=dict(SUMMARY_JSON_SCHEMA["properties"], doc={"type": "integer"}),
+                          required=["doc"] + SUMMARY_JSON_SCHEMA["required"]),
+        },
+    },
+    "required": ["summaries"],
+}
+
+DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+SYMBOL_RE = re.compile(r"^[A-Z0-9][A-Z0-9.\-=^]{0,11}$")
+FLOAT_RE = re.compile(r"[-+]?\d*\.?\d+")
+# "field: value" lines of the pre-JSON prompt ("Stock symbols: IBM", "- Impact score: 0.4")
+LEGACY_LINE_RE = re.compile(r"^[\s\-*#]*([A-Za-z][A-Za-z ()/_-]{1,40}?)\s*[:=]\s*(.*)$")
+LEGACY_KEYS = {
+    "title": "title", "date": "date", "stock symbols": "symbols", "symbols": "symbols",
+    "stock symbol": "symbols", "tickers": "symbols", "companies": "companies", "key facts": "key_facts",
+    "sentiment": "sentiment", "impact score": "impact_score", "impact": "impact_score",
+}
+
+
+class SummaryParseError(ValueError):
+    """The assistant text is not a usable summary."""
+
+
+@dataclass
+class Summary:
+    title: str
+    sentiment: str
+    impact_score: float
+    symbols: List[str] = field(default_factory=list)
+    date: Optional[str] = None
+    companies: List[str] = field(default_factory=list)
+    key_facts: List[str] = field(default_factory=list)
+    sentiment_reason: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Summary":
+        """Validate and normalize a decoded JSON object."""
+        if not isinstance(data, dict):
+            raise SummaryParseError(f"expected a JSON object, got {type(data).__name__}")
+        return cls(
+            title=_text(data.get("title")),
+            sentiment=_sentiment(data.get("sentiment")),
+            impact_score=_impact(data.get("impact_score", data.get("impact"))),
+            symbols=_symbols(data.get("symbols", data.get("stock_symbols"))),
+            date=_date(data.get("date")),
+            companies=_strings(data.get("companies")),
+            key_facts=_strings(data.get("key_facts")),
+            sentiment_reason=_text(data.get("sentiment_reason")),
+        )
+
+
+# === field normalizers ===
+def _text(value: Any) -> str:
+    return value.strip() if isinstance(value, str) else ("" if value is None else str(value))
+
+
+def _strings(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = re.split(r"[,;\n]", value)
+    if not isinstance(value, (list, tuple)):
+        raise SummaryParseError(f"expected a list, got {type(value).__name__}")
+    return [s for s in (_text(v).lstrip("-*• ").strip() for v in value) if s]
+
+
+def _symbols(value: Any) -> List[str]:
+    out = []
+    for s in _strings(value):
+        s = s.upper().lstrip("$").split(":")[-1].strip()  # "$IBM", "NYSE:IBM"
+        if SYMBOL_RE.match(s) and s not in out:
+            out.append(s)
+    return out
+
+
+def _sentiment(value: Any) -> str:
+    s = _text(value).lower()
+    word = re.match(r"[a-z]+", s)
+    s = word.group(0) if word else s
+    s = SENTIMENT_ALIASES.get(s, s)
+    if s not in SENTIMENTS:
+        raise SummaryParseError(f"unknown sentiment {value!r}")
+    return s
+
+
+def _impact(value: Any) -> float:
+    if isinstance(value, str):
+        m = FLOAT_RE.search(value)
+        value = m.group(0) if m else None
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        raise SummaryParseError(f"impact score is not a number: {value!r}") from None
+    if math.isnan(x):
+        raise SummaryParseError("impact score is NaN")
+    return min(1.0, max(-1.0, x))
+
+
+def _date(value: Any) -> Optional[str]:
+    m = DATE_RE.search(_text(value))
+    if not m:
+        return None
+    try:
+        day = datetime.date.fromisoformat(m.group(0))  # rejects 2025-02-31, 2025-13-01
+    except ValueError:
+        return None
+    return m.group(0) if day.year >= 1900 else None
+
+
+# === parsing ===
+def _legacy(raw: str) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    facts: List[str] = []
+    key = None
+    for line in raw.splitlines():
+        m = LEGACY_LINE_RE.match(line)
+        name = LEGACY_KEYS.get(m.group(1).strip().lower()) if m else None
+        if name:
+            key = name
+            value = m.group(2).strip()
+            if name == "sentiment" and value:
+                word, _, reason = value.partition(" ")
+                data["sentiment"] = word.strip("(),.-")
+                data.setdefault("sentiment_reason", reason.strip(" ()-:,."))
+            elif name == "key_facts":
+                if value:
+                    facts.append(value)
+            elif value:
+                data[name] = value
+        elif key == "key_facts" and line.strip():
+            facts.append(line.strip())
+    if facts:
+        data["key_facts"] = facts
+    if "sentiment" not in data:
+        raise SummaryParseError("no JSON object and no 'sentiment:' line")
+    data.setdefault("impact_score", 0.0)
+    return data
+
+
+def parse_summary(raw: str, strict: bool = False) -> Summary:
+    """
+    Assistant text -> Summary. strict=True accepts JSON only (whole text or its
+    outermost {...}); the default also reads the older "field: value" format.
+    """
+    text = (raw or "").strip()
+    try:
+        return Summary.from_dict(json.loads(text))
+    except json.JSONDecodeError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        try:
+            return Summary.from_dict(json.loads(text[start:end + 1]))
+        except json.JSONDecodeError as e:
+            if strict:
+                raise SummaryParseError(f"invalid JSON: {e}") from None
+    if strict:
+        raise SummaryParseError("no JSON object in the response")
+    return Summary.from_dict(_legacy(text))
+
+
+def try_parse_summary(raw: str, strict: bool = False) -> Optional[Summary]:
+    """parse_summary, or None when the text is not a usable summary."""
+    try:
+        return parse_summary(raw, strict=strict)
+    except SummaryParseError:
+        return None
+
+
+def _load_json(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    end = max(text.rfind("}"), text.rfind("]"))
+    if 0 <= start < end:
+        try:
+            return json.loads(text[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise SummaryParseError(f"invalid JSON: {e}") from None
+    raise SummaryParseError("no JSON in the response")
+
+
+def _batch_items(raw: str, n: int) -> List[Optional[Tuple[Dict[str, Any], Summary]]]:
+    data = _load_json((raw or "").strip())
+    items = data.get("summaries") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise SummaryParseError("no 'summaries' list in the response")
+    out: List[Optional[Tuple[Dict[str, Any], Summary]]] = [None] * n
+    for pos, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        doc = item.get("doc")
+        i = doc - 1 if isinstance(doc, int) and 1 <= doc <= n else pos
+        if i >= n or out[i] is not None:
+            continue
+        try:
+            out[i] = (item, Summary.from_dict(item))
+        except SummaryParseError:
+            pass
+    return out
+
+
+def parse_summaries(raw: str, n: int) -> List[Optional[Summary]]:
+    """
+    Batched response -> one Summary (or None) per document. Items are matched
+    by their 1-based "doc" number, else by position; missing or invalid items
+    are None so the caller can summarize those documents again on their own.
+    """
+    return [pair and pair[1] for pair in _batch_items(raw, n)]
+
+
+def split_summaries(raw: str, n: int) -> List[Optional[str]]:
+    """
+    parse_summaries, but each document's object as the model wrote it (JSON text,
+    without "doc"): the same form a single-document request returns.
+    """
+    return [pair and json.dumps({k: v for k, v in pair[0].items() if k != "doc"}, ensure_ascii=False)
+            for pair in _batch_items(raw, n)]
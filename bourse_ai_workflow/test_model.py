@@ -1,52 +1,15 @@
 import torch
-import torch.nn as nn
-import pickle
 import pandas as pd
 import numpy as np
+from model_registry import get_registry
 
 # -----------------------------
 # Device
 # -----------------------------
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# -----------------------------
-# LSTM Model Definition
-# -----------------------------
-class LSTMModel(nn.Module):
-    def __init__(self, input_size, hidden_size1=64, hidden_size2=32):
-        super(LSTMModel, self).__init__()
-        self.lstm1 = nn.LSTM(input_size, hidden_size1, batch_first=True)
-        self.lstm2 = nn.LSTM(hidden_size1, hidden_size2, batch_first=True)
-        self.fc = nn.Linear(hidden_size2, 1)
-    
-    def forward(self, x):
-        out, _ = self.lstm1(x)
-        out, _ = self.lstm2(out)
-        out = out[:, -1, :]  # take last timestep
-        out = self.fc(out)
-        return out
-
-# -----------------------------
-# Load trained model
-# -----------------------------
-model = LSTMModel(input_size=10)  # 10 features
-model.load_state_dict(torch.load("second_model_lstm.pth", map_location=device))
-model.to(device)
-model.eval()
-
-# -----------------------------
-# Load scaler and encoder
-# -----------------------------
-with open("second_model_scaler.pkl", "rb") as f:
-    scaler = pickle.load(f)
-
-with open("second_model_encoder.pkl", "rb") as f:
-    encoder = pickle.load(f)
-
-# -----------------------------
-# Load dataset
-# -----------------------------
-df_all = pd.read_csv("all_stocks.csv", parse_dates=['Date'])
+# Importing this module has no side effects: the model, scaler, encoder and
+# window store are loaded lazily (once) by model_registry on first use.
 
 # -----------------------------
 # Prepare input for LSTM
@@ -99,29 +62,25 @@ def predict_next_close(model, X_tensor, scaler):
 # -----------------------------
 # Get last 30 days for a ticker
 # -----------------------------
-def get_last_30_days(ticker):
-    df_ticker = df_all[df_all['Ticker'] == ticker].copy()
-    df_ticker = df_ticker.sort_values(by='Date')
-    df_last30 = df_ticker.tail(30).reset_index(drop=True)
-    return df_last30
+def get_last_30_days(ticker, store=None):
+    store = store or get_registry().store
+    return store.frame(ticker, 30)
 
 # -----------------------------
-# Predict for tickers
+# Predict for tickers (one batched forward pass; prepare_input /
+# predict_next_close above remain the single-ticker reference path)
 # -----------------------------
-tickers = ['IBM','GOOG','MSFT','AAPL']
-predictions = {}
+def main(tickers=('IBM', 'GOOG', 'MSFT', 'AAPL')):
+    forecaster = get_registry(device=device).forecaster()
+    predictions = dict(forecaster.predict(list(tickers)).itertuples(index=False, name=None))
 
-for ticker in tickers:
-    df_last30 = get_last_30_days(ticker)
-    X_tensor = prepare_input(df_last30, ticker, scaler, encoder)
-    
-    # Prediction
-    pred_close = predict_next_close(model, X_tensor, scaler)
-    predictions[ticker] = pred_close
+    # -----------------------------
+    # Print results
+    # -----------------------------
+    print("Predicted Close prices for next day:")
+    for t, p in predictions.items():
+        print(f"{t}: {p:.2f}")
 
-# -----------------------------
-# Print results
-# -----------------------------
-print("Predicted Close prices for next day:")
-for t, p in predictions.items():
-    print(f"{t}: {p:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+tracing.py
+
+Lightweight per-stage tracing and metrics for the stock search agent.
+
+ - spans: named, timed sections with attributes (stage, url, query, ...),
+   nested per asyncio task via contextvars
+ - counters: monotonically increasing values with labels (bytes fetched,
+   characters / tokens sent to the LLM, cache hits, failures)
+
+The active Tracer lives in a ContextVar, so the helpers in trip.py record into
+whatever tracer the caller installed (search_agent_stock(..., tracer=...)) and
+into nothing otherwise. The default NOOP tracer returns a shared no-op context
+manager, so disabled tracing costs one ContextVar lookup per call site.
+
+Export:
+ - Tracer.write_json(path): Chrome trace-event JSON (open in chrome://tracing or
+   ui.perfetto.dev) plus a "counters" and "stages" summary
+ - Tracer.prometheus_text() / write_prometheus(path): Prometheus text format
+   (node_exporter textfile collector), or serve_metrics(tracer, port) for a
+   /metrics endpoint
+
+Usage:
+    tracer = Tracer()
+    results = await search_agent_stock(topic, llm.aget, tracer=tracer)
+    tracer.write_json("trace.json")
+    tracer.write_prometheus("search_agent.prom")
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("stock_search_agent.tracing")
+
+METRIC_PREFIX = "stock_search_agent"
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start", "parent", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> "_Span":
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, end, self.parent, self.attrs)
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Collects spans and counters. Thread-safe (TogetherChat runs in executor threads)."""
+    enabled = True
+
+    def __init__(self, service: str = "search_agent"):
+        self.service = service
+        self.origin = time.perf_counter()
+        self.spans: List[Tuple[str, float, float, Optional[str], Dict[str, Any], int]] = []
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs) -> _Span:
+        return _Span(self, name, attrs)
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def _record(self, name, start, end, parent, attrs) -> None:
+        with self._lock:
+            self.spans.append((name, start, end, parent, attrs, threading.get_ident()))
+
+    # --- summaries / export ---
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """{span name: {count, total_s, max_s}}"""
+        out: Dict[str, Dict[str, float]] = {}
+        for name, start, end, _, _, _ in list(self.spans):
+            s = out.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            s["count"] += 1
+            s["total_s"] += end - start
+            s["max_s"] = max(s["max_s"], end - start)
+        return out
+
+    def to_json(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                   "ts": round((start - self.origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                   "args": dict(attrs, parent=parent) if parent else attrs}
+                  for name, start, end, parent, attrs, tid in list(self.spans)]
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "service": self.service,
+                "counters": counters, "stages": self.stage_summary()}
+
+    def write_json(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, default=str)
+        return path
+
+    def prometheus_text(self) -> str:
+        lines = []
+        seen = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_labels(dict(labels))} {value:g}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds summary")
+        for stage, s in sorted(self.stage_summary().items()):
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_sum{_labels({'stage': stage})} {s['total_s']:.6f}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_count{_labels({'stage': stage})} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> str:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)  # textfile collectors must never see a partial file
+        return path
+
+
+class NoopTracer:
+    """Disabled tracer: every call is a constant-time no-op."""
+    enabled = False
+
+    def span(self, name: str, **attrs) -> _NoopSpan:
+        return _NOOP_SPAN
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        pass
+
+
+NOOP = NoopTracer()
+_current_tracer: contextvars.ContextVar = contextvars.ContextVar("search_agent_tracer", default=NOOP)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("search_agent_span", default=None)
+
+
+def get_tracer():
+    return _current_tracer.get()
+
+
+def set_tracer(tracer) -> contextvars.Token:
+    """Install tracer in the current context (unscoped; see use_tracer)."""
+    return _current_tracer.set(tracer)
+
+
+@contextlib.contextmanager
+def use_tracer(tracer: Optional[Tracer]) -> Iterator[Any]:
+    """Install tracer for the current context (tasks created inside inherit it)."""
+    if tracer is None:
+        yield get_tracer()
+        return
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+def serve_metrics(tracer: Tracer, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve tracer.prometheus_text() at http://host:port/metrics from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
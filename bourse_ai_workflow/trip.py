@@ -2,7 +2,7 @@
 stock_search_agent_with_together.py
 
 Requirements:
-  pip install requests beautifulsoup4 playwright nest_asyncio
+  pip install requests "httpx[http2]" beautifulsoup4 playwright nest_asyncio
   python -m playwright install
 
 Environment variables (required):
@@ -10,21 +10,32 @@ Environment variables (required):
   TOGETHER_API_KEY  - Together AI API key (SDK dependent)
 
 This module defines:
- - TogetherChat: a small wrapper for the Together chat API (sync + async)
- - Serper search helper
- - fetch_text: Playwright dynamic scrape with requests fallback
+ - TogetherChat: a small wrapper for the Together chat API (sync + async, optional streaming with time-to-first-token)
+ - Serper search helper (sync search_serper + pooled async asearch_serper)
+ - fetch_text: Playwright dynamic scrape with pooled HTTP fallback (optionally via a BrowserPool)
  - generate_subqueries: ask the LLM for 3-4 focused queries
- - summarize_with_llm: ask the LLM to produce a machine-readable summary
+ - summarize_with_llm: ask the LLM for a JSON summary (summarize_structured parses it into summaries.Summary)
+ - summarize_batch_with_llm: several short documents of one subquery per request, one summary each
  - search_agent_stock: orchestrator that returns summaries for each top link
+
+Pass tracer=tracing.Tracer() to search_agent_stock for per-stage spans and counters.
 """
 
 import os
 import asyncio
+import contextvars
+import functools
+import json
 import logging
+import threading
+import time
 import nest_asyncio
 import requests
-from typing import List, Dict, Any, Optional
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Tuple
+from extract import batch_budget, budget_excerpt, count_tokens, get_default_extractor, pack_batches
+from http_client import get_default_client, owned_client
+from summaries import BATCH_JSON_SCHEMA, SUMMARY_FIELDS, SUMMARY_JSON_SCHEMA, Summary, parse_summary, split_summaries
+from tracing import get_tracer, use_tracer
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -61,14 +72,32 @@ except Exception as e:
         "Install the SDK or adjust the import per Together docs. Error: %s", e
     )
 
+
+def _rejects_response_format(e: Exception) -> bool:
+    """A 400 / invalid-request error about response_format (the model does not support it)."""
+    status = getattr(e, "http_status", None) or getattr(e, "status_code", None)
+    name = type(e).__name__
+    bad_request = status in (400, 422) or "InvalidRequest" in name or "BadRequest" in name
+    return bad_request and "response_format" in str(e)
+
+
 class TogetherChat:
     """
     Thin wrapper around Together chat API.
     - reads API key from env or accepts client via constructor
     - provides sync _call_ and async aget methods
+    - optional cache (cache.ResponseCache) keyed by hash(model, messages)
+    - optional response_format (e.g. JSON mode); dropped for the rest of the session if the model rejects it
+    - stream_call / astream yield tokens as they arrive; streaming=True makes __call__ / aget stream too,
+      so every request records its time to first token (last_ttft, llm_ttft_seconds / llm_streams counters)
     """
-    def __init__(self, model: str = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo", client: Optional[Any] = None):
+    def __init__(self, model: str = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo", client: Optional[Any] = None,
+                 cache: Optional[Any] = None, streaming: bool = False):
         self.model = model
+        self.cache = cache
+        self.streaming = streaming
+        self.response_format_supported = True
+        self.last_ttft: Optional[float] = None
         if client is not None:
             self.client = client
         else:
@@ -90,10 +119,100 @@ class TogetherChat:
             formatted.append({"role": role, "content": m.get("content", "")})
         return formatted
 
-    def __call__(self, messages: List[Dict[str, str]]) -> str:
+    def __call__(self, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> str:
         """Synchronous API call. Returns assistant text."""
+        if self.streaming:
+            return self.stream_call(messages, response_format=response_format)
         formatted = self._format_messages(messages)
-        resp = self.client.chat.completions.create(model=self.model, messages=formatted, stream=False)
+        tracer = get_tracer()
+        if self.cache is not None:
+            cached = self.cache.get_llm(self.model, formatted)
+            if cached is not None:
+                tracer.count("cache_hits", kind="llm")
+                return cached
+        with tracer.span("llm_request", model=self.model):
+            resp = self._create(formatted, response_format)
+        if tracer.enabled:
+            usage = getattr(resp, "usage", None)
+            tracer.count("llm_prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0, model=self.model)
+            tracer.count("llm_completion_tokens", getattr(usage, "completion_tokens", 0) or 0, model=self.model)
+        text = self._extract_text(resp)
+        if self.cache is not None and text:
+            self.cache.put_llm(self.model, formatted, text)
+        return text
+
+    def _create(self, formatted: List[Dict[str, str]], response_format: Optional[Dict[str, Any]],
+                stream: bool = False) -> Any:
+        if response_format is not None and self.response_format_supported:
+            try:
+                return self.client.chat.completions.create(model=self.model, messages=formatted, stream=stream,
+                                                           response_format=response_format)
+            except Exception as e:
+                if not _rejects_response_format(e):
+                    raise  # rate limits, timeouts, 5xx: the caller's retry policy applies
+                # the prompt asks for the same format, so plain output still parses
+                logger.warning("%s rejected response_format, continuing without it: %s", self.model, e)
+                self.response_format_supported = False
+        return self.client.chat.completions.create(model=self.model, messages=formatted, stream=stream)
+
+    def stream_call(self, messages: List[Dict[str, str]], on_token: Optional[Callable[[str], Any]] = None,
+                    response_format: Optional[Dict[str, Any]] = None,
+                    stop: Optional[threading.Event] = None) -> str:
+        """
+        Streaming API call: on_token(delta) is called for every text delta as it arrives; returns the full text.
+        stop: optional threading.Event; once set, the rest of the stream is abandoned (and not cached).
+        """
+        formatted = self._format_messages(messages)
+        tracer = get_tracer()
+        if self.cache is not None:
+            cached = self.cache.get_llm(self.model, formatted)
+            if cached is not None:
+                tracer.count("cache_hits", kind="llm")
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+        parts: List[str] = []
+        usage = None
+        with tracer.span("llm_request", model=self.model, stream=True) as span:
+            t0 = time.perf_counter()
+            chunks = self._create(formatted, response_format, stream=True)
+            try:
+                for chunk in chunks:
+                    usage = getattr(chunk, "usage", None) or usage
+                    delta = self._delta_text(chunk)
+                    if not delta:
+                        continue
+                    if not parts:
+                        self.last_ttft = time.perf_counter() - t0
+                        span.set(ttft_s=round(self.last_ttft, 4))
+                        tracer.count("llm_ttft_seconds", self.last_ttft, model=self.model)
+                        tracer.count("llm_streams", model=self.model)
+                    parts.append(delta)
+                    if on_token is not None:
+                        on_token(delta)
+                    if stop is not None and stop.is_set():
+                        break
+            finally:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+        if tracer.enabled and usage is not None:
+            tracer.count("llm_prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0, model=self.model)
+            tracer.count("llm_completion_tokens", getattr(usage, "completion_tokens", 0) or 0, model=self.model)
+        text = "".join(parts).strip()
+        if self.cache is not None and text and not (stop is not None and stop.is_set()):
+            self.cache.put_llm(self.model, formatted, text)
+        return text
+
+    @staticmethod
+    def _delta_text(chunk: Any) -> str:
+        try:
+            return chunk.choices[0].delta.content or ""
+        except Exception:
+            return ""
+
+    @staticmethod
+    def _extract_text(resp: Any) -> str:
         # defensive extraction depending on SDK response shape:
         try:
             return resp.choices[0].message.content.strip()
@@ -104,53 +223,158 @@ class TogetherChat:
             except Exception:
                 return ""
 
-    async def aget(self, messages: List[Dict[str, str]]) -> str:
+    async def aget(self, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> str:
         """Async wrapper that runs sync call in a threadpool."""
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.__call__, messages)
+        # copy the context so the worker thread records into the caller's tracer
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(ctx.run, self.__call__, messages, response_format))
+
+    async def astream(self, messages: List[Dict[str, str]],
+                      response_format: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async iterator over text deltas as they arrive (stream_call in a threadpool)."""
+        loop = asyncio.get_event_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+        ctx = contextvars.copy_context()
+        fut = loop.run_in_executor(None, functools.partial(
+            ctx.run, self.stream_call, messages, lambda delta: loop.call_soon_threadsafe(queue.put_nowait, delta),
+            response_format, stop))
+        # runs on the loop after every delta scheduled by the worker thread
+        fut.add_done_callback(lambda _: queue.put_nowait(end))
+        try:
+            while True:
+                delta = await queue.get()
+                if delta is end:
+                    break
+                yield delta
+            await fut  # re-raise API errors
+        finally:
+            stop.set()
 
 # === Serper search helper (uses env key) ===
+SERPER_URL = "https://google.serper.dev/search"
+
+def _serper_links(data: Dict[str, Any], query: str) -> List[str]:
+    organic = data.get("organic", [])
+    links = [item.get("link") for item in organic if item.get("link")]
+    logger.info("Serper returned %d links for query: %s", len(links), query)
+    return links
+
 def search_serper(query: str, api_key: Optional[str] = None, num_results: int = 10) -> List[str]:
-    """Return a list of organic links from Serper (google.serper.dev)."""
+    """Return a list of organic links from Serper (google.serper.dev). Blocking; async code should use asearch_serper."""
     api_key = api_key or SERPER_API_KEY
     if not api_key:
         logger.error("SERPER_API_KEY missing; search_serper will return [].")
         return []
-    url = "https://google.serper.dev/search"
     headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
     payload = {"q": query, "num": num_results}
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=15)
+        resp = requests.post(SERPER_URL, headers=headers, json=payload, timeout=15)
         resp.raise_for_status()
-        data = resp.json()
-        organic = data.get("organic", [])
-        links = [item.get("link") for item in organic if item.get("link")]
-        logger.info("Serper returned %d links for query: %s", len(links), query)
-        return links
+        return _serper_links(resp.json(), query)
     except Exception as e:
         logger.warning("Serper search failed for query '%s': %s", query, e)
         return []
 
+async def asearch_serper(query: str, api_key: Optional[str] = None, num_results: int = 10,
+                         http_client: Optional[Any] = None) -> List[str]:
+    """
+    Async search_serper routed through the pooled http_client.AsyncHttpClient
+    (keep-alive, retries on 429/5xx, optional SERPER_RATE_LIMIT token bucket).
+    """
+    api_key = api_key or SERPER_API_KEY
+    if not api_key:
+        logger.error("SERPER_API_KEY missing; search_serper will return [].")
+        return []
+    headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
+    payload = {"q": query, "num": num_results}
+    tracer = get_tracer()
+    with tracer.span("serper", query=query) as span:
+        try:
+            client = http_client or get_default_client()
+            resp = await client.post(SERPER_URL, headers=headers, json=payload, timeout=15)
+            resp.raise_for_status()
+            links = _serper_links(resp.json(), query)
+            span.set(links=len(links))
+            return links
+        except Exception as e:
+            logger.warning("Serper search failed for query '%s': %s", query, e)
+            tracer.count("failures", stage="serper")
+            return []
+
 # === fetch_text: Playwright dynamic fetch with requests fallback ===
-async def fetch_text(url: str, use_playwright: bool = True, timeout: int = 60) -> str:
-    """Return visible text extracted from URL. Uses Playwright (async) if available else requests."""
+async def fetch_text(url: str, use_playwright: bool = True, timeout: int = 60, pool: Optional[Any] = None,
+                     cache: Optional[Any] = None, http_client: Optional[Any] = None,
+                     extractor: Optional[Any] = None) -> str:
+    """
+    Return the main-content text of URL (boilerplate removed, parsed off the event loop).
+    Uses Playwright (async) if available else a plain HTTP GET.
+    pool: optional browser_pool.BrowserPool; reuses its Chromium instead of launching one per URL.
+    cache: optional cache.ResponseCache; fresh page text is served from it and non-empty results stored.
+    http_client: optional http_client.AsyncHttpClient for the fallback GET (default: shared per-loop client).
+    extractor: optional extract.Extractor (default: shared process-pool extractor, backend from EXTRACT_BACKEND).
+    """
+    tracer = get_tracer()
+    loop = asyncio.get_event_loop()
+    with tracer.span("fetch", url=url) as span:
+        if cache is not None:
+            # SQLite calls block; keep them off the loop every fetch worker shares
+            cached = await loop.run_in_executor(None, cache.get_page, url)
+            if cached is not None:
+                tracer.count("cache_hits", kind="page")
+                span.set(cached=True)
+                return cached
+        text = await _fetch_text_uncached(url, use_playwright=use_playwright, timeout=timeout, pool=pool,
+                                          http_client=http_client, extractor=extractor)
+        if not text:
+            tracer.count("failures", stage="fetch")
+        if cache is not None and text:
+            await loop.run_in_executor(None, cache.put_page, url, text)
+        span.set(chars=len(text))
+        return text
+
+async def _html_to_text(html: str, url: str, extractor: Optional[Any] = None) -> str:
+    tracer = get_tracer()
+    if tracer.enabled:
+        tracer.count("bytes_fetched", len(html.encode("utf-8", "ignore")))
+    extractor = extractor or get_default_extractor()
+    with tracer.span("parse", url=url, backend=extractor.backend):
+        return await extractor.aextract(html)
+
+async def _fetch_text_uncached(url: str, use_playwright: bool = True, timeout: int = 60,
+                               pool: Optional[Any] = None, http_client: Optional[Any] = None,
+                               extractor: Optional[Any] = None) -> str:
     try:
-        if use_playwright and PLAYWRIGHT_AVAILABLE:
+        tracer = get_tracer()
+        if use_playwright and pool is not None:
             try:
-                async with async_playwright() as p:
-                    browser = await p.chromium.launch(headless=True)
-                    page = await browser.new_page()
-                    await page.goto(url, timeout=timeout * 1000)
-                    html = await page.content()
-                    await browser.close()
-                return BeautifulSoup(html, "html.parser").get_text(separator="\n", strip=True)
+                with tracer.span("navigate", url=url, via="pool"):
+                    html = await pool.fetch_html(url, timeout=timeout)
+                return await _html_to_text(html, url, extractor)
+            except Exception as e_play:
+                logger.debug("Pooled Playwright fetch failed for %s: %s", url, e_play)
+                # fall through to requests fallback
+        elif use_playwright and PLAYWRIGHT_AVAILABLE:
+            try:
+                with tracer.span("navigate", url=url, via="playwright"):
+                    async with async_playwright() as p:
+                        browser = await p.chromium.launch(headless=True)
+                        page = await browser.new_page()
+                        await page.goto(url, timeout=timeout * 1000)
+                        html = await page.content()
+                        await browser.close()
+                return await _html_to_text(html, url, extractor)
             except Exception as e_play:
                 logger.debug("Playwright fetch failed for %s: %s", url, e_play)
                 # fall through to requests fallback
         # fallback
-        resp = requests.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
-        resp.raise_for_status()
-        return BeautifulSoup(resp.text, "html.parser").get_text(separator="\n", strip=True)
+        client = http_client or get_default_client()
+        with tracer.span("navigate", url=url, via="http"):
+            resp = await client.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
+            resp.raise_for_status()
+        return await _html_to_text(resp.text, url, extractor)
     except Exception as e:
         logger.warning("Failed to fetch text from %s: %s", url, e)
         return ""
@@ -158,10 +382,15 @@ async def fetch_text(url: str, use_playwright: bool = True, timeout: int = 60) -
 # === small LLM helper to support sync/async callables ===
 async def _call_llm(llm_callable, messages: List[Dict[str, str]]) -> str:
     """Call llm_callable which can be sync (callable) or async (coroutine function)."""
-    if asyncio.iscoroutinefunction(llm_callable):
-        return await llm_callable(messages)
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, llm_callable, messages)
+    tracer = get_tracer()
+    if tracer.enabled:
+        tracer.count("llm_chars", sum(len(m.get("content", "")) for m in messages))
+    with tracer.span("llm"):
+        if asyncio.iscoroutinefunction(llm_callable):
+            return await llm_callable(messages)
+        loop = asyncio.get_event_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(ctx.run, llm_callable, messages))
 
 # === parse simple list output from LLM ===
 def parse_list_text(text: str, max_items: int = 4) -> List[str]:
@@ -189,7 +418,8 @@ async def generate_subqueries(llm_callable, user_topic: str, n: int = 4) -> List
             "company performance, economic factors, political events, market psychology, external shocks, social media, and today's news."
         )
     }
-    raw = await _call_llm(llm_callable, [system, user])
+    with get_tracer().span("generate_subqueries", topic=user_topic):
+        raw = await _call_llm(llm_callable, [system, user])
     queries = parse_list_text(raw, max_items=n)
     if not queries:
         # fallback naive queries in English
@@ -201,56 +431,219 @@ async def generate_subqueries(llm_callable, user_topic: str, n: int = 4) -> List
     logger.info("Generated %d subqueries", len(queries))
     return queries
 
-# === ask LLM to summarize in English and return structured text ===
-async def summarize_with_llm(llm_callable, subquery: str, url: str, text: str, max_chars: int = 15000) -> str:
-    excerpt = text[:max_chars]
+# === ask LLM to summarize in English and return a JSON summary ===
+def _llm_model(llm_callable) -> Optional[str]:
+    """Model name of a TogetherChat (or its bound aget), for per-model token budgets."""
+    return getattr(getattr(llm_callable, "__self__", llm_callable), "model", None)
+
+def _json_mode(llm_callable, schema: Dict[str, Any] = SUMMARY_JSON_SCHEMA):
+    """TogetherChat callables get response_format=json_object; other callables are used as they are."""
+    if isinstance(getattr(llm_callable, "__self__", llm_callable), TogetherChat):
+        return functools.partial(llm_callable, response_format={"type": "json_object", "schema": schema})
+    return llm_callable
+
+SUMMARY_PROMPT_FIELDS = "\n".join(f'  "{k}": {v}' for k, v in SUMMARY_FIELDS.items())
+
+async def summarize_with_llm(llm_callable, subquery: str, url: str, text: str, max_chars: int = 15000,
+                             token_budget: Optional[int] = None) -> str:
+    """token_budget: excerpt size in tokens (default: extract.MODEL_TOKEN_BUDGETS for the model); max_chars is a hard cap."""
+    excerpt = budget_excerpt(text, model=_llm_model(llm_callable), budget=token_budget, max_chars=max_chars)
     system = {"role": "system", "content": "You are a market analyst assistant. Produce machine-readable summaries in English."}
     user = {
         "role": "user",
         "content": (
             f"Query: {subquery}\nSource: {url}\n\nWeb content (truncated):\n{excerpt}\n\n"
-            "Produce a concise, machine-readable summary with these fields: "
-            "title, date (YYYY-MM-DD or empty if unknown), stock symbols (comma-separated), companies, "
-            "key facts (3-6 bullets), sentiment (bullish/neutral/bearish) with short explanation, "
-            "impact score (float between -1.0 and 1.0). Keep output short and analyzable."
+            "Summarize the content as a single JSON object with exactly these keys:\n"
+            f"{SUMMARY_PROMPT_FIELDS}\n"
+            "Output only the JSON object, no prose or code fences. Keep values short."
         )
     }
-    raw = await _call_llm(llm_callable, [system, user])
+    with get_tracer().span("summarize", url=url, query=subquery):
+        raw = await _call_llm(_json_mode(llm_callable), [system, user])
     return raw
 
+async def summarize_structured(llm_callable, subquery: str, url: str, text: str, **kwargs) -> Summary:
+    """summarize_with_llm parsed into a summaries.Summary (raises summaries.SummaryParseError)."""
+    return parse_summary(await summarize_with_llm(llm_callable, subquery, url, text, **kwargs))
+
+# === several documents of one subquery per request ===
+async def _summarize_packed(llm_callable, subquery: str, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """One request for (url, excerpt) items; the system prompt and instructions are sent once."""
+    system = {"role": "system", "content": "You are a market analyst assistant. Produce machine-readable summaries in English."}
+    docs = "".join(f"### Document {k}\nSource: {url}\n{excerpt}\n\n" for k, (url, excerpt) in enumerate(items, 1))
+    user = {
+        "role": "user",
+        "content": (
+            f"Query: {subquery}\n\nWeb content of {len(items)} documents (truncated):\n\n{docs}"
+            f"Summarize each of the {len(items)} documents separately. Output a single JSON object "
+            '{"summaries": [...]} with one object per document, in document order, each with exactly these keys:\n'
+            '  "doc": the document number\n'
+            f"{SUMMARY_PROMPT_FIELDS}\n"
+            "Output only the JSON object, no prose or code fences. Keep values short."
+        )
+    }
+    tracer = get_tracer()
+    tracer.count("llm_batched_docs", len(items))
+    with tracer.span("summarize_batch", query=subquery, docs=len(items)):
+        raw = await _call_llm(_json_mode(llm_callable, BATCH_JSON_SCHEMA), [system, user])
+    return split_summaries(raw, len(items))
+
+async def summarize_batch_with_llm(llm_callable, subquery: str, docs: List[Tuple[str, str]], max_docs: int = 8,
+                                   max_chars: int = 15000, token_budget: Optional[int] = None,
+                                   budget: Optional[int] = None,
+                                   gate: Optional[asyncio.Semaphore] = None) -> List[Optional[str]]:
+    """
+    Summaries for several (url, text) documents found for one subquery, in order; None where none came back.
+    Excerpts (token_budget / max_chars as in summarize_with_llm) are packed in order into requests of at most
+    budget prompt tokens (default extract.MODEL_BATCH_BUDGETS) and max_docs documents; the packed requests
+    run concurrently, each holding a slot of gate (if given) so callers can cap the requests in flight.
+    A batch of one, and any document a batched reply skipped or garbled, goes through summarize_with_llm.
+    Every summary is the model's JSON text for that document, as summarize_with_llm returns it.
+    """
+    model = _llm_model(llm_callable)
+    excerpts = [budget_excerpt(text, model=model, budget=token_budget, max_chars=max_chars) for _, text in docs]
+    batches = pack_batches([count_tokens(e, model) for e in excerpts], budget or batch_budget(model), max_docs)
+    out: List[Optional[str]] = [None] * len(docs)
+
+    async def request(make):
+        if gate is None:
+            return await make()
+        async with gate:
+            return await make()
+
+    async def alone(i: int) -> None:
+        try:
+            out[i] = await request(lambda: summarize_with_llm(llm_callable, subquery, docs[i][0], docs[i][1],
+                                                              max_chars=max_chars, token_budget=token_budget))
+        except Exception as e:
+            logger.warning("Summarize failed for %s: %s", docs[i][0], e)
+
+    async def run(idx: List[int]) -> None:
+        if len(idx) > 1:
+            try:
+                parsed = await request(lambda: _summarize_packed(llm_callable, subquery,
+                                                                 [(docs[i][0], excerpts[i]) for i in idx]))
+            except Exception as e:  # API error or a reply that is not JSON (SummaryParseError)
+                logger.warning("Batched summarize of %d documents failed: %s", len(idx), e)
+                parsed = [None] * len(idx)
+            for i, summary in zip(idx, parsed):
+                out[i] = summary
+            missing = [i for i in idx if out[i] is None]
+            if missing:
+                get_tracer().count("llm_batch_retries", len(missing))
+        else:
+            missing = idx
+        await asyncio.gather(*(alone(i) for i in missing))
+
+    await asyncio.gather(*(run(idx) for idx in batches))
+    return out
+
 # === orchestration: generate subqueries, search, scrape, summarize ===
 async def search_agent_stock(user_topic: str, llm_callable, serper_api_key: Optional[str] = None,
-                             max_links: int = 3, n_subqueries: int = 4) -> List[Dict[str, Any]]:
+                             max_links: int = 3, n_subqueries: int = 4,
+                             concurrent: bool = False, pipeline_config: Optional[Any] = None,
+                             browser_pool: Optional[Any] = None, cache: Optional[Any] = None,
+                             http_client: Optional[Any] = None, tracer: Optional[Any] = None,
+                             dedup: Any = True, summarize_batch: int = 1) -> List[Dict[str, Any]]:
+    """
+    Sequential orchestrator (one subquery, one link at a time).
+    Pass concurrent=True to use the staged pipeline in pipeline.py instead
+    (pipeline_config: optional pipeline.PipelineConfig).
+    browser_pool: optional browser_pool.BrowserPool shared by every fetch.
+    cache: optional cache.ResponseCache for page text (pass the same cache to TogetherChat for LLM output).
+    http_client: optional http_client.AsyncHttpClient for Serper and plain page fetches (default: a client
+    opened for this run and closed when it returns).
+    tracer: optional tracing.Tracer collecting per-stage spans and counters for this run.
+    dedup: True (default) for a fresh dedup.Deduplicator, a Deduplicator, or False. Each story
+    (same normalized URL or near-duplicate text) is fetched and summarized once and credited to
+    every subquery that found it.
+    summarize_batch: documents per summarize request (summarize_batch_with_llm); 1 = one request per
+    document. With concurrent=True this sets PipelineConfig.summarize_batch.
+    """
+    if dedup is True:
+        from dedup import Deduplicator
+        dedup = Deduplicator()
     serper_api_key = serper_api_key or SERPER_API_KEY
+    if concurrent:
+        from pipeline import PipelineConfig, search_agent_stock_concurrent
+        if summarize_batch > 1:
+            import dataclasses
+            pipeline_config = dataclasses.replace(pipeline_config or PipelineConfig(), summarize_batch=summarize_batch)
+        return await search_agent_stock_concurrent(user_topic, llm_callable, serper_api_key=serper_api_key,
+                                                   max_links=max_links, n_subqueries=n_subqueries,
+                                                   config=pipeline_config, browser_pool=browser_pool,
+                                                   cache=cache, http_client=http_client, tracer=tracer,
+                                                   dedup=dedup)
+    async with owned_client(http_client) as http_client:
+        with use_tracer(tracer), get_tracer().span("search_agent_stock", topic=user_topic, mode="sequential"):
+            return await _search_agent_stock_sequential(user_topic, llm_callable, serper_api_key, max_links,
+                                                        n_subqueries, browser_pool, cache, http_client,
+                                                        dedup or None, summarize_batch)
+
+async def _search_agent_stock_sequential(user_topic, llm_callable, serper_api_key, max_links, n_subqueries,
+                                         browser_pool, cache, http_client, dedup=None,
+                                         summarize_batch: int = 1) -> List[Dict[str, Any]]:
     subqueries = await generate_subqueries(llm_callable, user_topic, n=n_subqueries)
     results: List[Dict[str, Any]] = []
     for sub in subqueries:
-        links = search_serper(sub, api_key=serper_api_key, num_results=10)
+        links = await asearch_serper(sub, api_key=serper_api_key, num_results=10, http_client=http_client)
         if not links:
             logger.info("No links for subquery: %s", sub)
             continue
+        pending: List[Tuple[str, str]] = []  # (link, content) for one batched summarize per subquery
         for link in links[:max_links]:
+            if dedup is not None:
+                fetch, ready = dedup.claim_link(sub, link)
+                results.extend(ready)
+                if not fetch:
+                    continue
             logger.info("Fetching %s for subquery: %s", link, sub)
-            content = await fetch_text(link)
+            content = await fetch_text(link, pool=browser_pool, cache=cache, http_client=http_client)
             if not content:
                 logger.info("No content from %s", link)
+                if dedup is not None:
+                    dedup.failed(link)
+                continue
+            if dedup is not None:
+                summarize, ready = dedup.claim_document(sub, link, content)
+                results.extend(ready)
+                if not summarize:
+                    logger.info("Near-duplicate content from %s", link)
+                    continue
+            if summarize_batch > 1:
+                pending.append((link, content))
                 continue
             summary = await summarize_with_llm(llm_callable, sub, link, content)
             results.append({"query": sub, "link": link, "summary": summary})
+            if dedup is not None:
+                results.extend(dedup.summarized(link, summary))
+        if pending:
+            summaries = await summarize_batch_with_llm(llm_callable, sub, pending, max_docs=summarize_batch)
+            for (link, _), summary in zip(pending, summaries):
+                if summary is None:
+                    if dedup is not None:
+                        dedup.failed(link)
+                    continue
+                results.append({"query": sub, "link": link, "summary": summary})
+                if dedup is not None:
+                    results.extend(dedup.summarized(link, summary))
     return results
 
 # === orchestration: generate subqueries, search, scrape, summarize (English) ===
 if __name__ == "__main__":
     async def main_demo():
+        from cache import ResponseCache
+        cache = ResponseCache()            # repeated runs reuse scraped pages and LLM outputs
         try:
-            llm = TogetherChat()           # sync callable via llm.__call__
+            llm = TogetherChat(cache=cache)  # sync callable via llm.__call__
         except Exception as e:
             logger.error("TogetherChat initialization failed: %s", e)
             return
 
         llm_async = llm.aget
         topic = "IBM stock performance and recent news"
-        results = await search_agent_stock(topic, llm_async, serper_api_key=SERPER_API_KEY, max_links=2, n_subqueries=3)
+        results = await search_agent_stock(topic, llm_async, serper_api_key=SERPER_API_KEY, max_links=2, n_subqueries=3,
+                                           cache=cache)
 
         for r in results:
             print("=== SUBQUERY ===")
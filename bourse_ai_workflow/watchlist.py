@@ -0,0 +1,446 @@
+"""
+watchlist.py
+
+Batch runner for the search agent over a watchlist of topics (e.g. every
+morning for hundreds of tickers).
+
+Topics are scheduled by priority (higher first) under global caps shared by
+the whole run:
+ - max_fetches:     concurrent page fetches across all topics
+ - llm_rpm:         LLM requests per minute (http_client.TokenBucket)
+ - serper_quota:    Serper searches for the run
+ - token_budget:    prompt + completion tokens for the run (extract.count_tokens)
+Waiters on the fetch slots and the LLM rate limit are served by priority, so
+a high-priority topic is not stuck behind a long tail of low-priority work.
+When the Serper quota or token budget runs out, no new work is started and
+the run ends cleanly; the rest is picked up by the next run.
+
+Every (topic, subquery, link) unit is written to an append-only sink as soon
+as it completes: a .jsonl file (one record per line, flushed per record) or a
+directory of Parquet part files. The generated subqueries and Serper links of
+each topic are journaled next to it (<out>.state.jsonl), so an interrupted run
+resumes with the same subqueries and links, skipping finished units and
+without spending search quota again. Within a topic, links and syndicated
+copies are deduplicated (dedup.Deduplicator). With a sentiment_store
+(sentiment_store.SentimentStore), each new summary also updates the per-symbol
+daily sentiment aggregates as it is written.
+
+Watchlist CSV: topic[,priority]
+
+Usage:
+    runner = WatchlistRunner(llm.aget, "results.jsonl", limits=RunLimits(llm_rpm=120))
+    stats = await runner.run([("IBM stock", 10), ("AAPL stock", 5)])
+
+    python watchlist.py watchlist.csv --out results.jsonl --llm-rpm 120 --serper-quota 500 --sentiment-db sentiment.sqlite
+"""
+
+import argparse
+import asyncio
+import functools
+import glob
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import trip
+from dedup import Deduplicator
+from extract import count_tokens
+from http_client import TokenBucket, owned_client
+
+logger = logging.getLogger("stock_search_agent.watchlist")
+
+Unit = Tuple[str, str, str]  # (topic, subquery, link)
+
+
+class BudgetExhausted(RuntimeError):
+    """The run's Serper quota or token budget is used up."""
+
+
+@dataclass
+class RunLimits:
+    max_fetches: int = 8
+    llm_rpm: Optional[float] = 60.0        # None = unlimited
+    serper_quota: Optional[int] = None     # searches for the run; None = unlimited
+    token_budget: Optional[int] = None     # prompt + completion tokens for the run; None = unlimited
+    max_topics: int = 4                    # topics in flight at once
+    n_subqueries: int = 4
+    max_links: int = 3
+    num_results: int = 10
+
+
+# === priority-aware limits ===
+class PrioritySemaphore:
+    """Semaphore whose waiters are woken highest priority first (FIFO within a priority)."""
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int = 0) -> None:
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        fut = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # woken and cancelled at once: pass the slot on
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._value += 1
+
+    def slot(self, priority: int = 0) -> "_Slot":
+        return _Slot(self, priority)
+
+
+class _Slot:
+    def __init__(self, sem: PrioritySemaphore, priority: int):
+        self.sem, self.priority = sem, priority
+
+    async def __aenter__(self):
+        await self.sem.acquire(self.priority)
+
+    async def __aexit__(self, *exc):
+        self.sem.release()
+
+
+# === sinks ===
+class JsonlSink:
+    """Append-only JSONL; every record is flushed so a crash loses at most a partial last line."""
+    def __init__(self, path: str):
+        self.path = path
+        self._f = _open_append(path)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def flush(self) -> None:
+        pass  # write() already flushes every record
+
+    def done_units(self) -> Set[Unit]:
+        return {(r["topic"], r["query"], r["link"]) for r in _read_jsonl(self.path)}
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ParquetSink:
+    """
+    Directory of Parquet part files. By default every record is written as its own part as it
+    completes (same durability as JsonlSink); a larger flush_every buffers records into fewer,
+    larger parts, and WatchlistRunner flushes after every topic, so a crash then loses at most
+    the buffered units of the topics in progress.
+    """
+    def __init__(self, path: str, flush_every: int = 1):
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer: List[Dict[str, Any]] = []
+        os.makedirs(path, exist_ok=True)
+        self._part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._buffer.append(record)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        import pandas as pd
+        out = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        pd.DataFrame(self._buffer).to_parquet(out + ".tmp", index=False)
+        os.replace(out + ".tmp", out)  # a part is either complete or absent
+        self._part += 1
+        self._buffer = []
+
+    def done_units(self) -> Set[Unit]:
+        import pandas as pd
+        done: Set[Unit] = set()
+        for part in sorted(glob.glob(os.path.join(self.path, "part-*.parquet"))):
+            df = pd.read_parquet(part, columns=["topic", "query", "link"])
+            done.update(df.itertuples(index=False, name=None))
+        return done
+
+    def close(self) -> None:
+        self.flush()
+
+
+def open_sink(path: str):
+    if path.endswith(".jsonl"):
+        return JsonlSink(path)
+    return ParquetSink(path)
+
+
+def _read_jsonl(path: str) -> Iterable[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash; its unit is redone
+
+
+def _open_append(path: str):
+    """Open a JSONL file for appending, terminating a line left partial by a crash first."""
+    f = open(path, "a+b")
+    if f.tell() > 0:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+    f.close()
+    return open(path, "a", encoding="utf-8")
+
+
+def state_path(out: str) -> str:
+    return os.path.join(out, "_state.jsonl") if not out.endswith(".jsonl") else out[:-len(".jsonl")] + ".state.jsonl"
+
+
+# === runner ===
+class WatchlistRunner:
+    """
+    Runs search_agent-style work (subqueries -> Serper -> fetch -> summarize)
+    for many topics under RunLimits, writing one record per unit to `out`.
+    llm_callable: async (or sync) callable taking chat messages, e.g. TogetherChat().aget.
+    """
+    def __init__(self, llm_callable, out: str, limits: Optional[RunLimits] = None,
+                 serper_api_key: Optional[str] = None, browser_pool: Optional[Any] = None,
+                 cache: Optional[Any] = None, http_client: Optional[Any] = None, use_playwright: bool = True,
+                 sentiment_store: Optional[Any] = None):
+        self.llm_callable = llm_callable
+        self.out = out
+        self.limits = limits or RunLimits()
+        self.serper_api_key = serper_api_key or trip.SERPER_API_KEY
+        self.browser_pool = browser_pool
+        self.cache = cache
+        self.http_client = http_client
+        self.use_playwright = use_playwright
+        self.sentiment_store = sentiment_store
+        self.stats = {"topics": 0, "units": 0, "resumed": 0, "failed": 0, "searches": 0, "llm_calls": 0,
+                      "tokens": 0, "exhausted": None}
+        self._tokens_exhausted = False
+        self._fetch_slots = PrioritySemaphore(self.limits.max_fetches)
+        self._llm_gate = PrioritySemaphore(1)
+        self._llm_bucket = TokenBucket(self.limits.llm_rpm / 60.0, capacity=1) if self.limits.llm_rpm else None
+        self._subqueries: Dict[str, List[str]] = {}
+        self._links: Dict[Tuple[str, str], List[str]] = {}
+        self._done: Set[Unit] = set()
+
+    # --- resume state ---
+    def _load_state(self) -> None:
+        for event in _read_jsonl(state_path(self.out)):
+            if event.get("kind") == "subqueries":
+                self._subqueries[event["topic"]] = event["subqueries"]
+            elif event.get("kind") == "links":
+                self._links[(event["topic"], event["query"])] = event["links"]
+
+    def _journal(self, event: Dict[str, Any]) -> None:
+        self._state.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._state.flush()
+
+    # --- limited calls ---
+    def _exhausted(self, what: str) -> BudgetExhausted:
+        if self.stats["exhausted"] is None:
+            logger.warning("%s exhausted; finishing in-flight work only", what)
+            self.stats["exhausted"] = what
+        return BudgetExhausted(what)
+
+    def _llm_for(self, priority: int):
+        async def call(messages: List[Dict[str, str]], **kwargs) -> str:
+            # only the token budget stops LLM calls: after the Serper quota runs out,
+            # pages already fetched are still summarized
+            if self._tokens_exhausted:
+                raise BudgetExhausted("token budget")
+            prompt = sum(count_tokens(m.get("content", "")) for m in messages)
+            budget = self.limits.token_budget
+            if budget is not None and self.stats["tokens"] + prompt > budget:
+                self._tokens_exhausted = True
+                raise self._exhausted("token budget")
+            # reserve before waiting on the rate limit, so queued calls cannot all pass the check
+            self.stats["tokens"] += prompt
+            if self._llm_bucket is not None:
+                async with self._llm_gate.slot(priority):
+                    await self._llm_bucket.acquire()
+            self.stats["llm_calls"] += 1
+            if asyncio.iscoroutinefunction(self.llm_callable):
+                text = await self.llm_callable(messages, **kwargs)
+            else:
+                text = await asyncio.get_event_loop().run_in_executor(
+                    None, functools.partial(self.llm_callable, messages, **kwargs))
+            self.stats["tokens"] += count_tokens(text or "")
+            return text
+        # trip reads the model (token budget) and JSON-mode support off __self__, as for a bound aget
+        call.__self__ = getattr(self.llm_callable, "__self__", self.llm_callable)
+        return call
+
+    async def _search(self, topic: str, sub: str) -> List[str]:
+        links = self._links.get((topic, sub))
+        if links is not None:
+            return links
+        quota = self.limits.serper_quota
+        if self.stats["exhausted"] or (quota is not None and self.stats["searches"] >= quota):
+            raise self._exhausted(self.stats["exhausted"] or "Serper quota")
+        self.stats["searches"] += 1
+        links = await trip.asearch_serper(sub, api_key=self.serper_api_key, num_results=self.limits.num_results,
+                                          http_client=self.http_client)
+        links = links[:self.limits.max_links]
+        self._links[(topic, sub)] = links
+        self._journal({"kind": "links", "topic": topic, "query": sub, "links": links})
+        return links
+
+    # --- units ---
+    def _write(self, topic: str, priority: int, result: Dict[str, Any]) -> None:
+        unit = (topic, result["query"], result["link"])
+        if unit in self._done:
+            return
+        self._done.add(unit)
+        self._sink.write({"topic": topic, "priority": priority, **result, "completed_at": time.time()})
+        self.stats["units"] += 1
+        if self.sentiment_store is not None and "duplicate_of" not in result:
+            self.sentiment_store.add_result(result)
+
+    async def _link(self, topic: str, priority: int, sub: str, link: str, dedup: Deduplicator, llm) -> None:
+        fetch, ready = dedup.claim_link(sub, link)
+        for r in ready:
+            self._write(topic, priority, r)
+        if not fetch:
+            return
+        try:
+            async with self._fetch_slots.slot(priority):
+                content = await trip.fetch_text(link, use_playwright=self.use_playwright, pool=self.browser_pool,
+                                                cache=self.cache, http_client=self.http_client)
+            if not content:
+                dedup.failed(link)
+                self.stats["failed"] += 1
+                return
+            summarize, ready = dedup.claim_document(sub, link, content)
+            for r in ready:
+                self._write(topic, priority, r)
+            if not summarize:
+                return
+            summary = await trip.summarize_with_llm(llm, sub, link, content)
+        except BudgetExhausted:
+            dedup.failed(link)
+            return
+        except Exception as e:
+            logger.warning("Unit failed (%s, %s, %s): %s", topic, sub, link, e)
+            dedup.failed(link)
+            self.stats["failed"] += 1
+            return
+        self._write(topic, priority, {"query": sub, "link": link, "summary": summary})
+        for r in dedup.summarized(link, summary):
+            self._write(topic, priority, r)
+
+    async def _topic(self, topic: str, priority: int) -> None:
+        llm = self._llm_for(priority)
+        subqueries = self._subqueries.get(topic)
+        if subqueries is None:
+            subqueries = await trip.generate_subqueries(llm, topic, n=self.limits.n_subqueries)
+            self._subqueries[topic] = subqueries
+            self._journal({"kind": "subqueries", "topic": topic, "subqueries": subqueries})
+        dedup = Deduplicator()
+        units = []
+        exhausted = None
+        for sub in subqueries:
+            try:
+                links = await self._search(topic, sub)
+            except BudgetExhausted as e:  # no more searches; the links found so far are still worked
+                exhausted = e
+                break
+            for link in links:
+                if (topic, sub, link) in self._done:
+                    self.stats["resumed"] += 1
+                    continue
+                units.append((sub, link))
+        await asyncio.gather(*(self._link(topic, priority, sub, link, dedup, llm) for sub, link in units))
+        self._sink.flush()
+        if exhausted is not None:
+            raise exhausted
+        self.stats["topics"] += 1
+
+    async def run(self, watchlist: Iterable[Tuple[str, int]]) -> Dict[str, Any]:
+        """Process every (topic, priority); returns run stats. Safe to call again on the same `out` to resume."""
+        t0 = time.perf_counter()
+        self._sink = open_sink(self.out)
+        self._done = self._sink.done_units()
+        self._load_state()
+        self._state = _open_append(state_path(self.out))
+        queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        for seq, (topic, priority) in enumerate(dict(watchlist).items()):
+            queue.put_nowait((-priority, seq, topic))
+
+        async def worker() -> None:
+            while not queue.empty() and not self.stats["exhausted"]:
+                neg_priority, _, topic = queue.get_nowait()
+                try:
+                    await self._topic(topic, -neg_priority)
+                except BudgetExhausted:
+                    return
+                except Exception as e:
+                    logger.warning("Topic failed: %s: %s", topic, e)
+
+        caller_client = self.http_client
+        try:
+            async with owned_client(caller_client) as self.http_client:
+                await asyncio.gather(*(worker() for _ in range(self.limits.max_topics)))
+        finally:
+            self.http_client = caller_client
+            self._sink.close()
+            self._state.close()
+        self.stats["seconds"] = time.perf_counter() - t0
+        return dict(self.stats)
+
+
+def read_watchlist(path: str) -> List[Tuple[str, int]]:
+    import pandas as pd
+    df = pd.read_csv(path)
+    priorities = df["priority"] if "priority" in df else [0] * len(df)
+    return [(str(t), int(p)) for t, p in zip(df["topic"], priorities)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("watchlist", help="CSV with a topic column and an optional priority column")
+    parser.add_argument("--out", required=True, help=".jsonl file or Parquet directory (appended to / resumed)")
+    parser.add_argument("--max-fetches", type=int, default=RunLimits.max_fetches)
+    parser.add_argument("--llm-rpm", type=float, default=RunLimits.llm_rpm)
+    parser.add_argument("--serper-quota", type=int, default=None)
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--max-topics", type=int, default=RunLimits.max_topics)
+    parser.add_argument("--max-links", type=int, default=RunLimits.max_links)
+    parser.add_argument("--subqueries", type=int, default=RunLimits.n_subqueries)
+    parser.add_argument("--sentiment-db", default=None, help="SQLite sentiment store updated with every new summary")
+    args = parser.parse_args()
+
+    limits = RunLimits(max_fetches=args.max_fetches, llm_rpm=args.llm_rpm, serper_quota=args.serper_quota,
+                       token_budget=args.token_budget, max_topics=args.max_topics, max_links=args.max_links,
+                       n_subqueries=args.subqueries)
+
+    async def main() -> Dict[str, Any]:
+        from cache import ResponseCache
+        cache = ResponseCache()
+        llm = trip.TogetherChat(cache=cache)
+        store = None
+        if args.sentiment_db:
+            from sentiment_store import SentimentStore
+            store = SentimentStore(args.sentiment_db)
+        return await WatchlistRunner(llm.aget, args.out, limits, cache=cache,
+                                     sentiment_store=store).run(read_watchlist(args.watchlist))
+
+    stats = asyncio.run(main())
+    print(json.dumps({"limits": asdict(limits), **stats}, indent=2))
@@ -0,0 +1,185 @@
+"""
+window_store.py
+
+Preprocessed, memory-mapped per-ticker time-series store for the forecaster.
+
+Built once from all_stocks.csv (or the Parquet dataset written by ingest.py):
+rows are grouped by ticker, sorted by date and written as contiguous arrays
+next to a small JSON index (ticker -> offset, length):
+
+    <store>/values.npy   float32 (rows, 5)   Open, High, Low, Close, Volume
+    <store>/dates.npy    datetime64[D] (rows,)  local calendar date
+    <store>/index.json   columns, ticker offsets, source CSV fingerprint
+
+Opening the store only maps the .npy files, and any ticker's last-N window is an
+O(1) slice (a view, no copy) instead of a boolean scan over the full history.
+
+Usage:
+    store = load_window_store("all_stocks.csv")  # builds or refreshes when the CSV changed
+    store = load_window_store("market_data")     # same, from the ingest.py Parquet root
+    values, dates = store.window("IBM", 30)
+    python window_store.py all_stocks.csv        # build from the command line
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from forecaster import NUM_COLS, calendar_dates
+
+VALUES_FILE = "values.npy"
+DATES_FILE = "dates.npy"
+INDEX_FILE = "index.json"
+
+
+def default_store_dir(csv_path: str) -> str:
+    return os.path.splitext(os.path.normpath(csv_path))[0] + "_store"
+
+
+def _source_fingerprint(path: str) -> Dict[str, float]:
+    # a Parquet root changes whenever ingest.py moves a watermark
+    stat_path = os.path.join(path, "_watermarks.json") if os.path.isdir(path) else path
+    st = os.stat(stat_path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+class WindowStore:
+    """Read-only view over a built store; arrays are memory-mapped."""
+    def __init__(self, store_dir: str, mmap: bool = True, retries: int = 20):
+        self.store_dir = store_dir
+        mode = "r" if mmap else None
+        for attempt in range(retries + 1):
+            with open(os.path.join(store_dir, INDEX_FILE)) as f:
+                meta = json.load(f)
+            self.columns: List[str] = meta["columns"]
+            self.source: Dict[str, float] = meta.get("source", {})
+            self.index: Dict[str, Tuple[int, int]] = {t: tuple(v) for t, v in meta["tickers"].items()}
+            self.values = np.load(os.path.join(store_dir, VALUES_FILE), mmap_mode=mode)
+            self.dates = np.load(os.path.join(store_dir, DATES_FILE), mmap_mode=mode)
+            rows = sum(self.index[t][1] for t in self.index)
+            if len(self.values) == len(self.dates) == rows:
+                return
+            # opened between the renames of a concurrent rebuild: wait for it to finish
+            if attempt < retries:
+                time.sleep(0.05)
+        raise RuntimeError(f"{store_dir}: values, dates and index.json are from different builds")
+
+    @property
+    def tickers(self) -> List[str]:
+        return list(self.index)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.index
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def length(self, ticker: str) -> int:
+        return self.index[ticker][1] if ticker in self.index else 0
+
+    def rows(self, ticker: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Full (values, dates) history of one ticker as views."""
+        offset, length = self.index[ticker]
+        return self.values[offset:offset + length], self.dates[offset:offset + length]
+
+    def window(self, ticker: str, n: int = 30) -> Tuple[np.ndarray, np.ndarray]:
+        """Last n rows of one ticker as views (fewer if the ticker has less history)."""
+        offset, length = self.index[ticker]
+        end = offset + length
+        start = max(offset, end - n)
+        return self.values[start:end], self.dates[start:end]
+
+    def window_index(self, tickers: Iterable[str], n: int = 30) -> np.ndarray:
+        """(N, n) row positions of each ticker's last n rows; also indexes features.npy."""
+        ends = np.array([sum(self.index[t]) for t in tickers], dtype=np.int64)
+        return ends[:, None] - n + np.arange(n)[None, :]
+
+    def windows(self, tickers: Iterable[str], n: int = 30) -> Tuple[np.ndarray, np.ndarray]:
+        """Stacked last-n windows, shapes (N, n, 5) and (N, n); every ticker needs at least n rows."""
+        idx = self.window_index(tickers, n)
+        return self.values[idx], self.dates[idx]
+
+    def frame(self, ticker: str, n: Optional[int] = None) -> pd.DataFrame:
+        """Window (or full history) as a DataFrame shaped like rows of all_stocks.csv."""
+        values, dates = self.window(ticker, n) if n else self.rows(ticker)
+        df = pd.DataFrame(np.asarray(values, dtype=np.float64), columns=self.columns)
+        df.insert(0, 'Date', pd.to_datetime(dates))
+        df['Ticker'] = ticker
+        return df
+
+
+def build_window_store(csv_path: str = "all_stocks.csv", store_dir: Optional[str] = None) -> WindowStore:
+    """
+    Parse the CSV (or read the ingest.py Parquet root when csv_path is a directory) once
+    and write the grouped, date-sorted float32 arrays plus the index.
+    """
+    store_dir = store_dir or default_store_dir(csv_path)
+    if os.path.isdir(csv_path):
+        from ingest import read_dataset
+        df = read_dataset(csv_path, columns=['Date'] + NUM_COLS)
+    else:
+        df = pd.read_csv(csv_path, usecols=['Date', 'Ticker'] + NUM_COLS)
+    return write_window_store(df, store_dir, source=_source_fingerprint(csv_path))
+
+
+def _save_array(path: str, arr: np.ndarray) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"  # per process: two rebuilds may race
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def write_window_store(df: pd.DataFrame, store_dir: str, source: Optional[Dict[str, float]] = None) -> WindowStore:
+    """Write a store from a frame with Date, Ticker and the numeric columns."""
+    os.makedirs(store_dir, exist_ok=True)
+    dates = calendar_dates(df['Date']).to_numpy(dtype="datetime64[D]")
+    tickers = df['Ticker'].astype(str).to_numpy()
+    order = np.lexsort((dates, tickers))
+    tickers = tickers[order]
+    values = np.ascontiguousarray(df[NUM_COLS].to_numpy(dtype=np.float32)[order])
+    dates = dates[order]
+
+    uniq, starts, counts = np.unique(tickers, return_index=True, return_counts=True)
+    index = {t: [int(s), int(c)] for t, s, c in zip(uniq, starts, counts)}
+
+    # write arrays first and the index last, so a half-written store is never picked up as fresh;
+    # every file is replaced, never rewritten, since other processes may have the old ones mapped
+    _save_array(os.path.join(store_dir, VALUES_FILE), values)
+    _save_array(os.path.join(store_dir, DATES_FILE), dates)
+    tmp = os.path.join(store_dir, f"{INDEX_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"columns": NUM_COLS, "tickers": index, "source": source or {}}, f)
+    os.replace(tmp, os.path.join(store_dir, INDEX_FILE))
+    return WindowStore(store_dir)
+
+
+def is_fresh(csv_path: str, store_dir: str) -> bool:
+    index_path = os.path.join(store_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return False
+    with open(index_path) as f:
+        source = json.load(f).get("source", {})
+    current = _source_fingerprint(csv_path)
+    return source.get("size") == current["size"] and source.get("mtime") == current["mtime"]
+
+
+def load_window_store(csv_path: str = "all_stocks.csv", store_dir: Optional[str] = None) -> WindowStore:
+    """Open the store for csv_path, (re)building it first if missing or older than the CSV."""
+    store_dir = store_dir or default_store_dir(csv_path)
+    if os.path.exists(csv_path) and not is_fresh(csv_path, store_dir):
+        return build_window_store(csv_path, store_dir)
+    return WindowStore(store_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-ticker window store from a CSV.")
+    parser.add_argument("csv_path", nargs="?", default="all_stocks.csv")
+    parser.add_argument("--out", default=None, help="store directory (default: <csv>_store)")
+    args = parser.parse_args()
+    store = build_window_store(args.csv_path, args.out)
+    print(f"Stored {len(store)} rows for {len(store.index)} tickers in {store.store_dir}")
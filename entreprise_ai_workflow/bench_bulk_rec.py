@@ -0,0 +1,88 @@
+"""
+bench_bulk_rec.py
+
+Throughput of bulk_rec.run_bulk vs one PortfolioRecommender per investor.
+
+The per-investor baseline re-reads and re-prepares the CSV for every investor
+(LLM call excluded); it is timed on at most --baseline-cap investors and
+extrapolated. Bulk runs load the universe once and stream to Parquet and JSONL.
+Investors and portfolios (1-3 holdings each) are synthetic.
+
+Usage:
+  python bench_bulk_rec.py
+  python bench_bulk_rec.py --sizes 10 1000 100000 --k 5
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_rec import load_universe, run_bulk
+from rec import PortfolioRecommender
+
+
+def synthetic_portfolios(universe_df, n_investors, seed=0):
+    rng = np.random.default_rng(seed)
+    holdings = rng.integers(1, 4, n_investors)
+    owner = np.repeat(np.arange(n_investors), holdings)
+    return pd.DataFrame({
+        "investor_id": owner,
+        "name": [f"Holding {i}" for i in range(len(owner))],
+        "sector": rng.choice(universe_df["sector"].unique(), len(owner)),
+        "country": rng.choice(universe_df["country"].unique(), len(owner)),
+        "allocation_pct": rng.integers(5, 40, len(owner)),
+    })
+
+
+def baseline(csv_path, portfolios, k):
+    """Seconds per investor with a fresh PortfolioRecommender each (no LLM)."""
+    t0 = time.perf_counter()
+    groups = portfolios.groupby("investor_id")
+    for _, g in groups:
+        PortfolioRecommender(csv_path, {}, g.to_dict("records"), k=k).top_k()
+    return (time.perf_counter() - t0) / groups.ngroups
+
+
+def check_parity(universe, portfolios, out, k, csv_path):
+    got = pd.read_parquet(out)
+    for inv, g in list(portfolios.groupby("investor_id"))[:20]:
+        expected = PortfolioRecommender(universe[0], {}, g.to_dict("records"), k=k).top_k()
+        assert got.loc[got["investor_id"] == inv, "name"].tolist() == expected["name"].tolist(), inv
+
+
+def main(args):
+    tmpdir = tempfile.mkdtemp(prefix="bulk_rec_bench_")
+    try:
+        universe = load_universe(args.csv)
+        print(f"{len(universe[0]):,} startups, k={args.k}")
+        print(f"{'investors':>10} {'baseline inv/s':>15} {'parquet inv/s':>14} {'jsonl inv/s':>12} {'speedup':>8}")
+        for n in args.sizes:
+            portfolios = synthetic_portfolios(universe[0], n)
+            sample = portfolios[portfolios["investor_id"] < args.baseline_cap]
+            per_investor = baseline(args.csv, sample, args.k)
+            rates = {}
+            for ext in ("parquet", "jsonl"):
+                out = os.path.join(tmpdir, f"recs_{n}.{ext}")
+                t0 = time.perf_counter()
+                run_bulk(portfolios, out, universe=universe, k=args.k)
+                rates[ext] = n / (time.perf_counter() - t0)
+            check_parity(universe, portfolios, os.path.join(tmpdir, f"recs_{n}.parquet"), args.k, args.csv)
+            print(f"{n:>10,} {1 / per_investor:15.1f} {rates['parquet']:14.0f} {rates['jsonl']:12.0f} "
+                  f"{rates['parquet'] * per_investor:7.0f}x")
+        print("parity: bulk top-k matches PortfolioRecommender.top_k for sampled investors")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="startups_financials.csv")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--baseline-cap", type=int, default=50, help="max investors timed on the baseline path")
+    main(parser.parse_args())
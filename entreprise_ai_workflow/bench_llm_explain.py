@@ -0,0 +1,97 @@
+"""
+bench_llm_explain.py
+
+End-to-end explanation latency for many investors against fake_llm_server.py
+(no network, no API cost):
+  sequential   one blocking-style call per investor, full prompt, no cache
+  concurrent   AsyncLLMClient, bounded concurrency, full prompt
+  deduplicated concurrent + profile-shape prompts (identical top-k sets share a call)
+  warm cache   same as deduplicated, second run against the persistent cache
+
+Usage:
+  python bench_llm_explain.py
+  python bench_llm_explain.py --investors 500 --latency 0.2 --fail-rate 0.05 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_bulk_rec import synthetic_portfolios
+from bulk_rec import load_universe
+from fake_llm_server import FakeLLMServer
+from llm_client import AsyncLLMClient, ExplanationCache, LLMError
+from rec import RESULT_COLS, SYSTEM_PROMPT, build_prompt, profile_shape
+
+RISK = ["Conservative", "Balanced", "Aggressive"]
+
+
+def synthetic_investors(universe, n, seed=0):
+    rng = np.random.default_rng(seed)
+    # few portfolio shapes, so many investors share the same top-k (as in real books)
+    portfolios = synthetic_portfolios(universe[0], n, seed)
+    portfolios["sector"] = rng.choice(["Fintech", "HealthTech", "SaaS"], len(portfolios))
+    portfolios["country"] = rng.choice(["US", "FR"], len(portfolios))
+    df, index = universe
+    investors = []
+    for inv, g in portfolios.groupby("investor_id"):
+        profile = {"name": f"Investor {inv}", "risk_tolerance": RISK[inv % 3],
+                   "total_capital": int(rng.integers(1, 50)) * 100_000}
+        portfolio = g.drop(columns="investor_id").to_dict("records")
+        ids = index.top_k(g["sector"], g["country"], 3)
+        investors.append((profile, portfolio, df.iloc[ids][RESULT_COLS]))
+    return investors
+
+
+async def run(investors, llm, shape):
+    async def one(investor):
+        profile, portfolio, top = investor
+        prompt = (build_prompt(*profile_shape(profile, portfolio), top) if shape
+                  else build_prompt(profile, portfolio, top))
+        try:
+            return await llm.chat(SYSTEM_PROMPT, prompt)
+        except LLMError:
+            return None
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*map(one, investors))
+    return time.perf_counter() - t0, sum(r is None for r in results)
+
+
+async def main(args):
+    universe = load_universe(args.csv)
+    investors = synthetic_investors(universe, args.investors)
+    server = FakeLLMServer(latency=args.latency, fail_rate=args.fail_rate)
+    await server.start()
+    tmpdir = tempfile.mkdtemp(prefix="llm_bench_")
+    cache = ExplanationCache(os.path.join(tmpdir, "llm_cache.sqlite"))
+    print(f"{len(investors)} investors, fake LLM latency {args.latency}s, fail rate {args.fail_rate:.0%}")
+    print(f"{'mode':<14} {'wall s':>8} {'LLM calls':>10} {'retries':>8} {'failed':>7}")
+    modes = [("sequential", 1, False, None), ("concurrent", args.concurrency, False, None),
+             ("deduplicated", args.concurrency, True, cache), ("warm cache", args.concurrency, True, cache)]
+    try:
+        for label, concurrency, shape, mode_cache in modes:
+            before = server.requests
+            async with AsyncLLMClient(base_url=server.base_url, api_key="fake", max_concurrency=concurrency,
+                                      timeout=args.timeout, backoff_base=0.05, cache=mode_cache) as llm:
+                wall, failed = await run(investors, llm, shape)
+                print(f"{label:<14} {wall:8.2f} {server.requests - before:10d} {llm.stats['retries']:8d} {failed:7d}")
+    finally:
+        cache.close()
+        await server.stop()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="startups_financials.csv")
+    parser.add_argument("--investors", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+bench_rec.py
+
+recommend() scoring latency before/after the prepared StartupIndex in rec.py.
+
+"before" replays the original path: two isin masks, copy, score every match,
+full sort, head(k). "after" is PortfolioRecommender.top_k() over the index
+built once in prepare_data. The LLM call is not included. The dataset is
+scaled to --rows synthetic startups by resampling startups_financials.csv
+with jittered financials and random sector/country.
+
+Usage:
+  python bench_rec.py
+  python bench_rec.py --rows 1000000 --queries 50 --k 3
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from rec import DEFAULT_WEIGHTS, RESULT_COLS, PortfolioRecommender
+
+JITTER_COLS = ["revenue", "ebitda", "net_income", "total_liabilities", "total_assets",
+               "gross_margin_pct", "runway_months"]
+
+
+def synthetic_startups(base: pd.DataFrame, rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+    for col in JITTER_COLS:
+        df[col] = df[col] * rng.uniform(0.8, 1.2, rows)
+    df["sector"] = rng.choice(base["sector"].unique(), rows)
+    df["country"] = rng.choice(base["country"].unique(), rows)
+    df["name"] = [f"Startup {i}" for i in range(rows)]
+    df["id"] = np.arange(1, rows + 1)
+    return df
+
+
+def legacy_recommend(df: pd.DataFrame, portfolio, k: int = 3) -> pd.DataFrame:
+    sectors = [p["sector"] for p in portfolio]
+    countries = [p["country"] for p in portfolio]
+    df = df[(df["sector"].isin(sectors)) & (df["country"].isin(countries))].copy()
+    df["score_total"] = sum(w * df[c] for c, w in DEFAULT_WEIGHTS.items())
+    return df.sort_values("score_total", ascending=False).head(k)[RESULT_COLS]
+
+
+def timed(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(args) -> None:
+    base = pd.read_csv(args.csv)
+    df = synthetic_startups(base, args.rows) if args.rows else base
+    rng = np.random.default_rng(1)
+    sectors, countries = df["sector"].unique(), df["country"].unique()
+    portfolios = [[{"sector": rng.choice(sectors), "country": rng.choice(countries)}
+                   for _ in range(rng.integers(1, 4))] for _ in range(args.queries)]
+
+    t0 = time.perf_counter()
+    rec = PortfolioRecommender(df, {"name": "bench"}, portfolios[0], k=args.k)
+    prepare = time.perf_counter() - t0
+    print(f"{len(df):,} startups, {args.queries} portfolios, k={args.k}; prepare_data {prepare:.2f}s")
+
+    before, after = [], []
+    for portfolio in portfolios:
+        rec.portfolio = portfolio
+        expected = legacy_recommend(rec.df, portfolio, args.k)
+        got = rec.top_k()
+        assert np.allclose(expected["score_total"].to_numpy(), got["score_total"].to_numpy()), portfolio
+        before.append(timed(lambda: legacy_recommend(rec.df, portfolio, args.k), args.repeats))
+        after.append(timed(rec.top_k, args.repeats))
+
+    before, after = np.array(before) * 1000, np.array(after) * 1000
+    print("parity: top-k scores match the full-sort path for every portfolio")
+    print(f"  before (isin + sort)   p50 {np.median(before):9.3f} ms  max {before.max():9.3f} ms")
+    print(f"  after  (index + top-k) p50 {np.median(after):9.3f} ms  max {after.max():9.3f} ms")
+    print(f"  speedup p50 {np.median(before) / np.median(after):.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="startups_financials.csv")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic startups (0 = CSV as is)")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
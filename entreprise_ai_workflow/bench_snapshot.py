@@ -0,0 +1,92 @@
+"""
+bench_snapshot.py
+
+Load time and RSS of the startup universe: CSV (read_csv + prepare_startups,
+what PortfolioRecommender did on every instantiation) vs the columnar
+snapshot (scoring columns only, memory-mapped). Each mode runs in a fresh
+interpreter; load time and RSS growth are measured after imports. The first
+snapshot load (build) is timed separately.
+
+Usage:
+  python bench_snapshot.py                  # startups_financials.csv
+  python bench_snapshot.py --rows 1000000   # synthetic universe (see bench_rec.py)
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from snapshot import build_snapshot, default_snapshot_dir
+
+LOAD_SNIPPET = """
+import time
+import pandas as pd
+from rec import load_startups, prepare_startups
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        return next(int(l.split()[1]) for l in f if l.startswith("VmRSS:")) / 1024
+
+before = rss_mb()
+t0 = time.perf_counter()
+df, index = prepare_startups(load_startups({csv!r}, use_snapshot={snapshot!r}))
+elapsed = time.perf_counter() - t0
+print(elapsed, rss_mb() - before, df.memory_usage(deep=True).sum() / 2**20, df.shape[1])
+"""
+
+
+def run_mode(csv_path, snapshot, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", LOAD_SNIPPET.format(csv=csv_path, snapshot=snapshot)],
+                             capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        results.append([float(v) for v in out.stdout.split()])
+    return np.median(np.array(results), axis=0)
+
+
+def main(args):
+    tmpdir = tempfile.mkdtemp(prefix="snapshot_bench_")
+    try:
+        csv_path = os.path.abspath(args.csv)
+        if args.rows:
+            from bench_rec import synthetic_startups
+            csv_path = os.path.join(tmpdir, "startups.csv")
+            synthetic_startups(pd.read_csv(args.csv), args.rows).to_csv(csv_path, index=False)
+        snapshot_dir = default_snapshot_dir(csv_path)
+        existed = os.path.exists(snapshot_dir)
+
+        t0 = time.perf_counter()
+        build_snapshot(csv_path)
+        build = time.perf_counter() - t0
+        csv_mb = os.path.getsize(csv_path) / 2**20
+        snap_mb = sum(os.path.getsize(os.path.join(snapshot_dir, f)) for f in os.listdir(snapshot_dir)) / 2**20
+
+        print(f"{os.path.basename(csv_path)}: CSV {csv_mb:.1f} MiB, snapshot {snap_mb:.1f} MiB "
+              f"(build {build:.2f}s)")
+        print(f"{'mode':<10} {'load s':>8} {'+RSS MiB':>9} {'frame MiB':>10} {'cols':>5}")
+        rows = {}
+        for label, snapshot in (("csv", False), ("snapshot", True)):
+            rows[label] = run_mode(csv_path, snapshot, args.runs)
+            t, rss, frame, cols = rows[label]
+            print(f"{label:<10} {t:8.3f} {rss:9.1f} {frame:10.1f} {int(cols):5d}")
+        (t_csv, rss_csv, *_), (t_snap, rss_snap, *_) = rows["csv"], rows["snapshot"]
+        print(f"load {t_csv / t_snap:.1f}x faster, RSS growth {rss_csv / max(rss_snap, 0.1):.1f}x smaller")
+        if not existed and not args.rows:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="startups_financials.csv")
+    parser.add_argument("--rows", type=int, default=0, help="synthetic startups (0 = the CSV as is)")
+    parser.add_argument("--runs", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,214 @@
+"""
+bulk_rec.py
+
+Bulk startup recommendations for many investors at once (nightly refresh).
+
+The startup universe is read and prepared once; the top-k of every investor
+is computed in vectorized chunks (StartupIndex.top_k_batch) and streamed to
+disk as it is produced:
+ - .parquet: one row per recommendation (investor_id, rank, startup_id, name, sector, country, score_total)
+ - .jsonl:   one record per investor {"investor_id", "recommendations": [...]}
+
+LLM explanations are a separate, optional stage (explain) that reads the JSONL
+output and writes the same records with a "summary" field. It uses
+llm_client.AsyncLLMClient: bounded concurrency, and investors with the same
+profile shape and top-k share one (cached) explanation.
+
+Input tables (CSV):
+  investors   investor_id + profile columns (name, risk_tolerance, total_capital, ...)
+  portfolios  investor_id, name, sector, country, allocation_pct (one row per holding)
+
+Usage:
+  python bulk_rec.py --portfolios portfolios.csv --out recs.parquet
+  python bulk_rec.py --investors investors.csv --portfolios portfolios.csv --out recs.jsonl \\
+      --explain recs_explained.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from llm_client import AsyncLLMClient, ExplanationCache, LLMError
+from rec import RESULT_COLS, SYSTEM_PROMPT, build_prompt, load_startups, prepare_startups, profile_shape
+
+OUTPUT_COLS = ["investor_id", "rank", "startup_id"] + RESULT_COLS
+
+
+# === Universe ===
+def load_universe(csv_path="startups_financials.csv", weights=None, use_snapshot=True):
+    """(prepared startup frame, StartupIndex), built once and shared by every investor."""
+    return prepare_startups(load_startups(csv_path, use_snapshot), weights)
+
+
+# === Vectorized top-k for all investors ===
+def recommend_all(universe, portfolios, k=3, chunk_size=50_000):
+    """
+    Yield long-format DataFrames (OUTPUT_COLS), one per chunk of chunk_size
+    investors. Investors without any matching startup produce no rows.
+    """
+    df, index = universe
+    portfolios = portfolios.sort_values("investor_id", kind="stable")
+    owners = portfolios["investor_id"].to_numpy()
+    sectors = portfolios["sector"].to_numpy()
+    countries = portfolios["country"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else np.empty(0, int)
+    bounds = np.append(starts, len(owners))
+
+    startup_ids = df["id"].to_numpy() if "id" in df else np.arange(len(df))
+    result = {c: df[c].to_numpy() for c in RESULT_COLS}
+    for first in range(0, len(starts), chunk_size):
+        lo, hi = bounds[first], bounds[min(first + chunk_size, len(starts))]
+        investors, ids = index.top_k_batch(owners[lo:hi], sectors[lo:hi], countries[lo:hi], k)
+        inv, rank = np.nonzero(ids >= 0)
+        rows = ids[inv, rank]
+        chunk = pd.DataFrame({"investor_id": investors[inv], "rank": rank + 1, "startup_id": startup_ids[rows]})
+        for c in RESULT_COLS:
+            chunk[c] = result[c][rows]
+        yield chunk
+
+
+# === Streaming sinks ===
+class ParquetSink:
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8")
+
+    def write(self, chunk):
+        records = chunk.drop(columns="investor_id").to_dict("records")
+        lines = []
+        for investor_id, pos in chunk.groupby("investor_id", sort=False).indices.items():
+            recs = [records[i] for i in pos]
+            lines.append(json.dumps({"investor_id": _jsonable(investor_id), "recommendations": recs},
+                                    default=_jsonable, ensure_ascii=False))
+        if lines:
+            self._f.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self._f.close()
+
+
+def _jsonable(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def open_sink(path):
+    if path.endswith(".parquet"):
+        return ParquetSink(path)
+    if path.endswith(".jsonl"):
+        return JsonlSink(path)
+    raise ValueError("output must end with .parquet or .jsonl")
+
+
+def run_bulk(portfolios, out, universe=None, csv_path="startups_financials.csv", k=3, chunk_size=50_000):
+    """Score every investor in portfolios and stream the results to out. Returns counters."""
+    t0 = time.perf_counter()
+    universe = universe or load_universe(csv_path)
+    sink = open_sink(out)
+    n_rows = n_investors = 0
+    try:
+        for chunk in recommend_all(universe, portfolios, k, chunk_size):
+            sink.write(chunk)
+            n_rows += len(chunk)
+            n_investors += chunk["investor_id"].nunique()
+    finally:
+        sink.close()
+    return {"investors": n_investors, "rows": n_rows, "seconds": time.perf_counter() - t0}
+
+
+# === Optional LLM stage ===
+def explain(recs_jsonl, out_jsonl, investors, portfolios, llm=None, max_concurrency=8, batch_size=512):
+    """
+    Add an LLM "summary" to every record of a JSONL produced by run_bulk (records
+    whose explanation failed get "summary": null and an "error"). Runs after
+    scoring, so a slow or failing LLM never blocks the nightly ranking.
+    """
+    return asyncio.run(_explain(recs_jsonl, out_jsonl, investors, portfolios, llm, max_concurrency, batch_size))
+
+
+async def _explain(recs_jsonl, out_jsonl, investors, portfolios, llm, max_concurrency, batch_size):
+    own = llm is None
+    if own:
+        llm = AsyncLLMClient(max_concurrency=max_concurrency, cache=ExplanationCache())
+    profiles = {r["investor_id"]: r for r in investors.to_dict("records")}
+    holdings = {inv: g.drop(columns="investor_id").to_dict("records")
+                for inv, g in portfolios.groupby("investor_id", sort=False)}
+
+    async def summarize(record):
+        inv = record["investor_id"]
+        top = pd.DataFrame(record["recommendations"])
+        prompt = build_prompt(*profile_shape(profiles.get(inv, {}), holdings.get(inv, [])), top)
+        try:
+            record["summary"] = await llm.chat(SYSTEM_PROMPT, prompt)
+        except LLMError as e:
+            record["summary"], record["error"] = None, str(e)
+        return record
+
+    n = 0
+    try:
+        with open(recs_jsonl, encoding="utf-8") as src, open(out_jsonl, "w", encoding="utf-8") as dst:
+            # bounded batches keep memory flat on large files; gather() keeps input order
+            batch = []
+            for line in src:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    n += _write_records(dst, await asyncio.gather(*map(summarize, batch)))
+                    batch = []
+            n += _write_records(dst, await asyncio.gather(*map(summarize, batch)))
+    finally:
+        if own:
+            await llm.aclose()
+            llm.cache.close()
+    return n
+
+
+def _write_records(f, records):
+    n = 0
+    for record in records:
+        f.write(json.dumps(record, default=_jsonable, ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="startups_financials.csv", help="startup universe")
+    parser.add_argument("--investors", default=None, help="CSV: investor_id + profile columns (for --explain)")
+    parser.add_argument("--portfolios", required=True, help="CSV: investor_id, sector, country, ...")
+    parser.add_argument("--out", required=True, help=".parquet or .jsonl")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--explain", default=None, help="also write LLM summaries to this JSONL (needs --out .jsonl)")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    portfolios = pd.read_csv(args.portfolios)
+    stats = run_bulk(portfolios, args.out, csv_path=args.csv, k=args.k, chunk_size=args.chunk_size)
+    print(f"{stats['investors']} investors, {stats['rows']} recommendations in {stats['seconds']:.2f}s -> {args.out}")
+    if args.explain:
+        if not args.out.endswith(".jsonl") or not args.investors:
+            parser.error("--explain needs --investors and reads the JSONL output (--out *.jsonl)")
+        n = explain(args.out, args.explain, pd.read_csv(args.investors), portfolios, max_concurrency=args.llm_concurrency)
+        print(f"{n} summaries -> {os.path.abspath(args.explain)}")
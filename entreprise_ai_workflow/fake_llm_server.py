@@ -0,0 +1,97 @@
+"""
+fake_llm_server.py
+
+Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint, for
+exercising llm_client.AsyncLLMClient without network access or API cost.
+
+Every request sleeps `latency` seconds (plus jitter) and answers with a short
+deterministic summary derived from the prompt hash; `fail_rate` of requests
+get a 503 so retries are exercised. `requests` counts calls received.
+
+Usage:
+  python fake_llm_server.py --port 8088 --latency 0.3 --fail-rate 0.05
+  LLM_BASE_URL=http://127.0.0.1:8088/v1 python rec.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+
+
+class FakeLLMServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.3, jitter=0.1, fail_rate=0.0, seed=0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self._complete(request_line.decode("latin-1").split(" ")[1], body)
+                data = json.dumps(payload).encode()
+                writer.write((f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                              f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode() + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _complete(self, path, body):
+        self.requests += 1
+        if not path.endswith("/chat/completions"):
+            return 404, {"error": "not found"}
+        await asyncio.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+        if self._rng.random() < self.fail_rate:
+            return 503, {"error": "overloaded"}
+        messages = json.loads(body)["messages"]
+        digest = hashlib.sha256(messages[-1]["content"].encode()).hexdigest()[:8]
+        text = f"These startups match the portfolio's sector and region focus with solid margins ({digest})."
+        return 200, {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]}
+
+
+async def _serve(args):
+    server = FakeLLMServer(args.host, args.port, args.latency, fail_rate=args.fail_rate)
+    await server.start()
+    print(f"Fake LLM listening on {server.base_url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    asyncio.run(_serve(parser.parse_args()))
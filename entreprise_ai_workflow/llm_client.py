@@ -0,0 +1,173 @@
+"""
+llm_client.py
+
+Async LLM client for the recommender's explanations.
+
+ - AsyncLLMClient: OpenAI-compatible /chat/completions over a pooled httpx client
+   (Together by default) with a concurrency semaphore, per-call timeout and
+   jittered exponential backoff on 429/5xx, timeouts and transport errors.
+   Failures raise LLMError instead of being turned into text.
+ - identical prompts are sent once: concurrent callers share the in-flight
+   request, later callers hit the persistent cache (sqlite, keyed on the
+   sha256 of model + prompt + sampling parameters)
+
+Environment variables (optional):
+  TOGETHER_API_KEY   - bearer token
+  LLM_BASE_URL       - e.g. http://127.0.0.1:8088/v1 for fake_llm_server.py
+  LLM_CACHE_PATH     - sqlite file (default llm_cache.sqlite next to this file)
+
+Usage:
+    async with AsyncLLMClient(max_concurrency=16) as llm:
+        text = await llm.chat(system_prompt, user_prompt)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import httpx
+
+logger = logging.getLogger("portfolio_rec.llm")
+
+DEFAULT_MODEL = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
+DEFAULT_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.together.xyz/v1")
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite"))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+def prompt_key(model, system_prompt, user_prompt, **params):
+    payload = json.dumps({"model": model, "system": system_prompt, "user": user_prompt, **params},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """Persistent prompt-hash -> text cache (sqlite, WAL, optional TTL)."""
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS llm (key TEXT PRIMARY KEY, text TEXT, created REAL)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT text, created FROM llm WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return row[0]
+
+    def put(self, key, text):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO llm VALUES (?, ?, ?)", (key, text, time.time()))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AsyncLLMClient:
+    def __init__(self, model=DEFAULT_MODEL, base_url=DEFAULT_BASE_URL, api_key=None, max_concurrency=8,
+                 timeout=20.0, retries=3, backoff_base=0.5, backoff_max=8.0, max_tokens=250,
+                 temperature=0.6, cache=None):
+        self.model = model
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key or os.getenv("TOGETHER_API_KEY")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.params = {"max_tokens": max_tokens, "temperature": temperature}
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._client = None
+        self._inflight = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "deduplicated": 0, "retries": 0, "errors": 0}
+
+    def _ensure(self):
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            self._client = httpx.AsyncClient(headers=headers, limits=limits, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def chat(self, system_prompt, user_prompt):
+        """Completion text for the prompt; raises LLMError once retries are exhausted."""
+        key = prompt_key(self.model, system_prompt, user_prompt, **self.params)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["deduplicated"] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._complete(key, system_prompt, user_prompt))
+        self._inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def _complete(self, key, system_prompt, user_prompt):
+        self._ensure()
+        body = {"model": self.model, "stream": False, **self.params,
+                "messages": [{"role": "system", "content": system_prompt},
+                             {"role": "user", "content": user_prompt}]}
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                async with self._semaphore:
+                    self.stats["requests"] += 1
+                    resp = await asyncio.wait_for(self._client.post(self.url, json=body), self.timeout)
+                if resp.status_code in RETRY_STATUSES:
+                    last_error = LLMError(f"HTTP {resp.status_code}")
+                    continue
+                resp.raise_for_status()
+                text = resp.json()["choices"][0]["message"]["content"].strip()
+            except (asyncio.TimeoutError, httpx.TransportError) as e:
+                last_error = e
+                continue
+            except (httpx.HTTPStatusError, KeyError, IndexError, ValueError) as e:
+                last_error = e
+                break
+            if self.cache is not None:
+                self.cache.put(key, text)
+            return text
+        self.stats["errors"] += 1
+        raise LLMError(f"LLM request failed after {attempt + 1} attempt(s): {last_error!r}") from last_error
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -1,11 +1,16 @@
 import os
 import json
+import asyncio
+import logging
+import numpy as np
 import pandas as pd
 import nest_asyncio
 from together import Together
+from llm_client import AsyncLLMClient, ExplanationCache, LLMError
 
 # === Setup ===
 nest_asyncio.apply()
+logger = logging.getLogger("portfolio_rec")
 
 os.environ["TOGETHER_API_KEY"] = "003654e5a64747799856bf5ae54779e595f8a50b042240299dc5f2f5486fb40f"
 together_client = Together()
@@ -29,31 +34,188 @@ class TogetherChat:
             )
             return resp.choices[0].message.content.strip()
         except Exception as e:
-            return f"(⚠️ LLM unavailable — fallback summary). Error: {e}"
+            return FALLBACK_SUMMARY.format(error=e)
+
+
+# === Prepared scoring index ===
+DEFAULT_WEIGHTS = {"growth_score": 0.5, "stability_score": 0.3, "runway_score": 0.2}
+RESULT_COLS = ["name", "sector", "country", "score_total"]
+
+
+class StartupIndex:
+    """
+    Sector/country as categorical codes, row ids grouped per (sector, country)
+    and sorted by precomputed score, so a query only looks at the head of each
+    matching group instead of scanning and sorting the whole frame.
+    """
+    def __init__(self, df, weights=None):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.scores = np.zeros(len(df))
+        for col, w in self.weights.items():
+            self.scores += w * df[col].to_numpy(dtype=float)
+
+        sector = pd.Categorical(df["sector"])
+        country = pd.Categorical(df["country"])
+        self.sector_codes = {s: i for i, s in enumerate(sector.categories)}
+        self.country_codes = {c: i for i, c in enumerate(country.categories)}
+        n_countries = max(len(country.categories), 1)
+        key = sector.codes.astype(np.int64) * n_countries + country.codes
+        key[(sector.codes < 0) | (country.codes < 0)] = -1
+
+        # best score first (NaN last), ties by row order, then split into groups
+        order = np.lexsort((np.arange(len(df)), np.nan_to_num(-self.scores, nan=np.inf), key))
+        keys, starts = np.unique(key[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        self.groups = {int(k): order[bounds[i]:bounds[i + 1]] for i, k in enumerate(keys) if k >= 0}
+        self._n_countries = n_countries
+
+    def group_ids(self, sectors, countries):
+        """Row-id arrays of every (sector, country) group in sectors x countries."""
+        s_codes = {self.sector_codes[s] for s in sectors if s in self.sector_codes}
+        c_codes = {self.country_codes[c] for c in countries if c in self.country_codes}
+        return [self.groups[k] for k in (s * self._n_countries + c for s in s_codes for c in c_codes)
+                if k in self.groups]
+
+    def top_k(self, sectors, countries, k=3):
+        """Row ids of the k best-scored startups matching sector AND country, best first."""
+        candidates = np.concatenate([g[:k] for g in self.group_ids(sectors, countries)] or [np.empty(0, int)])
+        if len(candidates) > k:
+            neg = np.nan_to_num(-self.scores[candidates], nan=np.inf)
+            candidates = candidates[np.argpartition(neg, k - 1)[:k]]
+        neg = np.nan_to_num(-self.scores[candidates], nan=np.inf)
+        return candidates[np.lexsort((candidates, neg))]
+
+    def top_k_batch(self, owners, sectors, countries, k=3):
+        """
+        Vectorized top_k for many portfolios at once. owners/sectors/countries are
+        parallel arrays, one entry per portfolio holding. Returns (unique owners,
+        (n_owners, k) row ids best first, -1 where fewer than k startups match).
+        """
+        n_countries = self._n_countries
+        holdings = pd.DataFrame({
+            "owner": np.asarray(owners),
+            "s": pd.Series(sectors).map(self.sector_codes).to_numpy(),
+            "c": pd.Series(countries).map(self.country_codes).to_numpy(),
+        })
+        uniq = pd.unique(holdings["owner"])
+        pairs = (holdings[["owner", "s"]].dropna().drop_duplicates()
+                 .merge(holdings[["owner", "c"]].dropna().drop_duplicates(), on="owner"))
+        keys = (pairs["s"].to_numpy(np.int64) * n_countries + pairs["c"].to_numpy(np.int64))
+
+        # dense (n_groups + 1, k) table of each group's best rows; the last row is padding
+        group_keys = np.fromiter(self.groups, dtype=np.int64, count=len(self.groups))
+        table = np.full((len(group_keys) + 1, k), -1, dtype=np.int64)
+        for i, g in enumerate(self.groups.values()):
+            table[i, :min(k, len(g))] = g[:k]
+        slot = pd.Series(np.arange(len(group_keys)), index=group_keys).reindex(keys).fillna(len(group_keys))
+
+        owner_pos = pd.Index(uniq).get_indexer(pairs["owner"])
+        col = pd.Series(owner_pos).groupby(owner_pos).cumcount().to_numpy()
+        width = int(col.max()) + 1 if len(col) else 1
+        grid = np.full((len(uniq), width), len(group_keys), dtype=np.int64)
+        grid[owner_pos, col] = slot.to_numpy(np.int64)
+
+        candidates = table[grid].reshape(len(uniq), -1)
+        neg = np.where(candidates >= 0, np.nan_to_num(-self.scores[candidates], nan=np.finfo(float).max), np.inf)
+        if candidates.shape[1] > k:
+            part = np.argpartition(neg, k - 1, axis=1)[:, :k]
+            candidates = np.take_along_axis(candidates, part, 1)
+            neg = np.take_along_axis(neg, part, 1)
+        by_id = np.argsort(candidates, axis=1, kind="stable")
+        candidates, neg = np.take_along_axis(candidates, by_id, 1), np.take_along_axis(neg, by_id, 1)
+        order = np.argsort(neg, axis=1, kind="stable")
+        return uniq, np.take_along_axis(candidates, order, 1)[:, :k]
+
+
+SCORE_COLS = ["growth_score", "stability_score", "runway_score"]
+
+
+def prepare_startups(df, weights=None):
+    """Ratio-enriched copy of the startup table plus its StartupIndex (score_total included)."""
+    df = df.copy()
+    if set(SCORE_COLS).issubset(df.columns):
+        # already prepared (snapshot.load_snapshot): only the index is rebuilt
+        index = StartupIndex(df, weights)
+        df["score_total"] = index.scores
+        return df, index
+
+    # Compute key ratios
+    df["ebitda_margin"] = df["ebitda"] / df["revenue"]
+    df["net_margin"] = df["net_income"] / df["revenue"]
+    df["debt_ratio"] = df["total_liabilities"] / df["total_assets"]
+    df["gross_margin"] = df["gross_margin_pct"] / 100
+
+    # Financial scoring
+    df["growth_score"] = (df["gross_margin"] + df["ebitda_margin"] + df["net_margin"]).fillna(0)
+    df["stability_score"] = (1 - df["debt_ratio"]).clip(0, 1)
+    df["runway_score"] = (df["runway_months"] / 12).clip(0, 1)
+
+    # Scores and (sector, country) groups computed once, reused by every query
+    index = StartupIndex(df, weights)
+    df["score_total"] = index.scores
+    return df, index
+
+
+SYSTEM_PROMPT = "You are a professional financial analyst. Summarize clearly."
+FALLBACK_SUMMARY = "(⚠️ LLM unavailable — fallback summary). Error: {error}"
+PROFILE_SHAPE_KEYS = ("risk_tolerance", "preferred_sectors")
+
+
+def profile_shape(profile, portfolio):
+    """
+    The parts of an investor that the explanation depends on: risk profile and
+    the set of (sector, country) exposures. Investors with the same shape and
+    the same top-k get the same prompt, so the LLM explains it only once.
+    """
+    shape = {k: profile[k] for k in PROFILE_SHAPE_KEYS if k in profile}
+    exposures = sorted({(p["sector"], p["country"]) for p in portfolio})
+    return shape, [{"sector": s, "country": c} for s, c in exposures]
+
+
+def build_prompt(profile, portfolio, top):
+    return f"""
+    Investor profile:
+    {json.dumps(profile, indent=2)}
+
+    Current portfolio:
+    {json.dumps(portfolio, indent=2)}
+
+    Top {len(top)} recommended startups (same sector and region):
+    {top[['name','sector','country','score_total']].to_string(index=False)}
+
+    Explain in 2-3 sentences why these startups are aligned with the investor’s focus 
+    on the same sector and region, considering risk and growth potential.
+    """
+
+
+def load_startups(csv_path, use_snapshot=True):
+    """Scoring columns from the columnar snapshot (see snapshot.py), or the full CSV."""
+    if use_snapshot:
+        try:
+            from snapshot import load_snapshot
+            return load_snapshot(csv_path)
+        except (ImportError, OSError) as e:
+            logger.warning("Startup snapshot unavailable, reading the CSV: %s", e)
+    return pd.read_csv(csv_path)
 
 
 # === Portfolio-based Recommender ===
 class PortfolioRecommender:
-    def __init__(self, csv_path, investor_profile, portfolio):
-        self.df = pd.read_csv(csv_path)
+    def __init__(self, csv_path, investor_profile, portfolio, k=3, weights=None, use_snapshot=True):
+        # csv_path may also be an already-loaded DataFrame
+        if isinstance(csv_path, pd.DataFrame):
+            self.df = csv_path.copy()
+        else:
+            self.df = load_startups(csv_path, use_snapshot)
         self.profile = investor_profile
         self.portfolio = portfolio
-        self.llm = TogetherChat()
+        self.k = k
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.llm = None  # blocking TogetherChat, built on the first recommend()
         self.prepare_data()
 
     def prepare_data(self):
-        df = self.df.copy()
-        # Compute key ratios
-        df["ebitda_margin"] = df["ebitda"] / df["revenue"]
-        df["net_margin"] = df["net_income"] / df["revenue"]
-        df["debt_ratio"] = df["total_liabilities"] / df["total_assets"]
-        df["gross_margin"] = df["gross_margin_pct"] / 100
-
-        # Financial scoring
-        df["growth_score"] = (df["gross_margin"] + df["ebitda_margin"] + df["net_margin"]).fillna(0)
-        df["stability_score"] = (1 - df["debt_ratio"]).clip(0, 1)
-        df["runway_score"] = (df["runway_months"] / 12).clip(0, 1)
-        self.df = df
+        self.df, self.index = prepare_startups(self.df, self.weights)
 
     def filter_data(self):
         """Keep only startups in the same sector(s) and region(s) as the investor's portfolio."""
@@ -61,44 +223,52 @@ class PortfolioRecommender:
         countries = [p["country"] for p in self.portfolio]
 
         # ✅ Keep startups that match sector AND country
-        df = self.df[
-            (self.df["sector"].isin(sectors)) &
-            (self.df["country"].isin(countries))
-        ]
-        return df
+        groups = self.index.group_ids(sectors, countries)
+        return self.df.iloc[np.sort(np.concatenate(groups))] if groups else self.df.iloc[:0]
+
+    def top_k(self, k=None):
+        """Best k startups by score_total (partial selection over the prepared index)."""
+        sectors = [p["sector"] for p in self.portfolio]
+        countries = [p["country"] for p in self.portfolio]
+        ids = self.index.top_k(sectors, countries, k or self.k)
+        return self.df.iloc[ids][RESULT_COLS]
 
-    def recommend(self):
-        df = self.filter_data().copy()
+    def recommend(self, k=None):
+        top3 = self.top_k(k)
 
-        if df.empty:
+        if top3.empty:
             return pd.DataFrame(), "(No startups found in the same sector and region.)"
 
-        # Quantitative scoring (same)
-        df["score_total"] = (
-            0.5 * df["growth_score"] +
-            0.3 * df["stability_score"] +
-            0.2 * df["runway_score"]
-        )
-
-        top3 = df.sort_values("score_total", ascending=False).head(3)
+        if self.llm is None:
+            self.llm = TogetherChat()
+        summary = self.llm(SYSTEM_PROMPT, build_prompt(self.profile, self.portfolio, top3))
 
-        system_prompt = "You are a professional financial analyst. Summarize clearly."
-        user_prompt = f"""
-    Investor profile:
-    {json.dumps(self.profile, indent=2)}
+        return top3, summary
 
-    Current portfolio:
-    {json.dumps(self.portfolio, indent=2)}
+    async def arecommend(self, k=None, llm=None):
+        """
+        recommend() with the async LLM client (timeout, retries, deduplicated and
+        cached by prompt). Pass one shared AsyncLLMClient when explaining many investors.
+        """
+        top3 = self.top_k(k)
 
-    Top 3 recommended startups (same sector and region):
-    {top3[['name','sector','country','score_total']].to_string(index=False)}
+        if top3.empty:
+            return pd.DataFrame(), "(No startups found in the same sector and region.)"
 
-    Explain in 2-3 sentences why these startups are aligned with the investor’s focus 
-    on the same sector and region, considering risk and growth potential.
-    """
-        summary = self.llm(system_prompt, user_prompt)
+        if llm is None:
+            cache = ExplanationCache()
+            try:
+                async with AsyncLLMClient(cache=cache) as own:
+                    return await self.arecommend(k, own)
+            finally:
+                cache.close()
+        try:
+            summary = await llm.chat(SYSTEM_PROMPT, build_prompt(*profile_shape(self.profile, self.portfolio), top3))
+        except LLMError as e:
+            logger.info("LLM explanation failed: %s", e)
+            summary = FALLBACK_SUMMARY.format(error=e)
 
-        return top3[["name", "sector", "country", "score_total"]], summary
+        return top3, summary
 
 
 
@@ -116,7 +286,7 @@ if __name__ == "__main__":
     ]
 
     agent = PortfolioRecommender(r"./startups_financials.csv", investor_profile, portfolio)
-    top3, summary = agent.recommend()
+    top3, summary = asyncio.run(agent.arecommend())
 
     # === Print results nicely ===
     print("\n=== 🧠 TOP 3 STARTUP RECOMMENDATIONS ===")
@@ -0,0 +1,147 @@
+"""
+snapshot.py
+
+Compact columnar snapshot of the startup universe.
+
+build_snapshot() writes the prepared, ratio-enriched frame (rec.prepare_startups)
+to <csv stem>_snapshot/universe.parquet:
+ - integers downcast to the smallest int type, floats to float32, except the
+   score inputs (growth/stability/runway_score, score_total), which stay float64
+   so rankings are identical to the CSV path
+ - sector / country / currency / city stored as categoricals (Parquet dictionaries)
+ - free-text columns (description, website, ...) are kept but never loaded unless asked
+
+load_snapshot() reads only the requested columns, memory-mapped, and rebuilds
+the snapshot first when the CSV's sha256 differs from the one recorded in
+meta.json (size/mtime are checked first so an unchanged CSV is not re-hashed).
+
+Usage:
+    df = load_snapshot("startups_financials.csv")                  # scoring columns
+    text = load_snapshot("startups_financials.csv", TEXT_COLS)     # lazily, when needed
+
+    python snapshot.py startups_financials.csv
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+logger = logging.getLogger("startup_snapshot")
+
+DATA_FILE = "universe.parquet"
+META_FILE = "meta.json"
+SCHEMA_VERSION = 1
+
+CATEGORICAL_COLS = ["sector", "country", "currency", "city"]
+TEXT_COLS = ["description", "website", "crunchbase_id"]
+FLOAT64_COLS = ["growth_score", "stability_score", "runway_score", "score_total"]
+# what PortfolioRecommender / bulk_rec need to score and print
+SCORING_COLS = ["id", "name", "sector", "country"] + FLOAT64_COLS
+
+
+def default_snapshot_dir(csv_path):
+    return os.path.splitext(csv_path)[0] + "_snapshot"
+
+
+def file_sha256(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _source(csv_path):
+    st = os.stat(csv_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def compact_frame(df):
+    """Downcast numerics and categorize low-cardinality strings (see module docstring)."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in CATEGORICAL_COLS:
+            s = s.astype("category")
+        elif col in FLOAT64_COLS:
+            s = s.astype("float64")
+        elif pd.api.types.is_bool_dtype(s):
+            pass
+        elif pd.api.types.is_integer_dtype(s):
+            s = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s):
+            s = s.astype("float32")
+        out[col] = s
+    return pd.DataFrame(out)
+
+
+def build_snapshot(csv_path, snapshot_dir=None):
+    """Prepare csv_path and write its snapshot. Returns the snapshot directory."""
+    from rec import prepare_startups
+    snapshot_dir = snapshot_dir or default_snapshot_dir(csv_path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    source = _source(csv_path)
+    sha = file_sha256(csv_path)
+    df, _ = prepare_startups(pd.read_csv(csv_path))
+    df = compact_frame(df)
+
+    tmp = os.path.join(snapshot_dir, DATA_FILE + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, os.path.join(snapshot_dir, DATA_FILE))
+    _write_meta(snapshot_dir, {"version": SCHEMA_VERSION, "sha256": sha, "source": source, "rows": len(df)})
+    return snapshot_dir
+
+
+def _write_meta(snapshot_dir, meta):
+    tmp = os.path.join(snapshot_dir, META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(snapshot_dir, META_FILE))
+
+
+def is_fresh(csv_path, snapshot_dir):
+    """True when the snapshot matches csv_path's content hash (refreshing the recorded size/mtime)."""
+    try:
+        with open(os.path.join(snapshot_dir, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get("version") != SCHEMA_VERSION or not os.path.exists(os.path.join(snapshot_dir, DATA_FILE)):
+        return False
+    source = _source(csv_path)
+    if meta.get("source") == source:
+        return True
+    if meta.get("sha256") != file_sha256(csv_path):
+        return False
+    meta["source"] = source  # touched but identical: skip hashing next time
+    _write_meta(snapshot_dir, meta)
+    return True
+
+
+def load_snapshot(csv_path="startups_financials.csv", columns=SCORING_COLS, snapshot_dir=None):
+    """
+    Prepared startup frame restricted to columns (None = all), memory-mapped from
+    the snapshot. (Re)builds the snapshot when missing or stale.
+    """
+    import pyarrow.parquet as pq
+    snapshot_dir = snapshot_dir or default_snapshot_dir(csv_path)
+    if os.path.exists(csv_path) and not is_fresh(csv_path, snapshot_dir):
+        logger.info("Building startup snapshot for %s", csv_path)
+        build_snapshot(csv_path, snapshot_dir)
+    table = pq.read_table(os.path.join(snapshot_dir, DATA_FILE), columns=list(columns) if columns else None,
+                          memory_map=True)
+    return table.to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar snapshot of the startup universe.")
+    parser.add_argument("csv_path", nargs="?", default="startups_financials.csv")
+    parser.add_argument("--out", default=None, help="snapshot directory (default: <csv>_snapshot)")
+    args = parser.parse_args()
+    out = build_snapshot(args.csv_path, args.out)
+    size = os.path.getsize(os.path.join(out, DATA_FILE))
+    print(f"Snapshot of {args.csv_path} -> {out} ({size / 2**20:.2f} MiB)")